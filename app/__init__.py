@@ -76,9 +76,11 @@ api = Api(
 # Import and register blueprints
 from app.routes.admin.auth import bp as auth_bp
 from app.routes.admin.dashboard import bp as dashboard_bp
+from app.routes.admin.logs import bp as logs_bp
 
 app.register_blueprint(auth_bp, url_prefix='/admin')
 app.register_blueprint(dashboard_bp, url_prefix='/admin')
+app.register_blueprint(logs_bp, url_prefix='/admin')
 
 # Import models
 from app import models
@@ -115,6 +117,46 @@ def create_app(config_class: type = Config) -> Flask:
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
+    # Provider session pool and login coordination (imported here to avoid circular imports)
+    from app.services.session_pool import session_pool
+    from app.services.login_coordinator import login_coordinator
+    from app.services.session_refresher import session_refresher
+    from app.services.captcha import captcha_reservoirs
+    from app.services.retry import retry_engine
+    from app.services.circuit_breaker import circuit_breaker
+    from app.services.provider_limiter import provider_limiter
+    from app.services.user_cache import user_id_cache
+    from app.services.agent_ledger import agent_ledger
+    from app.services.action_url_cache import action_url_cache
+    from app.services.bulk import bulk_runner
+    from app.services.balance_fanout import balance_fanout
+    from app.services.provisioning import provisioner
+    from app.services.executor import operation_executor
+    from app.services.jobs import job_store
+    from app.services.provider_registry import provider_registry
+    from app.services.idempotency import idempotency_store
+    from app.services.balance_cache import balance_cache
+    from app.services.api_log_writer import api_log_writer
+    session_pool.init_app(app)
+    login_coordinator.init_app(app)
+    session_refresher.init_app(app)
+    captcha_reservoirs.init_app(app)
+    retry_engine.init_app(app)
+    circuit_breaker.init_app(app)
+    provider_limiter.init_app(app)
+    user_id_cache.init_app(app)
+    agent_ledger.init_app(app)
+    action_url_cache.init_app(app)
+    bulk_runner.init_app(app)
+    balance_fanout.init_app(app)
+    provisioner.init_app(app)
+    operation_executor.init_app(app)
+    job_store.init_app(app)
+    provider_registry.init_app(app)
+    idempotency_store.init_app(app)
+    balance_cache.init_app(app)
+    api_log_writer.init_app(app)
+
     # CORS configuration with security
     CORS(
         app,
@@ -159,6 +201,10 @@ def create_app(config_class: type = Config) -> Flask:
     from app.routes.api.category4 import category4_ns
     from app.routes.api.category5 import category5_ns
     from app.routes.api.vblink import vblink_ns
+    from app.routes.api.bulk import bulk_ns
+    from app.routes.api.players import players_ns
+    from app.routes.api.jobs import jobs_ns
+    from app.routes.api.game import game_ns
     
     api.add_namespace(category1_ns)
     api.add_namespace(category2_ns)
@@ -166,11 +212,39 @@ def create_app(config_class: type = Config) -> Flask:
     api.add_namespace(category4_ns)
     api.add_namespace(category5_ns)
     api.add_namespace(vblink_ns)
+    api.add_namespace(bulk_ns)
+    api.add_namespace(players_ns)
+    api.add_namespace(jobs_ns)
+    api.add_namespace(game_ns)
 
     # Register Swagger UI blueprint
     app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 
     # Error handlers
+    from app.services.circuit_breaker import CircuitOpenError
+    from app.services.provider_limiter import ProviderBusyError
+    from app.services.idempotency import IdempotencyConflict, IdempotencyInProgress
+
+    @api.errorhandler(CircuitOpenError)
+    def provider_unavailable(error):
+        """Fail fast while a provider's circuit is open."""
+        return {"message": "Provider unavailable", "error": str(error)}, 503, {"Retry-After": str(error.retry_after)}
+
+    @api.errorhandler(ProviderBusyError)
+    def provider_busy(error):
+        """Shed load when a provider's outbound queue is full."""
+        return {"message": "Provider busy", "error": str(error)}, 503, {"Retry-After": str(error.retry_after)}
+
+    @api.errorhandler(IdempotencyConflict)
+    def idempotency_conflict(error):
+        """Refuse to reuse an idempotency key for a different request."""
+        return {"message": "Idempotency-Key reused", "error": str(error)}, 422
+
+    @api.errorhandler(IdempotencyInProgress)
+    def idempotency_in_progress(error):
+        """The original request with this key is still running."""
+        return {"message": "Request in progress", "error": str(error)}, 409, {"Retry-After": str(error.retry_after)}
+
     @app.errorhandler(404)
     def not_found(error):
         """Handle 404 errors."""
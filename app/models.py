@@ -84,6 +84,15 @@ class Token(db.Model):
 class APILog(db.Model):
     """Model for logging API requests."""
     __tablename__ = 'api_logs'
+    # Each filter of the admin log views, paired with id for keyset pagination;
+    # created_at ranges use their index to find rows, which are then sorted by id
+    __table_args__ = (
+        db.Index('ix_api_logs_remote_provider_id', 'remote_provider', 'id'),
+        db.Index('ix_api_logs_account_id_id', 'account_id', 'id'),
+        db.Index('ix_api_logs_status_code_id', 'status_code', 'id'),
+        db.Index('ix_api_logs_is_successful_id', 'is_successful', 'id'),
+        db.Index('ix_api_logs_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=False)
@@ -101,7 +110,6 @@ class APILog(db.Model):
         return {
             "id": self.id,
             "account_id": self.account_id,
-            "token": self.token,
             "remote_provider": self.remote_provider.name,
             "method": self.method,
             "path": self.path,
@@ -1,8 +1,11 @@
 # app/routes/admin/dashboard.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
-from app.models import Provider
-import requests
+from app.services.api_log_writer import api_log_writer
+from app.services.circuit_breaker import circuit_breaker
+from app.services.executor import operation_executor
+from app.services.operations import OPERATIONS, dispatch_many
+from app.services.provider_registry import provider_registry
 from app import app
 
 bp = Blueprint('dashboard', __name__)
@@ -10,60 +13,50 @@ bp = Blueprint('dashboard', __name__)
 @bp.route('/dashboard')
 @login_required
 def dashboard():
-    providers = Provider.query.all()
-    return render_template('admin/dashboard.html', providers=providers)
+    providers = provider_registry.all()
+    circuits = circuit_breaker.states([provider.id for provider in providers])
+    return render_template(
+        'admin/dashboard.html', providers=providers, circuits=circuits,
+        executors=operation_executor.stats(), log_writer=api_log_writer.stats()
+    )
 
 @bp.route('/provider/manage/<int:provider_id>', methods=['GET', 'POST'])
 @login_required
 def manage_provider(provider_id):
-    provider = Provider.query.get_or_404(provider_id)
-    category = provider.category.name.lower()
-    endpoints = ['login', 'add_user', 'recharge', 'redeem', 'reset_password', 'balance', 'agent_balance']
+    provider = provider_registry.get(provider_id) or abort(404)
+    endpoints = list(OPERATIONS)
+    others = sorted((other for other in provider_registry.all() if other.id != provider_id), key=lambda other: other.name)
     response = None
 
     if request.method == 'POST':
         app.logger.info(f"Received POST data: {request.form}")
         try:
             action = request.form['action']
-            payload = {}
-            
-            if action == 'login':
-                payload = {
-                    'provider_id': provider_id,
-                    'username': request.form.get('username', ''),
-                    'password': request.form.get('password', '')
-                }
-            elif action == 'add_user':
-                payload = {
-                    'provider_id': provider_id,
-                    'new_username': request.form.get('new_username', ''),
-                    'new_password': request.form.get('new_password', '')
-                }
-            elif action in ['recharge', 'redeem']:
-                payload = {
-                    'provider_id': provider_id,
-                    'username': request.form.get('username', ''),
-                    'amount': float(request.form.get('amount', 0))
-                }
-            elif action == 'reset_password':
-                payload = {
-                    'provider_id': provider_id,
-                    'username': request.form.get('username', ''),
-                    'new_password': request.form.get('new_password', '')
-                }
-            elif action == 'balance':
-                payload = {
-                    'provider_id': provider_id,
-                    'username': request.form.get('username', '')
-                }
-            elif action == 'agent_balance':
-                payload = {'provider_id': provider_id}
+            if action not in OPERATIONS:
+                raise KeyError(action)
+            payload = {'provider_id': provider_id}
+            for field in OPERATIONS[action].fields:
+                payload[field] = request.form.get(field, '')
+            if 'amount' in payload:
+                payload['amount'] = float(payload['amount'] or 0)
 
-            app.logger.info(f"Action: {action}, Payload: {payload}")
-            url = f"http://127.0.0.1:8080/{category}/{action}"
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            result = response.json()
+            # Extra providers selected on the form run the same action in parallel.
+            selected = {int(other_id) for other_id in request.form.getlist('also_provider_ids')}
+            targets = [provider] + [other for other in others if other.id in selected]
+            calls = []
+            for target in targets:
+                target_payload = dict(payload, provider_id=target.id)
+                if action == 'login' and target is not provider:
+                    # Each provider logs in with its own stored credentials.
+                    target_payload.update(username=target.username, password=target.password)
+                calls.append((target, action, target_payload))
+
+            app.logger.info(f"Action: {action}, Providers: {[target.id for target in targets]}")
+            results = dispatch_many(calls)
+            if len(results) == 1:
+                result = results[0][0]
+            else:
+                result = {target.name: result for target, (result, _) in zip(targets, results)}
         except KeyError as e:
             app.logger.error(f"Missing form field: {e}")
             flash(f"Missing required field: {e}")
@@ -72,10 +65,16 @@ def manage_provider(provider_id):
             app.logger.error(f"Invalid value: {e}")
             flash("Invalid input value")
             result = {"message": "Error", "error": str(e)}
-        except requests.RequestException as e:
-            app.logger.error(f"API request failed: {e}")
-            result = {"message": "Error", "error": str(e)}
-        
-        return render_template('admin/provider_management.html', provider=provider, endpoints=endpoints, response=result)
 
-    return render_template('admin/provider_management.html', provider=provider, endpoints=endpoints, response=response)
\ No newline at end of file
+        return render_template('admin/provider_management.html', provider=provider, endpoints=endpoints, others=others, response=result)
+
+    return render_template('admin/provider_management.html', provider=provider, endpoints=endpoints, others=others, response=response)
+
+@bp.route('/provider/circuit/<int:provider_id>/reset', methods=['POST'])
+@login_required
+def reset_circuit(provider_id):
+    provider = provider_registry.get(provider_id) or abort(404)
+    circuit_breaker.reset(provider.id)
+    app.logger.info(f"Circuit for {provider.name} reset by {getattr(current_user, 'username', 'admin')}")
+    flash(f"Circuit for {provider.name} closed")
+    return redirect(url_for('dashboard.dashboard'))
\ No newline at end of file
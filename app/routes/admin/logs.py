@@ -1,23 +1,127 @@
 """
 Routes for managing API logs.
+Logs are read newest first, one page at a time: each page ends with a cursor
+(the last row's id) that the next request passes back, so a page costs an
+index range scan no matter how deep into the history it is.
+The JSON API needs an admin account's API token (Authorization: Bearer).
 """
 
+from datetime import datetime
+from functools import wraps
 from flask import Blueprint, jsonify, request, render_template
-from app.models import APILog
-from app import db
+from app.models import Account, AccountType, APILog, RemoteProvider, Token
 from flask_login import login_required
 
 bp = Blueprint('logs', __name__)
 
-@bp.route('/admin/api/logs', methods=['GET'])
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _parse_bool(value):
+    value = value.lower()
+    if value not in ('true', 'false', '1', '0'):
+        raise ValueError(value)
+    return value in ('true', '1')
+
+
+# Query argument -> converter; since/until are ISO 8601 times bounding created_at
+FILTERS = {
+    'remote_provider': lambda value: RemoteProvider[value.upper()],
+    'account_id': int,
+    'status_code': int,
+    'is_successful': _parse_bool,
+    'since': datetime.fromisoformat,
+    'until': datetime.fromisoformat,
+}
+
+
+def _convert(name, value, convert):
+    try:
+        return convert(value)
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid {name}: {value}") from None
+
+
+def parse_filters(args):
+    """
+    Read filters, cursor and page size from query arguments.
+
+    Returns (filters, cursor, limit); raises ValueError naming the first
+    invalid argument.
+    """
+    filters = {name: _convert(name, args[name], convert) for name, convert in FILTERS.items() if args.get(name)}
+    cursor = _convert('cursor', args['cursor'], int) if args.get('cursor') else None
+    limit = PAGE_SIZE
+    if args.get('limit'):
+        limit = min(max(_convert('limit', args['limit'], int), 1), MAX_PAGE_SIZE)
+    return filters, cursor, limit
+
+
+def admin_token_required(view):
+    """Refuse the request unless it carries a live API token of an admin account."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        scheme, _, value = request.headers.get('Authorization', '').partition(' ')
+        token = None
+        if scheme.lower() == 'bearer' and value:
+            token = Token.query.join(Account, Token.account_id == Account.id).filter(
+                Token.token == value,
+                Token.is_deleted.is_(False),
+                Token.valid_until > datetime.utcnow(),
+                Account.type == AccountType.ADMIN,
+            ).first()
+        if token is None:
+            return jsonify({"error": "A valid admin API token is required"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def find_logs(filters, cursor=None, limit=PAGE_SIZE):
+    """
+    Return (logs, next_cursor): one page of matching logs, newest first.
+
+    Equality filters walk their (column, id) index in id order. A since/until
+    range on created_at only narrows the rows through ix_api_logs_created_at_id;
+    the matches are still sorted by id before the page is cut.
+    """
+    query = APILog.query
+    for name in ('remote_provider', 'account_id', 'status_code', 'is_successful'):
+        if name in filters:
+            query = query.filter(getattr(APILog, name) == filters[name])
+    if 'since' in filters:
+        query = query.filter(APILog.created_at >= filters['since'])
+    if 'until' in filters:
+        query = query.filter(APILog.created_at < filters['until'])
+    if cursor is not None:
+        query = query.filter(APILog.id < cursor)
+    logs = query.order_by(APILog.id.desc()).limit(limit + 1).all()
+    next_cursor = logs[limit - 1].id if len(logs) > limit else None
+    return logs[:limit], next_cursor
+
+
+@bp.route('/api/logs', methods=['GET'])
+@admin_token_required
 def get_logs():
-    """Fetch all API logs."""
-    logs = APILog.query.all()
-    return jsonify([log.to_dict() for log in logs])
+    """Fetch a page of API logs; pass next_cursor back as cursor for the next one."""
+    try:
+        filters, cursor, limit = parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    logs, next_cursor = find_logs(filters, cursor, limit)
+    return jsonify({"logs": [log.to_dict() for log in logs], "next_cursor": next_cursor})
 
 
 @bp.route('/logs')
 @login_required
 def view_logs():
-    logs = APILog.query.all()
-    return render_template('admin/logs.html', logs=logs)
\ No newline at end of file
+    # Filters carried over to the form and the next page's link
+    args = {name: request.args[name] for name in list(FILTERS) + ['limit'] if request.args.get(name)}
+    try:
+        filters, cursor, limit = parse_filters(request.args)
+    except ValueError as e:
+        return render_template('admin/logs.html', logs=[], next_cursor=None, args=args,
+                               providers=RemoteProvider, error=str(e)), 400
+    logs, next_cursor = find_logs(filters, cursor, limit)
+    return render_template('admin/logs.html', logs=logs, next_cursor=next_cursor, args=args,
+                           providers=RemoteProvider, error=None)
@@ -0,0 +1,86 @@
+"""
+API routes for bulk operations spanning several providers.
+Results are streamed back as NDJSON, one line per item as it completes,
+followed by a summary line with the partial-failure report.
+"""
+
+import json
+from flask import Response, current_app, stream_with_context
+from flask_restx import Namespace, Resource, fields
+from app.services.bulk import TRANSFERS, bulk_runner
+from app.services.provider_registry import provider_registry
+
+bulk_ns = Namespace('bulk', description='Bulk operations across game providers')
+
+# Request models
+bulk_item = bulk_ns.model('BulkTransactionItem', {
+    'provider_id': fields.Integer(required=True, description='Provider ID'),
+    'username': fields.String(required=True, description='Username'),
+    'amount': fields.Float(required=True, description='Transaction amount'),
+    'op': fields.String(required=True, description='Operation', enum=list(TRANSFERS))
+})
+
+bulk_request = bulk_ns.model('BulkTransactions', {
+    'items': fields.List(fields.Nested(bulk_item), required=True, description='Transactions to run')
+})
+
+
+def validate_items(items):
+    """Return a list of {index, error} for malformed items."""
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "error": "Item must be an object"})
+        elif item.get('op') not in TRANSFERS:
+            errors.append({"index": index, "error": f"op must be one of {', '.join(TRANSFERS)}"})
+        elif not isinstance(item.get('provider_id'), int):
+            errors.append({"index": index, "error": "provider_id must be an integer"})
+        elif not isinstance(item.get('username'), str) or not item['username']:
+            errors.append({"index": index, "error": "username is required"})
+        elif isinstance(item.get('amount'), bool) or not isinstance(item.get('amount'), (int, float)) or item['amount'] <= 0:
+            errors.append({"index": index, "error": "amount must be a positive number"})
+    return errors
+
+
+@bulk_ns.route('/transactions')
+class BulkTransactions(Resource):
+    @bulk_ns.expect(bulk_request)
+    @bulk_ns.response(200, 'NDJSON stream of per-item results and a final summary')
+    def post(self):
+        """Recharge or redeem many accounts across providers in one call."""
+        data = bulk_ns.payload
+        if not isinstance(data, dict) or not isinstance(data.get('items'), list) or not data['items']:
+            return {"message": "Request body is missing or invalid", "error": "Please provide a non-empty items list"}, 400
+        items = data['items']
+        if len(items) > bulk_runner.max_items:
+            return {"message": "Too many items", "error": f"At most {bulk_runner.max_items} items per request"}, 400
+        errors = validate_items(items)
+        if errors:
+            return {"message": "Invalid items", "errors": errors}, 400
+
+        provider_ids = {item['provider_id'] for item in items}
+        providers = provider_registry.by_ids(provider_ids)
+        jobs, rejected = [], []
+        for index, item in enumerate(items):
+            provider = providers.get(item['provider_id'])
+            if provider is None:
+                rejected.append({
+                    "index": index, "provider_id": item['provider_id'], "username": item['username'],
+                    "op": item['op'], "ok": False, "error": "Invalid provider"
+                })
+            else:
+                jobs.append((index, provider, item))
+        current_app.logger.info(f"Bulk request: {len(jobs)} items across {len(providers)} providers, {len(rejected)} rejected")
+        app = current_app._get_current_object()
+
+        def generate():
+            outcomes = []
+            for outcome in rejected:
+                outcomes.append(outcome)
+                yield json.dumps(outcome) + "\n"
+            for outcome in bulk_runner.run(jobs, app=app):
+                outcomes.append(outcome)
+                yield json.dumps(outcome, default=str) + "\n"
+            yield json.dumps({"summary": bulk_runner.summarize(outcomes)}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
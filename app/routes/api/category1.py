@@ -1,12 +1,11 @@
 """
 API routes for Category 1 game providers (e.g., Gameroom).
-Handles token-based authentication and operations with threading for async processing.
+Handles token-based authentication and operations through the shared operation registry.
 """
 
 from flask_restx import Namespace, Resource, fields
-from app.services.category1_service import Category1Service
-from threading import Thread
-from app.models import Provider
+from app.services.operations import run_operation
+from app.services.provider_registry import provider_registry
 from flask import current_app
 
 category1_ns = Namespace('category1', description='Category 1 game provider operations')
@@ -38,7 +37,8 @@ reset_request = category1_ns.model('Category1ResetPassword', {
 
 balance_request = category1_ns.model('Category1Balance', {
     'provider_id': fields.Integer(required=True, description='Provider ID'),
-    'username': fields.String(required=True, description='Username')
+    'username': fields.String(required=True, description='Username'),
+    'max_age': fields.Float(required=False, description='Oldest cached balance acceptable, in seconds (0 = always ask the provider)')
 })
 
 agent_balance_request = category1_ns.model('Category1AgentBalance', {
@@ -51,7 +51,10 @@ response_model = category1_ns.model('Response', {
     'token': fields.String(description='Authentication token', required=False),
     'user_id': fields.String(description='User ID', required=False),
     'username': fields.String(description='Username', required=False),
-    'balance': fields.String(description='Balance', required=False)
+    'balance': fields.String(description='Balance', required=False),
+    'job_id': fields.String(description='Job ID when run asynchronously', required=False),
+    'age': fields.Float(description='Seconds since the balance was fetched from the provider', required=False),
+    'stale': fields.Boolean(description='Balance is past its cache TTL and being refreshed', required=False)
 })
 
 @category1_ns.route('/login')
@@ -64,23 +67,12 @@ class Category1Login(Resource):
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
         current_app.logger.info(f"Received request data: {data}")
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider or provider.category.name != 'CATEGORY1':
             current_app.logger.error(f"Invalid provider for ID: {data.get('provider_id')}")
             return {"message": "Invalid provider for Category 1"}, 400
         current_app.logger.info(f"Using provider: {provider.to_dict()}")
-        service = Category1Service(provider)
-        result = [None]
-        def run_login():
-            result[0] = service.login(data['username'], data['password'])
-        thread = Thread(target=run_login)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Login operation timed out or failed")
-            return {"message": "Login failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Login successful" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'login', data)
 
 @category1_ns.route('/add_user')
 class Category1AddUser(Resource):
@@ -91,25 +83,14 @@ class Category1AddUser(Resource):
         data = category1_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 1"}, 400
         if provider.category.name != 'CATEGORY1':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 1"}, 400
-        service = Category1Service(provider)
-        result = [None]
-        def run_add_user():
-            result[0] = service.add_user(data['new_username'], data['new_password'])
-        thread = Thread(target=run_add_user)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Add user operation timed out or failed")
-            return {"message": "User creation failed", "error": "Operation timed out or failed"}, 500
-        status_code = 201 if "User created" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'add_user', data)
 
 @category1_ns.route('/recharge')
 class Category1Recharge(Resource):
@@ -120,22 +101,11 @@ class Category1Recharge(Resource):
         data = category1_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider or provider.category.name != 'CATEGORY1':
             current_app.logger.error(f"Invalid provider for ID: {data.get('provider_id')}")
             return {"message": "Invalid provider for Category 1"}, 400
-        service = Category1Service(provider)
-        result = [None]
-        def run_recharge():
-            result[0] = service.recharge(data['username'], data['amount'])
-        thread = Thread(target=run_recharge)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Recharge operation timed out or failed")
-            return {"message": "Recharge failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Recharged successfully" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'recharge', data)
 
 @category1_ns.route('/redeem')
 class Category1Redeem(Resource):
@@ -146,22 +116,11 @@ class Category1Redeem(Resource):
         data = category1_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider or provider.category.name != 'CATEGORY1':
             current_app.logger.error(f"Invalid provider for ID: {data.get('provider_id')}")
             return {"message": "Invalid provider for Category 1"}, 400
-        service = Category1Service(provider)
-        result = [None]
-        def run_redeem():
-            result[0] = service.redeem(data['username'], data['amount'])
-        thread = Thread(target=run_redeem)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Redeem operation timed out or failed")
-            return {"message": "Redeem failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Redeemed successfully" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'redeem', data)
 
 @category1_ns.route('/reset_password')
 class Category1ResetPassword(Resource):
@@ -172,22 +131,11 @@ class Category1ResetPassword(Resource):
         data = category1_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider or provider.category.name != 'CATEGORY1':
             current_app.logger.error(f"Invalid provider for ID: {data.get('provider_id')}")
             return {"message": "Invalid provider for Category 1"}, 400
-        service = Category1Service(provider)
-        result = [None]
-        def run_reset_password():
-            result[0] = service.change_password(data['username'], data['new_password'])
-        thread = Thread(target=run_reset_password)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Reset password operation timed out or failed")
-            return {"message": "Password reset failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Password changed successfully" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'reset_password', data)
 
 @category1_ns.route('/balance')
 class Category1Balance(Resource):
@@ -198,22 +146,11 @@ class Category1Balance(Resource):
         data = category1_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider or provider.category.name != 'CATEGORY1':
             current_app.logger.error(f"Invalid provider for ID: {data.get('provider_id')}")
             return {"message": "Invalid provider for Category 1"}, 400
-        service = Category1Service(provider)
-        result = [None]
-        def run_get_balances():
-            result[0] = service.get_balances(data['username'])
-        thread = Thread(target=run_get_balances)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Balance fetch operation timed out or failed")
-            return {"message": "Balance fetch failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Balance fetched" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'balance', data)
 
 @category1_ns.route('/agent_balance')
 class Category1AgentBalance(Resource):
@@ -224,19 +161,8 @@ class Category1AgentBalance(Resource):
         data = category1_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider or provider.category.name != 'CATEGORY1':
             current_app.logger.error(f"Invalid provider for ID: {data.get('provider_id')}")
             return {"message": "Invalid provider for Category 1"}, 400
-        service = Category1Service(provider)
-        result = [None]
-        def run_get_agent_balance():
-            result[0] = service.get_agent_balance()
-        thread = Thread(target=run_get_agent_balance)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Agent balance fetch operation timed out or failed")
-            return {"message": "Agent balance fetch failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Agent balance fetched" in result[0]["message"] else 400
-        return result[0], status_code
\ No newline at end of file
+        return run_operation(provider, 'agent_balance', data)
@@ -1,12 +1,11 @@
 """
 API routes for Category 3 game providers (e.g., Fire Kirin).
-Handles operations with threading for async processing.
+Handles operations through the shared operation registry.
 """
 
 from flask_restx import Namespace, Resource, fields
-from app.services.category3_service import Category3Service
-from threading import Thread
-from app.models import Provider
+from app.services.operations import run_operation
+from app.services.provider_registry import provider_registry
 from flask import current_app
 
 category3_ns = Namespace('category3', description='Category 3 game provider operations')
@@ -38,7 +37,8 @@ reset_request = category3_ns.model('Category3ResetPassword', {
 
 balance_request = category3_ns.model('Category3Balance', {
     'provider_id': fields.Integer(required=True, description='Provider ID'),
-    'username': fields.String(required=True, description='Username')
+    'username': fields.String(required=True, description='Username'),
+    'max_age': fields.Float(required=False, description='Oldest cached balance acceptable, in seconds (0 = always ask the provider)')
 })
 
 agent_balance_request = category3_ns.model('Category3AgentBalance', {
@@ -49,7 +49,10 @@ response_model = category3_ns.model('Response', {
     'message': fields.String(description='Operation status message'),
     'error': fields.String(description='Error message if applicable', required=False),
     'username': fields.String(description='Username', required=False),
-    'balance': fields.String(description='Balance', required=False)
+    'balance': fields.String(description='Balance', required=False),
+    'job_id': fields.String(description='Job ID when run asynchronously', required=False),
+    'age': fields.Float(description='Seconds since the balance was fetched from the provider', required=False),
+    'stale': fields.Boolean(description='Balance is past its cache TTL and being refreshed', required=False)
 })
 
 @category3_ns.route('/login')
@@ -62,7 +65,7 @@ class Category3Login(Resource):
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
         current_app.logger.info(f"Received request data: {data}")
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 3"}, 400
@@ -70,18 +73,7 @@ class Category3Login(Resource):
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 3"}, 400
         current_app.logger.info(f"Using provider: {provider.to_dict()}")
-        service = Category3Service(provider)
-        result = [None]
-        def run_login():
-            result[0] = service.login(data['username'], data['password'])
-        thread = Thread(target=run_login)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Login operation timed out or failed")
-            return {"message": "Login failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Login successful" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'login', data)
 
 @category3_ns.route('/add_user')
 class Category3AddUser(Resource):
@@ -92,25 +84,14 @@ class Category3AddUser(Resource):
         data = category3_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 3"}, 400
         if provider.category.name != 'CATEGORY3':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 3"}, 400
-        service = Category3Service(provider)
-        result = [None]
-        def run_add_user():
-            result[0] = service.add_user(data['new_username'], data['new_password'])
-        thread = Thread(target=run_add_user)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Add user operation timed out or failed")
-            return {"message": "User creation failed", "error": "Operation timed out or failed"}, 500
-        status_code = 201 if "User created" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'add_user', data)
 
 @category3_ns.route('/recharge')
 class Category3Recharge(Resource):
@@ -121,25 +102,14 @@ class Category3Recharge(Resource):
         data = category3_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 3"}, 400
         if provider.category.name != 'CATEGORY3':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 3"}, 400
-        service = Category3Service(provider)
-        result = [None]
-        def run_recharge():
-            result[0] = service.recharge(data['username'], data['amount'])
-        thread = Thread(target=run_recharge)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Recharge operation timed out or failed")
-            return {"message": "Recharge failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Recharged successfully" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'recharge', data)
 
 @category3_ns.route('/redeem')
 class Category3Redeem(Resource):
@@ -150,25 +120,14 @@ class Category3Redeem(Resource):
         data = category3_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 3"}, 400
         if provider.category.name != 'CATEGORY3':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 3"}, 400
-        service = Category3Service(provider)
-        result = [None]
-        def run_redeem():
-            result[0] = service.redeem(data['username'], data['amount'])
-        thread = Thread(target=run_redeem)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Redeem operation timed out or failed")
-            return {"message": "Redeem failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Redeemed successfully" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'redeem', data)
 
 @category3_ns.route('/reset_password')
 class Category3ResetPassword(Resource):
@@ -179,25 +138,14 @@ class Category3ResetPassword(Resource):
         data = category3_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 3"}, 400
         if provider.category.name != 'CATEGORY3':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 3"}, 400
-        service = Category3Service(provider)
-        result = [None]
-        def run_reset_password():
-            result[0] = service.change_password(data['username'], data['new_password'])
-        thread = Thread(target=run_reset_password)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Reset password operation timed out or failed")
-            return {"message": "Password reset failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Password changed successfully" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'reset_password', data)
 
 @category3_ns.route('/balance')
 class Category3Balance(Resource):
@@ -208,25 +156,14 @@ class Category3Balance(Resource):
         data = category3_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 3"}, 400
         if provider.category.name != 'CATEGORY3':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 3"}, 400
-        service = Category3Service(provider)
-        result = [None]
-        def run_get_balances():
-            result[0] = service.get_balances(data['username'])
-        thread = Thread(target=run_get_balances)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Balance fetch operation timed out or failed")
-            return {"message": "Balance fetch failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Balance fetched" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'balance', data)
 
 @category3_ns.route('/agent_balance')
 class Category3AgentBalance(Resource):
@@ -237,22 +174,11 @@ class Category3AgentBalance(Resource):
         data = category3_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 3"}, 400
         if provider.category.name != 'CATEGORY3':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 3"}, 400
-        service = Category3Service(provider)
-        result = [None]
-        def run_get_agent_balance():
-            result[0] = service.get_agent_balance()
-        thread = Thread(target=run_get_agent_balance)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Agent balance fetch operation timed out or failed")
-            return {"message": "Agent balance fetch failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Agent balance fetched" in result[0]["message"] else 400
-        return result[0], status_code
\ No newline at end of file
+        return run_operation(provider, 'agent_balance', data)
@@ -1,12 +1,11 @@
 """
 API routes for Category 4 game providers (e.g., Vblink).
-Handles operations with threading for async processing.
+Handles operations through the shared operation registry.
 """
 
 from flask_restx import Namespace, Resource, fields
-from app.services.category4_service import Category4Service
-from threading import Thread
-from app.models import Provider
+from app.services.operations import run_operation
+from app.services.provider_registry import provider_registry
 from flask import current_app
 
 category4_ns = Namespace('category4', description='Category 4 game provider operations')
@@ -38,7 +37,8 @@ reset_request = category4_ns.model('Category4ResetPassword', {
 
 balance_request = category4_ns.model('Category4Balance', {
     'provider_id': fields.Integer(required=True, description='Provider ID'),
-    'username': fields.String(required=True, description='Username')
+    'username': fields.String(required=True, description='Username'),
+    'max_age': fields.Float(required=False, description='Oldest cached balance acceptable, in seconds (0 = always ask the provider)')
 })
 
 agent_balance_request = category4_ns.model('Category4AgentBalance', {
@@ -50,7 +50,10 @@ response_model = category4_ns.model('Response', {
     'error': fields.String(description='Error message if applicable', required=False),
     'token': fields.String(description='Authentication token', required=False),
     'username': fields.String(description='Username', required=False),
-    'balance': fields.String(description='Balance', required=False)
+    'balance': fields.String(description='Balance', required=False),
+    'job_id': fields.String(description='Job ID when run asynchronously', required=False),
+    'age': fields.Float(description='Seconds since the balance was fetched from the provider', required=False),
+    'stale': fields.Boolean(description='Balance is past its cache TTL and being refreshed', required=False)
 })
 
 @category4_ns.route('/login')
@@ -62,25 +65,14 @@ class Category4Login(Resource):
         data = category4_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 4"}, 400
         if provider.category.name != 'CATEGORY4':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 4"}, 400
-        service = Category4Service(provider)
-        result = [None]
-        def run_login():
-            result[0] = service.login(data['username'], data['password'])
-        thread = Thread(target=run_login)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Login operation timed out or failed")
-            return {"message": "Login failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Login successful" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'login', data)
 
 @category4_ns.route('/add_user')
 class Category4AddUser(Resource):
@@ -91,25 +83,14 @@ class Category4AddUser(Resource):
         data = category4_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 4"}, 400
         if provider.category.name != 'CATEGORY4':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 4"}, 400
-        service = Category4Service(provider)
-        result = [None]
-        def run_add_user():
-            result[0] = service.add_user(data['new_username'], data['new_password'])
-        thread = Thread(target=run_add_user)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Add user operation timed out or failed")
-            return {"message": "User creation failed", "error": "Operation timed out or failed"}, 500
-        status_code = 201 if "User created" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'add_user', data)
 
 @category4_ns.route('/recharge')
 class Category4Recharge(Resource):
@@ -120,25 +101,14 @@ class Category4Recharge(Resource):
         data = category4_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 4"}, 400
         if provider.category.name != 'CATEGORY4':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 4"}, 400
-        service = Category4Service(provider)
-        result = [None]
-        def run_recharge():
-            result[0] = service.recharge(data['username'], data['amount'])
-        thread = Thread(target=run_recharge)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Recharge operation timed out or failed")
-            return {"message": "Recharge failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Recharged successfully" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'recharge', data)
 
 @category4_ns.route('/redeem')
 class Category4Redeem(Resource):
@@ -149,25 +119,14 @@ class Category4Redeem(Resource):
         data = category4_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 4"}, 400
         if provider.category.name != 'CATEGORY4':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 4"}, 400
-        service = Category4Service(provider)
-        result = [None]
-        def run_redeem():
-            result[0] = service.redeem(data['username'], data['amount'])
-        thread = Thread(target=run_redeem)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Redeem operation timed out or failed")
-            return {"message": "Redeem failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Redeemed successfully" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'redeem', data)
 
 @category4_ns.route('/reset_password')
 class Category4ResetPassword(Resource):
@@ -178,25 +137,14 @@ class Category4ResetPassword(Resource):
         data = category4_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 4"}, 400
         if provider.category.name != 'CATEGORY4':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 4"}, 400
-        service = Category4Service(provider)
-        result = [None]
-        def run_reset_password():
-            result[0] = service.change_password(data['username'], data['new_password'])
-        thread = Thread(target=run_reset_password)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Reset password operation timed out or failed")
-            return {"message": "Password reset failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Password changed successfully" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'reset_password', data)
 
 @category4_ns.route('/balance')
 class Category4Balance(Resource):
@@ -207,25 +155,14 @@ class Category4Balance(Resource):
         data = category4_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 4"}, 400
         if provider.category.name != 'CATEGORY4':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 4"}, 400
-        service = Category4Service(provider)
-        result = [None]
-        def run_get_balances():
-            result[0] = service.get_balances(data['username'])
-        thread = Thread(target=run_get_balances)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Balance fetch operation timed out or failed")
-            return {"message": "Balance fetch failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Balance fetched" in result[0]["message"] else 400
-        return result[0], status_code
+        return run_operation(provider, 'balance', data)
 
 @category4_ns.route('/agent_balance')
 class Category4AgentBalance(Resource):
@@ -236,22 +173,11 @@ class Category4AgentBalance(Resource):
         data = category4_ns.payload
         if data is None:
             return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
-        provider = Provider.query.get(data['provider_id'])
+        provider = provider_registry.get(data['provider_id'])
         if not provider:
             current_app.logger.error(f"No provider found for ID: {data['provider_id']}")
             return {"message": "Invalid provider for Category 4"}, 400
         if provider.category.name != 'CATEGORY4':
             current_app.logger.error(f"Provider {provider.id} category mismatch: {provider.category}")
             return {"message": "Invalid provider for Category 4"}, 400
-        service = Category4Service(provider)
-        result = [None]
-        def run_get_agent_balance():
-            result[0] = service.get_agent_balance()
-        thread = Thread(target=run_get_agent_balance)
-        thread.start()
-        thread.join()
-        if result[0] is None:
-            current_app.logger.error("Agent balance fetch operation timed out or failed")
-            return {"message": "Agent balance fetch failed", "error": "Operation timed out or failed"}, 500
-        status_code = 200 if "Agent balance fetched" in result[0]["message"] else 400
-        return result[0], status_code
\ No newline at end of file
+        return run_operation(provider, 'agent_balance', data)
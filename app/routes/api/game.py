@@ -1,15 +1,56 @@
-from flask_restx import Namespace, Resource
+"""
+Generic API route for game provider operations.
+/game/<provider>/<op> runs any registered operation on any provider, looked up
+by id or name, through the same dispatch path as the category namespaces.
+"""
+
+from flask import current_app
+from flask_restx import Namespace, Resource, fields
 from app.services.factory import GameServiceFactory
+from app.services.operations import OPERATIONS, run_operation
+from app.services.provider_registry import provider_registry
+
+game_ns = Namespace('game', description='Operations on any game provider')
 
-api = Namespace('game', description='Game operations')
+# Request model: the fields each operation reads (see OPERATIONS)
+operation_request = game_ns.model('GameOperation', {
+    'username': fields.String(required=False, description='Username (login, recharge, redeem, reset_password, balance)'),
+    'password': fields.String(required=False, description='Provider password (login)'),
+    'new_username': fields.String(required=False, description='New account username (add_user)'),
+    'new_password': fields.String(required=False, description='New password (add_user, reset_password)'),
+    'amount': fields.Float(required=False, description='Transaction amount (recharge, redeem)'),
+    'max_age': fields.Float(required=False, description='Oldest cached balance acceptable, in seconds (balance)')
+})
 
-@api.route('/<string:provider>/recharge')
-class Recharge(Resource):
-    def post(self, provider):
-        # Get request data
-        data = api.payload
-        service = GameServiceFactory.create_service(provider)
-        result = service.recharge(data['username'], data['amount'])
-        return result, 200 if result['success'] else 400
 
-# TODO Add similar endpoints for other operations
\ No newline at end of file
+@game_ns.route('/<string:provider_key>/<string:op>')
+@game_ns.doc(params={
+    'provider_key': 'Provider ID or name',
+    'op': f"One of: {', '.join(OPERATIONS)}"
+})
+class GameOperation(Resource):
+    @game_ns.expect(operation_request)
+    @game_ns.response(404, 'Unknown provider or operation')
+    def post(self, provider_key, op):
+        """Run an operation on a game provider."""
+        data = game_ns.payload or {}
+        if not isinstance(data, dict):
+            return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
+        provider = provider_registry.find(provider_key)
+        if provider is None:
+            return {"message": "Unknown provider", "error": f"No provider {provider_key}"}, 404
+        operation = OPERATIONS.get(op)
+        if operation is None:
+            return {"message": "Unknown operation", "error": f"Supported operations: {', '.join(OPERATIONS)}"}, 404
+        if not GameServiceFactory.supports(provider, operation.method):
+            return {"message": "Unsupported operation", "error": f"{provider.name} does not support {op}"}, 400
+        missing = [field for field in operation.fields if data.get(field) in (None, '')]
+        if missing:
+            return {"message": "Missing required fields", "error": ", ".join(missing)}, 400
+        if 'amount' in operation.fields:
+            try:
+                data['amount'] = float(data['amount'])
+            except (TypeError, ValueError):
+                return {"message": "Invalid amount", "error": "amount must be a number"}, 400
+        current_app.logger.info(f"Using provider: {provider.to_dict()} for {op}")
+        return run_operation(provider, op, data)
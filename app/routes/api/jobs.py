@@ -0,0 +1,37 @@
+"""
+API routes for asynchronous jobs.
+Any provider operation can be submitted as a job by sending the
+`Prefer: respond-async` header or `"async": true` in the payload; the call
+answers 202 with a job id, and the outcome is read from /jobs/<job_id> or
+POSTed to the payload's `callback_url`, whose host must be listed in
+JOB_CALLBACK_HOSTS. Recharges and redeems may carry an
+`Idempotency-Key` header, synchronous or not, so they can be retried safely.
+"""
+
+from flask_restx import Namespace, Resource, fields
+from app.services.jobs import job_store
+
+jobs_ns = Namespace('jobs', description='Asynchronous provider operations')
+
+job_model = jobs_ns.model('Job', {
+    'job_id': fields.String(description='Job ID'),
+    'provider_id': fields.Integer(description='Provider ID'),
+    'action': fields.String(description='Operation'),
+    'status': fields.String(description='pending, succeeded or failed'),
+    'status_code': fields.Integer(description='HTTP status the synchronous call would have returned', required=False),
+    'result': fields.Raw(description='Operation response', required=False),
+    'created_at': fields.Float(description='Submission time (epoch seconds)'),
+    'finished_at': fields.Float(description='Completion time (epoch seconds)', required=False)
+})
+
+
+@jobs_ns.route('/<string:job_id>')
+class JobStatus(Resource):
+    @jobs_ns.marshal_with(job_model, code=200)
+    @jobs_ns.response(404, 'Unknown or expired job')
+    def get(self, job_id):
+        """Return a job's status and, once finished, its result."""
+        job = job_store.get(job_id)
+        if job is None:
+            jobs_ns.abort(404, "Unknown or expired job")
+        return job, 200
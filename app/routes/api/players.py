@@ -0,0 +1,105 @@
+"""
+API routes for player operations spanning every provider.
+"""
+
+from flask import current_app
+from flask_restx import Namespace, Resource, fields
+from app.services.balance_fanout import balance_fanout
+from app.services.provider_registry import provider_registry
+from app.services.provisioning import provisioner
+
+players_ns = Namespace('players', description='Player operations across game providers')
+
+# Request models
+balances_request = players_ns.model('PlayerBalances', {
+    'username': fields.String(required=False, description='Username to look up on every provider'),
+    'usernames': fields.Raw(required=False, description='Provider-specific usernames, {"<provider_id>": "<username>"}'),
+    'provider_ids': fields.List(fields.Integer, required=False, description='Providers to query (default: all)'),
+    'max_age': fields.Integer(required=False, description='Serve balances fetched within this many seconds from cache'),
+    'deadline': fields.Float(required=False, description='Seconds to wait for providers')
+})
+
+provision_request = players_ns.model('PlayerProvision', {
+    'username': fields.String(required=True, description='New account username'),
+    'password': fields.String(required=True, description='New account password'),
+    'provider_ids': fields.List(fields.Integer, required=False, description='Providers to create the account on (default: all)')
+})
+
+
+def load_providers(provider_ids=None):
+    """Return {id: provider} for the given ids, or for every provider."""
+    if provider_ids is None:
+        return {provider.id: provider for provider in provider_registry.all()}
+    return provider_registry.by_ids(provider_ids)
+
+
+@players_ns.route('/balances')
+class PlayerBalances(Resource):
+    @players_ns.expect(balances_request)
+    def post(self):
+        """Fetch a player's balance from many providers concurrently."""
+        data = players_ns.payload
+        if not isinstance(data, dict):
+            return {"message": "Request body is missing or invalid", "error": "Please provide a valid JSON payload"}, 400
+        usernames = data.get('usernames')
+        if usernames:
+            if not isinstance(usernames, dict):
+                return {"message": "Invalid usernames", "error": "usernames must map provider ids to usernames"}, 400
+            try:
+                usernames = {int(provider_id): username for provider_id, username in usernames.items()}
+            except ValueError:
+                return {"message": "Invalid usernames", "error": "usernames keys must be provider ids"}, 400
+            providers = load_providers(list(usernames))
+        elif data.get('username'):
+            providers = load_providers(data.get('provider_ids'))
+            usernames = dict.fromkeys(providers, data['username'])
+        else:
+            return {"message": "Request body is missing or invalid", "error": "Please provide username or usernames"}, 400
+
+        unknown = sorted(set(usernames) - set(providers))
+        if unknown:
+            return {"message": "Invalid provider", "error": f"Unknown provider ids: {unknown}"}, 400
+        targets = [(providers[provider_id], username) for provider_id, username in sorted(usernames.items())]
+        entries = balance_fanout.fetch(
+            targets,
+            max_age=data.get('max_age') or 0,
+            deadline=data.get('deadline'),
+            app=current_app._get_current_object(),
+        )
+        complete = all(entry["status"] in ("ok", "cached") for entry in entries)
+        return {"message": "Balances fetched" if complete else "Some balances unavailable", "balances": entries}, 200
+
+
+@players_ns.route('/provision')
+class PlayerProvision(Resource):
+    @players_ns.expect(provision_request)
+    @players_ns.response(201, 'Account created on every provider')
+    @players_ns.response(202, 'Some providers failed; legs without an answer are retried in the background')
+    def post(self):
+        """Create a player account on many providers concurrently."""
+        data = players_ns.payload
+        if not isinstance(data, dict) or not data.get('username') or not data.get('password'):
+            return {"message": "Request body is missing or invalid", "error": "Please provide username and password"}, 400
+        provider_ids = data.get('provider_ids')
+        providers = load_providers(provider_ids)
+        unknown = sorted(set(provider_ids or ()) - set(providers))
+        if unknown or not providers:
+            return {"message": "Invalid provider", "error": f"Unknown provider ids: {unknown}"}, 400
+        job = provisioner.provision(
+            data['username'], data['password'], [providers[provider_id] for provider_id in sorted(providers)],
+            app=current_app._get_current_object(),
+        )
+        if all(leg["status"] == "created" for leg in job["legs"]):
+            return dict(job, message="User created"), 201
+        current_app.logger.warning(f"Provisioning job {job['job_id']} incomplete for {data['username']}")
+        return dict(job, message="User partially created"), 202
+
+
+@players_ns.route('/provision/<string:job_id>')
+class PlayerProvisionStatus(Resource):
+    def get(self, job_id):
+        """Show the outcome of every leg of a provisioning job."""
+        job = provisioner.job(job_id)
+        if job is None:
+            return {"message": "Unknown provisioning job"}, 404
+        return job, 200
@@ -0,0 +1,57 @@
+"""
+Cache of the per-user action pages Category3 providers link from AccountsList.
+The GrantTreasure/ChangeTreasure/ResetPassWord URLs carry an opaque param that
+is normally discovered with an extra postback; reusing it lets a repeat
+operation on the same player open the form directly.
+"""
+# app/services/action_url_cache.py
+import logging
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+
+class ActionUrlCache:
+    """Action page paths keyed by (Provider.id, remote user id, action), shared through Redis."""
+
+    def __init__(self, ttl=21600, enabled=True):
+        self.ttl = ttl
+        self.enabled = enabled
+
+    def init_app(self, app):
+        """Read the entry lifetime from the app config."""
+        self.ttl = app.config.get("ACTION_URL_CACHE_TTL", self.ttl)
+        self.enabled = app.config.get("ACTION_URL_CACHE_ENABLED", self.enabled)
+
+    @staticmethod
+    def _key(provider_id, user_id, action):
+        return f"actionurl:{provider_id}:{user_id}:{action}"
+
+    def get(self, provider_id, user_id, action):
+        """Return the cached path, or None."""
+        if not self.enabled:
+            return None
+        try:
+            return get_redis().get(self._key(provider_id, user_id, action))
+        except RedisError as e:
+            logger.warning(f"Action URL cache lookup failed for provider {provider_id}: {e}")
+            return None
+
+    def set(self, provider_id, user_id, action, path):
+        if not self.enabled:
+            return
+        try:
+            get_redis().set(self._key(provider_id, user_id, action), path, ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Action URL cache store failed for provider {provider_id}: {e}")
+
+    def invalidate(self, provider_id, user_id, action):
+        """Forget a path the provider no longer serves the form on."""
+        try:
+            get_redis().delete(self._key(provider_id, user_id, action))
+        except RedisError as e:
+            logger.warning(f"Action URL cache invalidation failed for provider {provider_id}: {e}")
+
+
+action_url_cache = ActionUrlCache()
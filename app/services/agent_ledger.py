@@ -0,0 +1,95 @@
+"""
+Shadow copy of each provider's agent balance.
+Category1 and Category5 transfers must send the agent's available balance.
+Instead of fetching it before every transfer, the last fetched value is kept
+in Redis and adjusted after each successful recharge or redeem.
+"""
+# app/services/agent_ledger.py
+import logging
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+# Adjust the balance only while a synced value exists, so an expired entry is
+# never recreated from a delta alone.
+APPLY_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 1 then
+    return redis.call("incrbyfloat", KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+class AgentBalanceLedger:
+    """
+    Per-provider agent balance keyed by Provider.id.
+
+    A value is seeded from every live agent balance fetch and expires after
+    max_age seconds, so the provider's own figure is read again periodically
+    and deposits made outside this API are picked up.
+    """
+
+    def __init__(self, max_age=300, enabled=True):
+        self.max_age = max_age
+        self.enabled = enabled
+
+    def init_app(self, app):
+        """Read the reconcile interval from the app config."""
+        self.max_age = app.config.get("AGENT_LEDGER_MAX_AGE", self.max_age)
+        self.enabled = app.config.get("AGENT_LEDGER_ENABLED", self.enabled)
+
+    @staticmethod
+    def _key(provider_id):
+        return f"ledger:{provider_id}:balance"
+
+    @staticmethod
+    def _format(value):
+        return f"{float(value):.2f}"
+
+    def balance(self, provider_id):
+        """Return the shadow balance as a string, or None when it must be fetched."""
+        if not self.enabled:
+            return None
+        try:
+            value = get_redis().get(self._key(provider_id))
+        except RedisError as e:
+            logger.warning(f"Agent ledger lookup failed for provider {provider_id}: {e}")
+            return None
+        return self._format(value) if value is not None else None
+
+    def sync(self, provider_id, balance):
+        """Replace the shadow balance with a value just read from the provider."""
+        if not self.enabled:
+            return
+        try:
+            value = float(str(balance).replace(",", ""))
+        except (TypeError, ValueError):
+            logger.warning(f"Agent ledger ignored unparsable balance {balance!r} for provider {provider_id}")
+            return
+        try:
+            get_redis().set(self._key(provider_id), value, ex=self.max_age)
+        except RedisError as e:
+            logger.warning(f"Agent ledger sync failed for provider {provider_id}: {e}")
+
+    def apply(self, provider_id, delta):
+        """Add delta to the shadow balance if one is held; returns the new balance or None."""
+        if not self.enabled:
+            return None
+        try:
+            value = get_redis().eval(APPLY_SCRIPT, 1, self._key(provider_id), float(delta))
+        except RedisError as e:
+            logger.warning(f"Agent ledger update failed for provider {provider_id}: {e}")
+            self.invalidate(provider_id)
+            return None
+        return self._format(value) if value is not None else None
+
+    def invalidate(self, provider_id):
+        """Forget the shadow balance, e.g. after the provider rejected it."""
+        try:
+            get_redis().delete(self._key(provider_id))
+        except RedisError as e:
+            logger.warning(f"Agent ledger invalidation failed for provider {provider_id}: {e}")
+
+
+agent_ledger = AgentBalanceLedger()
@@ -0,0 +1,165 @@
+"""
+Buffered writer for APILog rows.
+Requests only put their log row on a bounded in-memory queue; a background
+thread inserts queued rows in batches once enough have gathered or the flush
+interval passes, so no request waits on a Postgres transaction for logging.
+created_at is left to the column's server default, so it is the insert time
+(at most one flush interval after the request) and follows id order.
+"""
+# app/services/api_log_writer.py
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger("automater")
+
+
+class APILogWriter:
+    """
+    Bounded queue of APILog rows flushed by a daemon thread.
+
+    Rows arriving while the queue holds max_queue rows are dropped and
+    counted rather than blocking the request. A batch whose insert fails is
+    retried once; if that fails too its rows are counted as failed. With
+    buffered False every row is written synchronously, as before.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=1.0, buffered=True, retry_delay=1.0):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffered = buffered
+        self.retry_delay = retry_delay
+        self._app = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"written": 0, "dropped": 0, "failed": 0, "batches": 0, "last_flush_ms": None, "max_flush_ms": 0.0}
+        self._last_drop_warning = 0.0
+
+    def init_app(self, app):
+        """Read queue and batch settings; the thread starts with the first row."""
+        self.max_queue = app.config.get("API_LOG_QUEUE_SIZE", self.max_queue)
+        self.batch_size = app.config.get("API_LOG_BATCH_SIZE", self.batch_size)
+        self.flush_interval = app.config.get("API_LOG_FLUSH_INTERVAL", self.flush_interval)
+        self.buffered = app.config.get("API_LOG_BUFFERED", self.buffered)
+        self.retry_delay = app.config.get("API_LOG_RETRY_DELAY", self.retry_delay)
+        self._app = app
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        atexit.register(self.stop)
+
+    def write(self, **row):
+        """Queue one APILog row (column name to value)."""
+        if not self.buffered:
+            from app import db
+            from app.models import APILog
+
+            db.session.add(APILog(**row))
+            db.session.commit()
+            return
+        self.ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+                dropped = self._stats["dropped"]
+                warn = time.monotonic() - self._last_drop_warning > 60
+                if warn:
+                    self._last_drop_warning = time.monotonic()
+            if warn:
+                logger.warning(f"API log queue full; {dropped} rows dropped so far")
+
+    def ensure_started(self):
+        """Start the flush thread once per process."""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="api-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Flush what is queued and stop the thread."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        """Rows written, dropped and failed, queue depth and flush latency."""
+        with self._stats_lock:
+            return dict(self._stats, queued=self._queue.qsize())
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+            elif self._stop.is_set():
+                return
+
+    def _collect(self):
+        """Gather rows until the batch is full or the flush interval passes."""
+        batch = []
+        flush_at = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self._stop.is_set():
+                    # Draining on shutdown: take what is left without waiting.
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=min(max(flush_at - time.monotonic(), 0), 0.25)))
+            except queue.Empty:
+                if self._stop.is_set() or time.monotonic() >= flush_at:
+                    break
+        return batch
+
+    def _flush(self, batch):
+        started = time.monotonic()
+        try:
+            self._insert(batch)
+        except Exception as e:
+            logger.warning(f"Failed to write {len(batch)} API log rows, retrying once: {e}")
+            self._stop.wait(self.retry_delay)
+            try:
+                self._insert(batch)
+            except Exception as e:
+                logger.error(f"Lost {len(batch)} API log rows after retry: {e}")
+                with self._stats_lock:
+                    self._stats["failed"] += len(batch)
+                return
+        elapsed = (time.monotonic() - started) * 1000
+        with self._stats_lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["last_flush_ms"] = round(elapsed, 1)
+            self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed), 1)
+
+    def _insert(self, rows):
+        """Insert rows with one multi-row INSERT in its own transaction."""
+        from app import db
+        from app.models import APILog
+
+        with self._app.app_context():
+            try:
+                db.session.execute(APILog.__table__.insert(), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+
+api_log_writer = APILogWriter()
@@ -0,0 +1,100 @@
+"""
+Asyncio transport for provider services.
+Provider operations are written as plain synchronous methods; greenlet_spawn runs
+one inside a greenlet so that each _make_request (and _sleep) awaits httpx on the
+caller's event loop instead of blocking a thread. One loop can then drive many
+provider operations concurrently while the sync API keeps working unchanged.
+"""
+# app/services/async_transport.py
+import asyncio
+import contextvars
+import functools
+import sys
+import httpx
+import requests
+from greenlet import greenlet, getcurrent
+
+
+class _BridgeGreenlet(greenlet):
+    """Greenlet running a sync operation on behalf of a coroutine."""
+
+
+def in_async_context():
+    """True when called from an operation started by greenlet_spawn."""
+    return isinstance(getcurrent(), _BridgeGreenlet)
+
+
+def await_only(awaitable):
+    """Wait for an awaitable from sync code running under greenlet_spawn."""
+    current = getcurrent()
+    if not isinstance(current, _BridgeGreenlet):
+        raise RuntimeError("await_only() called outside greenlet_spawn()")
+    # The parent is the coroutine in greenlet_spawn; it awaits and switches back.
+    return current.parent.switch(awaitable)
+
+
+async def greenlet_spawn(fn, *args, **kwargs):
+    """Run a sync callable so its await_only calls are awaited on the running loop."""
+    bridge = _BridgeGreenlet(fn, getcurrent())
+    # New greenlets start with an empty context; carry the Flask app context over.
+    bridge.gr_context = contextvars.copy_context()
+    result = bridge.switch(*args, **kwargs)
+    while not bridge.dead:
+        try:
+            value = await result
+        except BaseException:
+            result = bridge.throw(*sys.exc_info())
+        else:
+            result = bridge.switch(value)
+    return result
+
+
+def run_blocking(fn, *args, **kwargs):
+    """Call fn directly, or in the default executor when under greenlet_spawn."""
+    if not in_async_context():
+        return fn(*args, **kwargs)
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await_only(asyncio.get_running_loop().run_in_executor(None, call))
+
+
+class AsyncResponse:
+    """Presents an httpx response with the parts of the requests.Response API the services use."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.cookies = response.cookies
+        self.url = str(response.url)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self._response.text
+
+    @property
+    def content(self):
+        return self._response.content
+
+    def json(self, **kwargs):
+        return self._response.json(**kwargs)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+async def send(client, method, url, headers=None, timeout=None, allow_redirects=True, **kwargs):
+    """Issue a request with requests-style keyword arguments on an httpx.AsyncClient."""
+    try:
+        response = await client.request(
+            method, url, headers=headers, timeout=timeout, follow_redirects=allow_redirects, **kwargs
+        )
+    except httpx.TimeoutException as e:
+        raise requests.Timeout(str(e)) from e
+    except httpx.TransportError as e:
+        raise requests.ConnectionError(str(e)) from e
+    return AsyncResponse(response)
@@ -0,0 +1,96 @@
+"""
+Short-lived cache of player balances per (provider, username).
+Balance polls are answered from Redis while the value is fresh, and from the
+slightly older value while one background fetch refreshes it. A successful
+recharge, redeem or account creation drops the player's entry at once, so a
+cached balance never predates the last money movement this app made.
+"""
+# app/services/balance_cache.py
+import json
+import logging
+import time
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+
+class BalanceCache:
+    """
+    Balances stored as {"balance", "fetched_at"} under balance:{provider_id}:{username}.
+
+    A value is fresh for `ttl` seconds and may be served stale, while it is
+    being refreshed, for `stale_while_revalidate` more. Values are kept for
+    `retention` seconds so the balance fan-out can fall back on them.
+    """
+
+    def __init__(self, ttl=10, stale_while_revalidate=60, retention=600):
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.retention = retention
+
+    def init_app(self, app):
+        """Read lifetimes from the app config."""
+        self.ttl = app.config.get("BALANCE_CACHE_TTL", self.ttl)
+        self.stale_while_revalidate = app.config.get("BALANCE_CACHE_STALE_WHILE_REVALIDATE", self.stale_while_revalidate)
+        self.retention = app.config.get("BALANCE_CACHE_RETENTION", self.retention)
+
+    @staticmethod
+    def _key(provider_id, username):
+        return f"balance:{provider_id}:{username}"
+
+    def _read(self, provider_id, username):
+        try:
+            value = get_redis().get(self._key(provider_id, username))
+        except RedisError as e:
+            logger.warning(f"Balance cache lookup failed for provider {provider_id}: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    def get(self, provider_id, username):
+        """Return {"balance", "fetched_at"} from the last successful fetch, or None."""
+        entry = self._read(provider_id, username)
+        return entry if entry is not None and "balance" in entry else None
+
+    def remember(self, provider_id, username, balance, requested_at=None):
+        """
+        Store a fetched balance.
+
+        requested_at is when the fetch started; a value requested before the
+        player's last invalidation may predate that money movement and is
+        dropped.
+        """
+        if requested_at is not None:
+            entry = self._read(provider_id, username)
+            if entry is not None and entry.get("invalidated_at", 0) > requested_at:
+                return
+        try:
+            get_redis().set(
+                self._key(provider_id, username),
+                json.dumps({"balance": balance, "fetched_at": time.time()}),
+                ex=self.retention,
+            )
+        except RedisError as e:
+            logger.warning(f"Balance cache store failed for provider {provider_id}: {e}")
+
+    def invalidate(self, provider_id, username):
+        """Forget the player's balance after a change made through this app."""
+        try:
+            get_redis().set(
+                self._key(provider_id, username),
+                json.dumps({"invalidated_at": time.time()}),
+                ex=self.retention,
+            )
+        except RedisError as e:
+            logger.error(f"Balance cache invalidation failed for provider {provider_id}: {e}")
+
+    def claim_refresh(self, provider_id, username, seconds):
+        """True for the one caller that should refresh a stale balance."""
+        try:
+            return bool(get_redis().set(f"{self._key(provider_id, username)}:refresh", "1", nx=True, ex=max(int(seconds), 1)))
+        except RedisError as e:
+            logger.warning(f"Balance refresh claim failed for provider {provider_id}: {e}")
+            return False
+
+
+balance_cache = BalanceCache()
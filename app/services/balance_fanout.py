@@ -0,0 +1,103 @@
+"""
+Player balances across many providers in one call.
+Every provider's get_balances runs concurrently on its category executor
+under a single deadline; calls that have not answered by then are cancelled
+and reported from the last known value (marked stale) or as timed out.
+"""
+# app/services/balance_fanout.py
+import logging
+import time
+from concurrent.futures import wait
+from contextlib import nullcontext
+from app.services.balance_cache import balance_cache
+from app.services.executor import operation_executor
+from app.services.provider_limiter import ProviderBusyError
+from app.services.session_pool import session_pool
+
+logger = logging.getLogger("automater")
+
+
+class BalanceFanout:
+    """
+    Concurrent get_balances over (provider, username) targets.
+
+    Results go to the shared balance cache. A value younger than the
+    caller's max_age is served without asking the provider; an older one is
+    only used in place of a provider that misses the deadline.
+    """
+
+    def __init__(self, deadline=8, max_deadline=30):
+        self.deadline = deadline
+        self.max_deadline = max_deadline
+
+    def init_app(self, app):
+        """Read deadlines from the app config."""
+        self.deadline = app.config.get("BALANCE_FANOUT_DEADLINE", self.deadline)
+        self.max_deadline = app.config.get("BALANCE_FANOUT_MAX_DEADLINE", self.max_deadline)
+
+    def fetch(self, targets, max_age=0, deadline=None, app=None):
+        """
+        Return one entry per (provider, username) target, in target order.
+
+        Each entry has provider_id, provider, username and status: "ok" or
+        "cached" with a balance, "stale" with the last known balance and its
+        age, "error" with the provider's error, or "timeout". When app is given,
+        provider calls run inside its application context. A provider whose
+        executor queue is full also falls back to its last known value.
+        """
+        deadline = min(deadline or self.deadline, self.max_deadline)
+        now = time.time()
+        entries, pending = [], {}
+        for provider, username in targets:
+            entry = {"provider_id": provider.id, "provider": provider.name, "username": username}
+            entries.append(entry)
+            cached = balance_cache.get(provider.id, username) if max_age else None
+            if cached is not None and now - cached["fetched_at"] <= max_age:
+                entry.update(status="cached", balance=cached["balance"], age=round(now - cached["fetched_at"], 1))
+            else:
+                pending[len(entries) - 1] = (provider, username)
+        if not pending:
+            return entries
+
+        futures, missed = {}, {}
+        with app.app_context() if app is not None else nullcontext():
+            for index, (provider, username) in pending.items():
+                try:
+                    futures[operation_executor.submit(provider, "balance", self._fetch_one, provider, username)] = index
+                except ProviderBusyError as e:
+                    missed[index] = ("error", str(e))
+        done, not_done = wait(futures, timeout=deadline) if futures else (set(), set())
+        for future in not_done:
+            operation_executor.cancel(future)
+            missed[futures[future]] = ("timeout", f"No answer within {deadline}s")
+
+        now = time.time()
+        for future in done:
+            error = future.exception()
+            entries[futures[future]].update(future.result() if error is None else {"status": "error", "error": str(error)})
+        for index, (status, error) in missed.items():
+            entry = entries[index]
+            cached = balance_cache.get(entry["provider_id"], entry["username"])
+            if cached is not None:
+                entry.update(status="stale", balance=cached["balance"], age=round(now - cached["fetched_at"], 1))
+            else:
+                entry.update(status=status, error=error)
+        return entries
+
+    def _fetch_one(self, provider, username):
+        requested_at = time.time()
+        try:
+            with session_pool.lease(provider) as service:
+                result = service.get_balances(username)
+        except Exception as e:
+            logger.error(f"[{provider.name}] Balance fan-out for {username} failed: {e}")
+            return {"status": "error", "error": str(e)}
+        if isinstance(result, dict) and result.get("message") == "Balance fetched":
+            balance_cache.remember(provider.id, username, result["balance"], requested_at)
+            return {"status": "ok", "balance": result["balance"]}
+        if isinstance(result, dict):
+            return {"status": "error", "error": result.get("error") or result.get("message")}
+        return {"status": "error", "error": "Operation failed"}
+
+
+balance_fanout = BalanceFanout()
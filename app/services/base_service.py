@@ -3,9 +3,20 @@ Base service class for all game providers.
 Handles common functionality like session management, caching, and error handling.
 """
 # app/services/base_service.py
+import asyncio
+import time
+import httpx
 import requests
 from flask import current_app
 from app import cache
+from .login_coordinator import login_coordinator
+from .session_refresher import session_refresher
+from .async_transport import await_only, greenlet_spawn, in_async_context, run_blocking, send
+from .circuit_breaker import circuit_breaker
+from .provider_limiter import provider_limiter
+from .user_cache import user_id_cache
+from .agent_ledger import agent_ledger
+from .retry import ReauthenticationFailed, current_deadline, retry_engine, retry_policy
 import logging
 
 logger = logging.getLogger("automater")
@@ -24,12 +35,29 @@ class BaseGameService:
         self.provider = provider
         self.session = requests.Session()
         self.session.headers.update(self.DEFAULT_HEADERS)
+        self._auth_generation = 0  # Login generation the session's headers/cookies came from
+        self._authenticating = False
+        self._async_client = None  # httpx client bound to the event loop that created it
+        self._async_loop = None
         try:
             self._load_cached_data()
         except Exception as e:
             logger.error(f"Failed to load cached data for {self.provider.name}: {e}")
         self.logger = logger  # Logger is set here
 
+    def close(self):
+        """Close the underlying HTTP session."""
+        self.session.close()
+        self._async_client = None
+        self._async_loop = None
+
+    async def aclose(self):
+        """Close the HTTP session and the async client from inside the event loop."""
+        client = self._async_client if self._async_loop is asyncio.get_running_loop() else None
+        self.close()
+        if client is not None:
+            await client.aclose()
+
     @property
     def base_url(self):
         """Return the provider's base URL."""
@@ -38,6 +66,8 @@ class BaseGameService:
     def _load_cached_data(self):
         """Load cached headers and cookies."""
         try:
+            # Read the generation first so it never claims a newer session than was loaded.
+            self._auth_generation = login_coordinator.generation(self.provider.id)
             cached_headers = cache.get(f"{self.provider.name}_headers")
             if cached_headers:
                 self.session.headers.update(cached_headers)
@@ -49,26 +79,152 @@ class BaseGameService:
             logger.error(f"Cache load error: {e}")
 
     def _save_cached_data(self):
-        """Save headers and cookies to cache."""
+        """Save headers and cookies to cache after a successful login."""
         try:
             cache.set(f"{self.provider.name}_headers", dict(self.session.headers), timeout=None)
             cache.set(f"{self.provider.name}_cookies", requests.utils.dict_from_cookiejar(self.session.cookies), timeout=None)
         except Exception as e:
             logger.error(f"Cache save error: {e}")
+        # Tell workers waiting on the single-flight login that a new session is available.
+        self._auth_generation = login_coordinator.bump_generation(self.provider.id)
+        session_refresher.record_login(self.provider.id)
+
+    def _reauthenticate(self):
+        """Log in again, or pick up the session another worker just logged in with."""
+        if login_coordinator.generation(self.provider.id) == self._auth_generation:
+            # The newest session expired, so its age is a real lifetime sample.
+            session_refresher.record_expiry(self.provider.id)
+        # Login may wait on another worker's lock, so keep it off the event loop.
+        return run_blocking(login_coordinator.reauthenticate, self, self._auth_generation)
+
+    def _sleep(self, seconds):
+        """
+        Sleep without outliving the operation deadline or blocking the event loop.
+
+        Raises DeadlineExceeded once the deadline has passed or was cancelled.
+        """
+        deadline = current_deadline()
+        if in_async_context():
+            if deadline is not None:
+                seconds = min(seconds, deadline.remaining())
+            await_only(asyncio.sleep(seconds))
+            if deadline is not None:
+                deadline.check()
+        elif deadline is not None:
+            deadline.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _retry_pause(self, error, retry_delay, idempotent=True):
+        """Back off inside a method's own attempt loop; False when the error should not be retried."""
+        if not retry_engine.should_retry(error, idempotent):
+            return False
+        self._sleep(retry_delay)
+        return True
+
+    def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            # Share the requests cookie jar so logins on either transport apply to both.
+            self._async_client = httpx.AsyncClient(cookies=self.session.cookies)
+            self._async_loop = loop
+        return self._async_client
 
+    def _send(self, method, full_url, **kwargs):
+        deadline = current_deadline()
+        if deadline is not None:
+            kwargs["timeout"] = deadline.clamp(kwargs.get("timeout"))
+        # Queue for one of the provider's in-flight slots before touching the circuit.
+        with provider_limiter.lane(self.provider, sleep=self._sleep):
+            probe = circuit_breaker.before_request(self.provider)
+            started = time.monotonic()
+            try:
+                if in_async_context():
+                    headers = dict(self.session.headers)
+                    headers.update(kwargs.pop("headers", None) or {})
+                    response = await_only(send(self._get_async_client(), method, full_url, headers=headers, **kwargs))
+                else:
+                    response = self.session.request(method, full_url, **kwargs)
+            except requests.RequestException:
+                circuit_breaker.record(self.provider, False, time.monotonic() - started, probe)
+                raise
+            circuit_breaker.record(self.provider, response.status_code < 500, time.monotonic() - started, probe)
+            return response
 
     def _make_request(self, method, url, **kwargs):
-        url = f"{self.provider.base_url}{url}"
-        response = self.session.request(method, full_url, **kwargs)
-        if response.status_code == 401 or "Login" in response.text and "overtime" in response.text:
+        full_url = f"{self.provider.base_url}{url}"
+        response = self._send(method, full_url, **kwargs)
+        session_expired = response.status_code == 401 or "Login" in response.text and "overtime" in response.text
+        if session_expired and not self._authenticating:
             self.logger.info(f"[{self.provider.name}] Session expired, re-authenticating")
-            login_result = self.login(self.provider.username, self.provider.password)
-            if login_result.get("message") != "Login successful":
-                raise ValueError("Re-authentication failed")
-            response = self.session.request(method, full_url, **kwargs)
+            if not self._reauthenticate():
+                raise ReauthenticationFailed("Re-authentication failed")
+            response = self._send(method, full_url, **kwargs)
         response.raise_for_status()
         return response
 
+    def _cached_user_ids(self, username):
+        """Return the remote ids cached for username, or None."""
+        return user_id_cache.get(self.provider.id, username)
+
+    def _remember_user_ids(self, username, **ids):
+        user_id_cache.set(self.provider.id, username, ids)
+
+    def _forget_user_ids(self, username):
+        """Drop cached ids after the provider rejected them or lost the user."""
+        user_id_cache.invalidate(self.provider.id, username)
+
+    def _lookup_user_ids(self, username):
+        """
+        Return the remote ids of an existing user, or None when the user is not
+        found or the provider has no user search.
+
+        The default reads the dict-shaped _search_user of Categories 1, 2 and 5.
+        """
+        found = self._search_user(username)
+        return {"user_id": found["user_id"]} if found.get("user_id") else None
+
+    def _record_agent_balance(self, balance):
+        """Seed the agent ledger with a balance just read from the provider."""
+        agent_ledger.sync(self.provider.id, balance)
+
+    def _transfer_with_agent_balance(self, transfer, delta):
+        """
+        Run a transfer that must quote the agent's available balance.
+
+        The balance comes from the agent ledger when it holds one, otherwise
+        from get_agent_balance. transfer(balance) returns (result, outcome)
+        where outcome is True when applied, False when the provider rejected
+        it and None when unknown; exceptions count as unknown and propagate.
+        A rejection quoting the ledger's balance is retried once with a live
+        one; a success moves the ledger by delta.
+        """
+        balance = agent_ledger.balance(self.provider.id)
+        from_ledger = balance is not None
+        while True:
+            if balance is None:
+                agent_balance_response = self.get_agent_balance()
+                if not agent_balance_response.get("balance"):
+                    return {"message": "Failed to get agent balance", "error": agent_balance_response.get("error")}
+                balance = agent_balance_response["balance"]
+            try:
+                result, outcome = transfer(balance)
+            except Exception:
+                agent_ledger.invalidate(self.provider.id)
+                raise
+            if outcome:
+                agent_ledger.apply(self.provider.id, delta)
+                return result
+            if outcome is None:
+                # The transfer may have been applied, so the shadow balance is unknown.
+                agent_ledger.invalidate(self.provider.id)
+                return result
+            if not from_ledger:
+                return result
+            self.logger.info(f"[{self.provider.name}] Transfer rejected with ledger balance {balance}, retrying with live balance")
+            agent_ledger.invalidate(self.provider.id)
+            balance, from_ledger = None, False
+
     def _search_user(self, username):
         # Placeholder, to be overridden by subclasses if needed
         return {"user_id": None, "error": "Not implemented"}
@@ -77,21 +233,42 @@ class BaseGameService:
         """Abstract login method to be implemented by subclasses."""
         raise NotImplementedError("Subclasses must implement login method")
 
-    def retry_on_failure(max_retries=3, base_delay=2):
-        """Retry Wrapper for Session handling"""
-        def decorator(func):
-            @wraps(func)
-            def wrapper(*args, **kwargs):
-                attempts = 0
-                while attempts < max_retries:
-                    try:
-                        return func(*args, **kwargs)
-                    except (requests.RequestException, ValueError) as e:
-                        attempts += 1
-                        if attempts == max_retries:
-                            raise e from None
-                        delay = base_delay * (2 ** attempts)
-                        time.sleep(delay)
-                        args[0].logger.warning(f"Retry {attempts}/{max_retries} for {func.__name__} after {delay}s")
-            return wrapper
-        return decorator
\ No newline at end of file
+    def retry_on_failure(max_retries=None, base_delay=None, idempotent=True):
+        """
+        Retry wrapper for session handling, backed by the shared retry engine.
+
+        Pass idempotent=False for money-moving writes so they are only retried
+        when the request never reached the provider.
+        """
+        return retry_policy(idempotent=idempotent, max_attempts=max_retries, base_delay=base_delay)
+
+    async def run_async(self, operation, *args, **kwargs):
+        """
+        Run a provider operation on the running event loop.
+
+        The operation's requests go through httpx and its sleeps yield to the
+        loop, so many operations can be awaited concurrently. Each service
+        instance must still only run one operation at a time.
+        """
+        return await greenlet_spawn(operation, *args, **kwargs)
+
+    async def login_async(self, *args, **kwargs):
+        return await self.run_async(self.login, *args, **kwargs)
+
+    async def add_user_async(self, *args, **kwargs):
+        return await self.run_async(self.add_user, *args, **kwargs)
+
+    async def recharge_async(self, *args, **kwargs):
+        return await self.run_async(self.recharge, *args, **kwargs)
+
+    async def redeem_async(self, *args, **kwargs):
+        return await self.run_async(self.redeem, *args, **kwargs)
+
+    async def change_password_async(self, *args, **kwargs):
+        return await self.run_async(self.change_password, *args, **kwargs)
+
+    async def get_balances_async(self, *args, **kwargs):
+        return await self.run_async(self.get_balances, *args, **kwargs)
+
+    async def get_agent_balance_async(self, *args, **kwargs):
+        return await self.run_async(self.get_agent_balance, *args, **kwargs)
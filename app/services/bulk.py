@@ -0,0 +1,144 @@
+"""
+Bulk recharge/redeem across providers.
+Items are grouped by provider and worked off by a few lanes per provider.
+A lane runs one item at a time on the provider's category executor and
+queues its next item when the current one finishes, so a batch reuses at
+most one pooled session per lane and logs in at most once per lane instead
+of once per item.
+"""
+# app/services/bulk.py
+import logging
+import queue
+from collections import deque
+from contextlib import nullcontext
+from app.services.balance_cache import balance_cache
+from app.services.executor import operation_executor
+from app.services.operations import succeeded
+from app.services.session_pool import session_pool
+from app.services.provider_limiter import ProviderBusyError, provider_limiter
+
+logger = logging.getLogger("automater")
+
+TRANSFERS = ("recharge", "redeem")
+
+
+def _describe(result):
+    if isinstance(result, dict):
+        return result.get("error") or result.get("message")
+    return "Operation failed"
+
+
+class BulkRunner:
+    """
+    Runs bulk transfer items with bounded per-provider parallelism.
+
+    Each provider gets at most max_per_provider lanes, further capped by the
+    provider's max_in_flight lane limit. Items run on the shared category
+    executors, so each one gets its action's timeout and shows in the
+    executor's queue metrics.
+    """
+
+    def __init__(self, max_items=500, max_per_provider=4):
+        self.max_items = max_items
+        self.max_per_provider = max_per_provider
+
+    def init_app(self, app):
+        """Read batch size and concurrency limits from the app config."""
+        self.max_items = app.config.get("BULK_MAX_ITEMS", self.max_items)
+        self.max_per_provider = app.config.get("BULK_MAX_PER_PROVIDER", self.max_per_provider)
+
+    def workers_for(self, provider, pending):
+        """Number of lanes to start for a provider with `pending` items."""
+        limit = provider_limiter.limits(provider)["max_in_flight"] if provider_limiter.enabled else 0
+        workers = min(self.max_per_provider, limit) if limit > 0 else self.max_per_provider
+        return max(1, min(workers, pending))
+
+    def run(self, jobs, app=None):
+        """
+        Execute jobs and yield one result dict per job, in completion order.
+
+        jobs is a list of (index, provider, item) where item carries username,
+        amount and op. Each result has index, provider_id, username, op, ok and
+        either result (the service's response) or error. When app is given,
+        items run inside its application context.
+        """
+        by_provider = {}
+        for index, provider, item in jobs:
+            provider_jobs = by_provider.setdefault(provider.id, (provider, deque()))[1]
+            provider_jobs.append((index, item))
+        if not by_provider:
+            return
+
+        results = queue.Queue()
+        lanes = [
+            (provider, pending)
+            for provider, pending in by_provider.values()
+            for _ in range(self.workers_for(provider, len(pending)))
+        ]
+        try:
+            for provider, pending in lanes:
+                self._next(provider, pending, results, app)
+            for _ in range(len(jobs)):
+                yield results.get()
+        finally:
+            # Stop handing out items if the client went away; in-flight ones finish.
+            for _, pending in by_provider.values():
+                pending.clear()
+
+    def _next(self, provider, pending, results, app):
+        """Submit the lane's next item; its completion submits the one after."""
+        while True:
+            try:
+                index, item = pending.popleft()
+            except IndexError:
+                return
+            outcome = {"index": index, "provider_id": provider.id, "username": item["username"], "op": item["op"]}
+            try:
+                with app.app_context() if app is not None else nullcontext():
+                    future = operation_executor.submit(provider, item["op"], self._transfer, provider, item)
+            except ProviderBusyError as e:
+                # Never sent; report it and move on to the lane's next item.
+                outcome.update(ok=False, error=str(e))
+                results.put(outcome)
+                continue
+            future.add_done_callback(lambda future, item=item, outcome=outcome: self._finish(future, provider, item, outcome, pending, results, app))
+            return
+
+    def _finish(self, future, provider, item, outcome, pending, results, app):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"[{provider.name}] Bulk {item['op']} for {item['username']} failed: {error}")
+            outcome.update(ok=False, error=str(error))
+        else:
+            outcome.update(ok=succeeded(item["op"], future.result()), result=future.result())
+        balance_cache.invalidate(provider.id, item["username"])
+        results.put(outcome)
+        self._next(provider, pending, results, app)
+
+    @staticmethod
+    def _transfer(provider, item):
+        with session_pool.lease(provider) as service:
+            return getattr(service, item["op"])(item["username"], item["amount"])
+
+    @staticmethod
+    def summarize(outcomes):
+        """Partial-failure report for a finished batch."""
+        failed = sorted((outcome for outcome in outcomes if not outcome["ok"]), key=lambda outcome: outcome["index"])
+        return {
+            "total": len(outcomes),
+            "succeeded": len(outcomes) - len(failed),
+            "failed": len(failed),
+            "failures": [
+                {
+                    "index": outcome["index"],
+                    "provider_id": outcome["provider_id"],
+                    "username": outcome["username"],
+                    "op": outcome["op"],
+                    "error": outcome.get("error") or _describe(outcome.get("result")),
+                }
+                for outcome in failed
+            ],
+        }
+
+
+bulk_runner = BulkRunner()
@@ -0,0 +1,237 @@
+"""
+CAPTCHA solving backends and per-provider reservoirs of pre-solved captchas.
+Category2 and Category3 logins take a ready answer from the reservoir instead
+of waiting 10-40 s for an inline solve.
+"""
+# app/services/captcha.py
+import base64
+import logging
+import threading
+import time
+from collections import deque
+from twocaptcha import TwoCaptcha
+
+logger = logging.getLogger("automater")
+
+PLACEHOLDER_API_KEYS = ("", "your-2captcha-api-key-here", "your_actual_2captcha_api_key", "your_2captcha_api_key")
+
+
+class CaptchaSolver:
+    """Interface for captcha solving backends."""
+
+    def solve(self, image):
+        """Return the captcha text for raw image bytes, or None if unsolved."""
+        raise NotImplementedError("Subclasses must implement solve method")
+
+
+class TwoCaptchaSolver(CaptchaSolver):
+    """Solver backed by the 2Captcha service."""
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+
+    def solve(self, image):
+        if not self.api_key or self.api_key in PLACEHOLDER_API_KEYS:
+            raise ValueError("CAPTCHA_API_KEY not set in config")
+        result = TwoCaptcha(self.api_key).normal(base64.b64encode(image).decode())
+        return result["code"]
+
+
+class FallbackCaptchaSolver(CaptchaSolver):
+    """Tries each solver in order and returns the first answer."""
+
+    def __init__(self, solvers):
+        self.solvers = list(solvers)
+
+    def solve(self, image):
+        error = None
+        for solver in self.solvers:
+            try:
+                code = solver.solve(image)
+            except Exception as e:
+                logger.warning(f"{type(solver).__name__} failed: {e}")
+                error = e
+                continue
+            if code:
+                return code
+        if error is not None:
+            raise error
+        return None
+
+
+class CaptchaEntry:
+    """A solved captcha plus the context (t value or session cookies) it is bound to."""
+
+    def __init__(self, code, context, expires_at):
+        self.code = code
+        self.context = context
+        self.expires_at = expires_at
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+class CaptchaReservoir:
+    """Keeps up to `depth` solved captchas for one provider, refilled in the background."""
+
+    def __init__(self, name, fetch, solver, depth=2, ttl=90, idle_timeout=600, retry_delay=5):
+        """
+        Args:
+            name: Provider name used in log messages.
+            fetch: Callable returning (image_bytes, context) for a fresh captcha.
+            solver: CaptchaSolver used to answer fetched captchas.
+            depth: Number of solved captchas to keep ready.
+            ttl: Seconds a solved captcha stays usable.
+            idle_timeout: Stop refilling after this many seconds without a take.
+            retry_delay: Seconds to back off after a failed fetch or solve.
+        """
+        self.name = name
+        self.fetch = fetch
+        self.solver = solver
+        self.depth = depth
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self.retry_delay = retry_delay
+        self._entries = deque()
+        self._condition = threading.Condition()
+        self._last_take = time.monotonic()
+        self._thread = None
+        self._stopped = False
+
+    def __len__(self):
+        with self._condition:
+            self._purge_locked()
+            return len(self._entries)
+
+    def take(self):
+        """Return the oldest unexpired solved captcha, or None if none is ready."""
+        with self._condition:
+            self._last_take = time.monotonic()
+            self._purge_locked()
+            entry = self._entries.popleft() if self._entries else None
+            self._condition.notify()
+        return entry
+
+    def fill_one(self):
+        """Fetch and solve one captcha synchronously; returns the entry or None."""
+        try:
+            image, context = self.fetch()
+            code = self.solver.solve(image)
+        except Exception as e:
+            logger.error(f"[{self.name}] Reservoir captcha solve failed: {e}")
+            return None
+        if not code:
+            return None
+        entry = CaptchaEntry(code, context, time.monotonic() + self.ttl)
+        with self._condition:
+            self._entries.append(entry)
+        return entry
+
+    def start(self):
+        """Start the background refill thread if it is not running."""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=f"captcha-reservoir-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the refill thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def _purge_locked(self):
+        while self._entries and self._entries[0].expired:
+            self._entries.popleft()
+
+    def _needs_refill_locked(self):
+        self._purge_locked()
+        idle = time.monotonic() - self._last_take > self.idle_timeout
+        return not idle and len(self._entries) < self.depth
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and not self._needs_refill_locked():
+                    # Wake up for takes and for the next expiry.
+                    timeout = self._entries[0].expires_at - time.monotonic() if self._entries else self.ttl
+                    self._condition.wait(timeout=max(timeout, 0.1))
+                if self._stopped:
+                    return
+            if self.fill_one() is None:
+                with self._condition:
+                    self._condition.wait(timeout=self.retry_delay)
+
+
+def build_solver(config):
+    """Local recognizer first (when a trained model is configured), then 2Captcha."""
+    remote = TwoCaptchaSolver(config.get("CAPTCHA_API_KEY"))
+    model_path = config.get("CAPTCHA_MODEL_PATH")
+    if not model_path:
+        return remote
+    try:
+        # NumPy/Pillow are only needed when the local recognizer is enabled.
+        from .captcha_recognizer import LocalCaptchaSolver
+        local = LocalCaptchaSolver.from_model(
+            model_path,
+            lengths=config.get("CAPTCHA_LENGTHS", (4, 5)),
+            min_confidence=config.get("CAPTCHA_MIN_CONFIDENCE", 1.0),
+        )
+    except (ImportError, OSError, ValueError) as e:
+        logger.error(f"Local captcha recognizer unavailable, using 2Captcha only: {e}")
+        return remote
+    return FallbackCaptchaSolver([local, remote])
+
+
+class CaptchaReservoirs:
+    """Registry of reservoirs keyed by Provider.id."""
+
+    def __init__(self, depth=2, ttl=90, idle_timeout=600, enabled=True):
+        self.depth = depth
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self.enabled = enabled
+        self.solver = TwoCaptchaSolver(None)
+        self._reservoirs = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read reservoir settings and build the configured solver."""
+        self.depth = app.config.get("CAPTCHA_RESERVOIR_DEPTH", self.depth)
+        self.ttl = app.config.get("CAPTCHA_RESERVOIR_TTL", self.ttl)
+        self.idle_timeout = app.config.get("CAPTCHA_RESERVOIR_IDLE_TIMEOUT", self.idle_timeout)
+        self.enabled = app.config.get("CAPTCHA_RESERVOIR_ENABLED", self.enabled)
+        self.solver = build_solver(app.config)
+
+    def get(self, service):
+        """Return the reservoir for the service's provider, creating and starting it."""
+        provider = service.provider
+        with self._lock:
+            reservoir = self._reservoirs.get(provider.id)
+            if reservoir is None:
+                reservoir = self._reservoirs[provider.id] = CaptchaReservoir(
+                    provider.name,
+                    service._fetch_captcha,
+                    self.solver,
+                    depth=self.depth,
+                    ttl=self.ttl,
+                    idle_timeout=self.idle_timeout,
+                )
+        reservoir.start()
+        return reservoir
+
+    def take(self, service):
+        """Take a pre-solved captcha for the service's provider, or None."""
+        if not self.enabled:
+            return None
+        return self.get(service).take()
+
+    def solve(self, image):
+        """Solve a captcha inline with the configured solver."""
+        return self.solver.solve(image)
+
+
+captcha_reservoirs = CaptchaReservoirs()
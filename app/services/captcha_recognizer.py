@@ -0,0 +1,225 @@
+"""
+Offline recognizer for the short numeric image captchas used by Category2
+(/api/agent/captcha) and Category3 (/Tools/VerifyImagePage.aspx) providers.
+Segments digits with NumPy column projections and classifies each glyph with a
+k-nearest-neighbour model trained from labelled samples.
+"""
+# app/services/captcha_recognizer.py
+import io
+import logging
+import os
+import numpy as np
+from PIL import Image
+from .captcha import CaptchaSolver
+
+logger = logging.getLogger("automater")
+
+GLYPH_SHAPE = (16, 12)  # rows, columns of a normalised digit
+
+
+def load_image(image):
+    """Decode image bytes into a 2-D float array of grey levels in [0, 1]."""
+    with Image.open(io.BytesIO(image)) as img:
+        return np.asarray(img.convert("L"), dtype=np.float32) / 255.0
+
+
+def binarize(gray, min_stroke=2):
+    """
+    Return a boolean ink mask using Otsu's threshold; ink is the minority tone.
+
+    Strokes thinner than min_stroke pixels (interference lines, salt noise) are
+    removed with a morphological opening.
+    """
+    histogram, _ = np.histogram(gray, bins=256, range=(0.0, 1.0))
+    levels = np.arange(256)
+    weight = np.cumsum(histogram)
+    total = weight[-1]
+    mean = np.cumsum(histogram * levels)
+    background = total - weight
+    valid = (weight > 0) & (background > 0)
+    between = np.zeros(256)
+    between[valid] = (mean[-1] * weight[valid] - mean[valid] * total) ** 2 / (weight[valid] * background[valid])
+    threshold = (np.argmax(between) + 0.5) / 256.0
+    mask = gray < threshold
+    if mask.mean() > 0.5:
+        mask = ~mask
+    return _open(mask, min_stroke) if min_stroke > 1 else mask
+
+
+def _open(mask, size):
+    """Morphological opening with a size x size square: erode, then dilate."""
+    rows, columns = mask.shape
+    eroded = np.ones((rows - size + 1, columns - size + 1), dtype=bool)
+    for dy in range(size):
+        for dx in range(size):
+            eroded &= mask[dy:rows - size + 1 + dy, dx:columns - size + 1 + dx]
+    opened = np.zeros_like(mask)
+    for dy in range(size):
+        for dx in range(size):
+            opened[dy:rows - size + 1 + dy, dx:columns - size + 1 + dx] |= eroded
+    return opened
+
+
+def segment(mask, expected_length=None, min_width=2):
+    """
+    Split an ink mask into per-digit glyphs using the column projection.
+
+    Args:
+        mask: Boolean ink mask.
+        expected_length: If given, over-wide runs are split (and tiny ones
+            dropped) until this many glyphs remain.
+        min_width: Runs narrower than this many columns are treated as noise.
+
+    Returns:
+        List of boolean glyph arrays cropped to their ink.
+    """
+    ink_columns = mask.any(axis=0)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], ink_columns.astype(np.int8), [0]))))
+    runs = [(start, end) for start, end in zip(edges[::2], edges[1::2]) if end - start >= min_width]
+    if expected_length:
+        while runs and len(runs) < expected_length:
+            # Touching digits: split the widest run in half.
+            widest = max(range(len(runs)), key=lambda i: runs[i][1] - runs[i][0])
+            start, end = runs[widest]
+            if end - start < 2 * min_width:
+                break
+            middle = (start + end) // 2
+            runs[widest:widest + 1] = [(start, middle), (middle, end)]
+        while len(runs) > expected_length:
+            # Leftover noise: drop the run with the least ink.
+            del runs[min(range(len(runs)), key=lambda i: mask[:, runs[i][0]:runs[i][1]].sum())]
+    glyphs = []
+    for start, end in runs:
+        columns = mask[:, start:end]
+        rows = np.flatnonzero(columns.any(axis=1))
+        glyphs.append(columns[rows[0]:rows[-1] + 1])
+    return glyphs
+
+
+def normalize(glyph, shape=GLYPH_SHAPE):
+    """Resize a glyph to a fixed shape (nearest neighbour) and flatten it."""
+    rows = (np.arange(shape[0]) * glyph.shape[0] / shape[0]).astype(int)
+    columns = (np.arange(shape[1]) * glyph.shape[1] / shape[1]).astype(int)
+    return glyph[rows][:, columns].astype(np.float32).ravel()
+
+
+class KNNDigitClassifier:
+    """k-nearest-neighbour classifier over normalised glyph vectors."""
+
+    def __init__(self, k=3):
+        self.k = k
+        self.vectors = np.empty((0, GLYPH_SHAPE[0] * GLYPH_SHAPE[1]), dtype=np.float32)
+        self.labels = np.empty((0,), dtype="<U1")
+
+    def fit(self, vectors, labels):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype="<U1")
+        return self
+
+    def predict(self, vectors):
+        """Return (labels, confidences) for a batch of glyph vectors."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        # Squared euclidean distances via |a|^2 - 2ab + |b|^2.
+        distances = (
+            (vectors ** 2).sum(axis=1)[:, None]
+            - 2 * vectors @ self.vectors.T
+            + (self.vectors ** 2).sum(axis=1)[None, :]
+        )
+        k = min(self.k, len(self.labels))
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        labels, confidences = [], []
+        for row in self.labels[nearest]:
+            values, counts = np.unique(row, return_counts=True)
+            best = np.argmax(counts)
+            labels.append(values[best])
+            confidences.append(counts[best] / k)
+        return labels, confidences
+
+    def save(self, path):
+        np.savez_compressed(path, vectors=self.vectors, labels=self.labels, k=self.k)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(k=int(data["k"])).fit(data["vectors"], data["labels"])
+
+
+class DigitCaptchaRecognizer:
+    """Reads numeric captchas: binarize, segment, classify each digit."""
+
+    def __init__(self, classifier=None, lengths=(4, 5)):
+        self.classifier = classifier or KNNDigitClassifier()
+        self.lengths = tuple(lengths)
+
+    def _glyphs(self, image, expected_length=None):
+        return segment(binarize(load_image(image)), expected_length=expected_length)
+
+    def train(self, samples):
+        """
+        Fit the classifier from (image_bytes, answer) pairs.
+
+        Samples whose segmentation does not yield one glyph per digit are skipped.
+        Returns the number of samples used.
+        """
+        vectors, labels, used = [], [], 0
+        for image, answer in samples:
+            glyphs = self._glyphs(image, expected_length=len(answer))
+            if len(glyphs) != len(answer):
+                continue
+            vectors.extend(normalize(glyph) for glyph in glyphs)
+            labels.extend(answer)
+            used += 1
+        if not vectors:
+            raise ValueError("No usable training samples")
+        self.classifier.fit(vectors, labels)
+        return used
+
+    def recognize(self, image):
+        """Return (text, confidence); confidence is the weakest digit's vote share."""
+        glyphs = self._glyphs(image)
+        if len(glyphs) not in self.lengths:
+            # Retry with the closest plausible length to split touching digits.
+            expected = min(self.lengths, key=lambda length: abs(length - len(glyphs)))
+            glyphs = self._glyphs(image, expected_length=expected)
+        if not glyphs:
+            return "", 0.0
+        labels, confidences = self.classifier.predict([normalize(glyph) for glyph in glyphs])
+        return "".join(labels), float(min(confidences))
+
+    def save(self, path):
+        self.classifier.save(path)
+
+    @classmethod
+    def load(cls, path, lengths=(4, 5)):
+        return cls(KNNDigitClassifier.load(path), lengths=lengths)
+
+
+def load_labelled_samples(directory):
+    """Read (image_bytes, answer) pairs from files named '<answer>_<anything>.<ext>'."""
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        answer = name.split("_")[0].split(".")[0]
+        if not answer.isdigit():
+            continue
+        with open(os.path.join(directory, name), "rb") as f:
+            samples.append((f.read(), answer))
+    return samples
+
+
+class LocalCaptchaSolver(CaptchaSolver):
+    """Offline solver; declines (returns None) when it is not confident."""
+
+    def __init__(self, recognizer, min_confidence=1.0):
+        self.recognizer = recognizer
+        self.min_confidence = min_confidence
+
+    @classmethod
+    def from_model(cls, path, lengths=(4, 5), min_confidence=1.0):
+        return cls(DigitCaptchaRecognizer.load(path, lengths=lengths), min_confidence=min_confidence)
+
+    def solve(self, image):
+        text, confidence = self.recognizer.recognize(image)
+        if len(text) not in self.recognizer.lengths or confidence < self.min_confidence:
+            logger.info(f"Local captcha recognizer declined ({text!r}, confidence {confidence:.2f})")
+            return None
+        return text
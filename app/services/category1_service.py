@@ -3,23 +3,21 @@ Service class for Category 1 game providers (e.g., Gameroom).
 Handles token-based authentication and operations.
 """
 
-import time
 from flask import current_app
 from .base_service import BaseGameService
-import requests
 from bs4 import BeautifulSoup
 
 class Category1Service(BaseGameService):
     """Service for Category 1 providers."""
     def __init__(self, provider):
-        self.provider = provider
-        self.session = requests.Session()
+        super().__init__(provider)
         self.logger = current_app.logger
         self._load_cached_token()
 
     def _load_cached_token(self):
         cached_token = current_app.config.get(f"TOKEN_{self.provider.id}")
-        if cached_token:
+        # Headers shared through the cache may carry a newer token from another worker.
+        if cached_token and "Authorization" not in self.session.headers:
             self.session.headers["Authorization"] = f"Bearer {cached_token}"
 
     def _save_cached_token(self, token):
@@ -45,18 +43,19 @@ class Category1Service(BaseGameService):
                     self.logger.warning(f"[{self.provider.name}] Login failed: {data}")
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Login error: {e}")
-            time.sleep(retry_delay)
+            self._sleep(retry_delay)
         self.logger.error(f"[{self.provider.name}] Max login attempts reached")
         return {"message": "Login failed", "error": "Max attempts reached"}
 
     @BaseGameService.retry_on_failure()
     def get_balances(self, username, max_retries=3, retry_delay=2):
-        user_response = self._search_user(username, max_retries, retry_delay)
+        # The score comes from the search itself, so never answer from the id cache.
+        user_response = self._search_user(username, max_retries, retry_delay, use_cache=False)
         if not user_response["user_id"]:
             return {"message": "User not found", "error": user_response["error"]}
         return {"message": "Balance fetched", "balance": str(user_response["balance"])}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def add_user(self, username, password, max_retries=3, retry_delay=2):
         payload = {
             "username": username,
@@ -70,15 +69,24 @@ class Category1Service(BaseGameService):
                 self.logger.info(f"Add user response: {data}")
                 if data.get("message") == "Insert successful":
                     self.logger.info(f"[{self.provider.name}] User {username} created")
+                    if data.get("user_id"):
+                        self._remember_user_ids(username, user_id=data["user_id"])
+                    else:
+                        self._forget_user_ids(username)
                     return {"message": "User created", "user_id": data.get("user_id"), "username": username}
                 return {"message": "Failed to add user", "error": data.get("message")}
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Add user error: {str(e)}")
-                time.sleep(retry_delay)
+                if not self._retry_pause(e, retry_delay, idempotent=False):
+                    # The provider may already have applied it; do not send it twice.
+                    return {"message": "Failed to add user", "error": str(e)}
         return {"message": "Failed to add user", "error": "Max retries reached"}
 
     @BaseGameService.retry_on_failure()
-    def _search_user(self, username, max_retries=3, retry_delay=2):
+    def _search_user(self, username, max_retries=3, retry_delay=2, use_cache=True):
+        cached = self._cached_user_ids(username) if use_cache else None
+        if cached:
+            return {"user_id": cached["user_id"], "balance": None, "error": None}
         for attempt in range(max_retries):
             try:
                 params = {"account": username}
@@ -88,11 +96,14 @@ class Category1Service(BaseGameService):
                 if data.get("message") == "Query successful" and data.get("data"):
                     user = data["data"][0]
                     self.logger.info(f"[{self.provider.name}] User {username} found, ID: {user['Id']}")
+                    self._remember_user_ids(username, user_id=user["Id"])
                     return {"user_id": user["Id"], "balance": user.get("score", "0"), "error": None}
+                self._forget_user_ids(username)
                 return {"user_id": None, "balance": None, "error": "User not found"}
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Search error: {str(e)}")
-                time.sleep(retry_delay)
+                if not self._retry_pause(e, retry_delay):
+                    return {"user_id": None, "balance": None, "error": str(e)}
         return {"user_id": None, "balance": None, "error": "Max retries reached"}
 
     @BaseGameService.retry_on_failure()
@@ -108,6 +119,7 @@ class Category1Service(BaseGameService):
                     balance = balance_element.text.strip()
                     self.logger.info(f"[{self.provider.name}] Agent balance scraped: {balance}")
                     if balance and balance != "0":  # Avoid initial 0
+                        self._record_agent_balance(balance)
                         return {"message": "Agent balance fetched", "balance": balance}
                 
                 # Fallback to API
@@ -117,79 +129,88 @@ class Category1Service(BaseGameService):
                 balance = data.get("money", None)
                 if balance is not None:
                     self.logger.info(f"[{self.provider.name}] Agent balance via API: {balance}")
+                    self._record_agent_balance(balance)
                     return {"message": "Agent balance fetched", "balance": str(balance)}
                 return {"message": "Balance not found", "error": "No balance in response"}
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Error fetching agent balance: {str(e)}")
-                time.sleep(retry_delay)
+                if not self._retry_pause(e, retry_delay):
+                    return {"message": "Failed to fetch agent balance", "error": str(e)}
         return {"message": "Failed to fetch agent balance", "error": "Max retries reached"}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def recharge(self, username, amount, max_retries=3, retry_delay=2):
         user_response = self._search_user(username)
         if not user_response["user_id"]:
             return {"message": "User not found", "error": user_response["error"]}
         
         user_id = user_response["user_id"]
-        agent_balance_response = self.get_agent_balance()
-        if "error" in agent_balance_response:
-            return {"message": "Failed to get agent balance", "error": agent_balance_response["error"]}
 
-        payload = {
-            "id": user_id,
-            "available_balance": agent_balance_response["balance"],
-            "opera_type": 0,  # Recharge
-            "bonus": 0,
-            "balance": amount,
-            "remark": ""
-        }
-        for attempt in range(max_retries):
-            try:
-                response = self._make_request("POST", "/api/player/agentRecharge", json=payload)
-                data = response.json()
-                self.logger.info(f"Recharge response: {data}")
-                if data.get("message") == "Recharge successful":
-                    self.logger.info(f"[{self.provider.name}] Recharge successful for {username}")
-                    return {"message": "Recharged successfully"}
-                return {"message": "Failed to recharge", "error": data.get("message")}
-            except Exception as e:
-                self.logger.error(f"[{self.provider.name}] Recharge error: {str(e)}")
-                time.sleep(retry_delay)
-        return {"message": "Failed to recharge", "error": "Max retries reached"}
+        def transfer(agent_balance):
+            payload = {
+                "id": user_id,
+                "available_balance": agent_balance,
+                "opera_type": 0,  # Recharge
+                "bonus": 0,
+                "balance": amount,
+                "remark": ""
+            }
+            for attempt in range(max_retries):
+                try:
+                    response = self._make_request("POST", "/api/player/agentRecharge", json=payload)
+                    data = response.json()
+                    self.logger.info(f"Recharge response: {data}")
+                    if data.get("message") == "Recharge successful":
+                        self.logger.info(f"[{self.provider.name}] Recharge successful for {username}")
+                        return {"message": "Recharged successfully"}, True
+                    # A rejected id may be stale; search again next time.
+                    self._forget_user_ids(username)
+                    return {"message": "Failed to recharge", "error": data.get("message")}, False
+                except Exception as e:
+                    self.logger.error(f"[{self.provider.name}] Recharge error: {str(e)}")
+                    if not self._retry_pause(e, retry_delay, idempotent=False):
+                        # The provider may already have applied it; do not send it twice.
+                        return {"message": "Failed to recharge", "error": str(e)}, None
+            return {"message": "Failed to recharge", "error": "Max retries reached"}, None
 
-    @BaseGameService.retry_on_failure()
+        return self._transfer_with_agent_balance(transfer, -float(amount))
+
+    @BaseGameService.retry_on_failure(idempotent=False)
     def redeem(self, username, amount, max_retries=3, retry_delay=2):
         user_response = self._search_user(username)
         if not user_response["user_id"]:
             return {"message": "User not found", "error": user_response["error"]}
         
         user_id = user_response["user_id"]
-        agent_balance_response = self.get_agent_balance()
-        if "error" in agent_balance_response:
-            return {"message": "Failed to get agent balance", "error": agent_balance_response["error"]}
 
-        payload = {
-            "id": user_id,
-            "customer_balance": agent_balance_response["balance"],
-            "opera_type": 1,  # Withdraw
-            "balance": amount,
-            "remark": ""
-        }
-        for attempt in range(max_retries):
-            try:
-                response = self._make_request("POST", "/api/player/agentWithdraw", json=payload)
-                data = response.json()
-                self.logger.info(f"Redeem response: {data}")
-                if data.get("message") == "Withdraw successful":
-                    self.logger.info(f"[{self.provider.name}] Redeem successful for {username}")
-                    return {"message": "Redeemed successfully"}
-                return {"message": "Failed to redeem", "error": data.get("message")}
-            except Exception as e:
-                self.logger.error(f"[{self.provider.name}] Redeem error: {str(e)}")
-                time.sleep(retry_delay)
-        return {"message": "Failed to redeem", "error": "Max retries reached"}
+        def transfer(agent_balance):
+            payload = {
+                "id": user_id,
+                "customer_balance": agent_balance,
+                "opera_type": 1,  # Withdraw
+                "balance": amount,
+                "remark": ""
+            }
+            for attempt in range(max_retries):
+                try:
+                    response = self._make_request("POST", "/api/player/agentWithdraw", json=payload)
+                    data = response.json()
+                    self.logger.info(f"Redeem response: {data}")
+                    if data.get("message") == "Withdraw successful":
+                        self.logger.info(f"[{self.provider.name}] Redeem successful for {username}")
+                        return {"message": "Redeemed successfully"}, True
+                    self._forget_user_ids(username)
+                    return {"message": "Failed to redeem", "error": data.get("message")}, False
+                except Exception as e:
+                    self.logger.error(f"[{self.provider.name}] Redeem error: {str(e)}")
+                    if not self._retry_pause(e, retry_delay, idempotent=False):
+                        # The provider may already have applied it; do not send it twice.
+                        return {"message": "Failed to redeem", "error": str(e)}, None
+            return {"message": "Failed to redeem", "error": "Max retries reached"}, None
 
-    @BaseGameService.retry_on_failure()
+        return self._transfer_with_agent_balance(transfer, float(amount))
+
+    @BaseGameService.retry_on_failure(idempotent=False)
     def change_password(self, username, new_password, max_retries=3, retry_delay=2):
         user_response = self._search_user(username)
         if not user_response["user_id"]:
@@ -209,8 +230,11 @@ class Category1Service(BaseGameService):
                 if data.get("message") == "Reset successful":
                     self.logger.info(f"[{self.provider.name}] Password reset for {username}")
                     return {"message": "Password changed successfully"}
+                self._forget_user_ids(username)
                 return {"message": "Failed to change password", "error": data.get("message")}
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Password reset error: {str(e)}")
-                time.sleep(retry_delay)
+                if not self._retry_pause(e, retry_delay, idempotent=False):
+                    # The provider may already have applied it; do not send it twice.
+                    return {"message": "Failed to change password", "error": str(e)}
         return {"message": "Failed to change password", "error": "Max retries reached"}
\ No newline at end of file
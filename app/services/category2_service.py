@@ -4,10 +4,11 @@ Handles CAPTCHA solving and token-based authentication.
 """
 # app/services/category2_service.py
 import random
-import time
-from twocaptcha import TwoCaptcha
+import requests
 from flask import current_app
 from .base_service import BaseGameService
+from .async_transport import run_blocking
+from .captcha import captcha_reservoirs
 
 class Category2Service(BaseGameService):
     """Service for Category 2 providers."""
@@ -16,19 +17,31 @@ class Category2Service(BaseGameService):
         """Generate a random 8-digit number for CAPTCHA."""
         return random.randint(10000000, 99999999)
 
+    def _fetch_captcha(self):
+        """Download a fresh CAPTCHA image; its answer is bound to the t value."""
+        t_value = self._generate_t_value()
+        response = requests.get(
+            f"{self.base_url}/api/agent/captcha",
+            params={"t": t_value},
+            headers=self.DEFAULT_HEADERS,
+            timeout=15,
+        )
+        response.raise_for_status()
+        return response.content, {"t": t_value}
+
     def solve_captcha(self):
+        entry = captcha_reservoirs.take(self)
+        if entry:
+            self.logger.info(f"[{self.provider.name}] Using pre-solved CAPTCHA")
+            return entry.code, entry.context["t"]
         t_value = self._generate_t_value()
-        captcha_url = f"{self.base_url}/api/agent/captcha?t={t_value}"
-        self.logger.info(f"[{self.provider.name}] Fetching CAPTCHA from: {captcha_url}")
         try:
-            from flask import current_app  # Import is here to ensure app context
-            api_key = current_app.config.get('CAPTCHA_API_KEY')
-            if not api_key or api_key == "your_actual_2captcha_api_key":
-                raise ValueError("CAPTCHA_API_KEY not set in config")
-            solver = TwoCaptcha(api_key)
-            result = solver.normal(captcha_url)
-            self.logger.info(f"[{self.provider.name}] CAPTCHA solved: {result['code']}")
-            return result['code'], t_value
+            image, context = run_blocking(self._fetch_captcha)
+            t_value = context["t"]
+            self.logger.info(f"[{self.provider.name}] Solving CAPTCHA inline for t={t_value}")
+            code = run_blocking(captcha_reservoirs.solve, image)
+            self.logger.info(f"[{self.provider.name}] CAPTCHA solved: {code}")
+            return code, t_value
         except Exception as e:
             self.logger.error(f"[{self.provider.name}] CAPTCHA solving failed: {e}")
             return None, t_value # Return tuple to avoid unpacking error
@@ -58,11 +71,11 @@ class Category2Service(BaseGameService):
                         return {"message": "Login successful", "token": token}
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Login error: {e}")
-            time.sleep(retry_delay)
+            self._sleep(retry_delay)
         self.logger.error(f"[{self.provider.name}] Max login attempts reached")
         return {"message": "Login failed", "error": "Max attempts reached"}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def add_user(self, username, password):
         """Add a new user to the provider."""
         payload = {
@@ -75,11 +88,13 @@ class Category2Service(BaseGameService):
             data = response.json()
             if data.get("msg") == "success":
                 self.logger.info(f"[{self.provider.name}] User {username} added successfully")
+                # A re-created account gets a new id.
+                self._forget_user_ids(username)
                 return {"message": "User created", "username": username}
             return {"message": "Failed to add user", "error": data.get("msg")}
         return {"message": "Failed to add user", "error": response.text}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def recharge(self, username, amount):
         """Recharge a user's account."""
         user_id_response = self._search_user(username)
@@ -92,10 +107,12 @@ class Category2Service(BaseGameService):
             if data.get("msg") == "success":
                 self.logger.info(f"[{self.provider.name}] Recharge successful for {username}")
                 return {"message": "Recharged successfully"}
+            # A rejected id may be stale; search again next time.
+            self._forget_user_ids(username)
             return {"message": "Failed to recharge", "error": data.get("msg")}
         return {"message": "Failed to recharge", "error": response.text}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def redeem(self, username, amount):
         """Redeem funds from a user's account."""
         user_id_response = self._search_user(username)
@@ -108,10 +125,11 @@ class Category2Service(BaseGameService):
             if data.get("msg") == "success":
                 self.logger.info(f"[{self.provider.name}] Redeem successful for {username}")
                 return {"message": "Redeemed successfully"}
+            self._forget_user_ids(username)
             return {"message": "Failed to redeem", "error": data.get("msg")}
         return {"message": "Failed to redeem", "error": response.text}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def change_password(self, username, new_password):
         """Change a user's password."""
         user_id_response = self._search_user(username)
@@ -124,6 +142,7 @@ class Category2Service(BaseGameService):
             if data.get("msg") == "success":
                 self.logger.info(f"[{self.provider.name}] Password changed for {username}")
                 return {"message": "Password changed successfully"}
+            self._forget_user_ids(username)
             return {"message": "Failed to change password", "error": data.get("msg")}
         return {"message": "Failed to change password", "error": response.text}
 
@@ -140,6 +159,7 @@ class Category2Service(BaseGameService):
             if data.get("msg") == "success":
                 self.logger.info(f"[{self.provider.name}] Balance fetched for {username}")
                 return {"message": "Balance fetched", "balance": data["data"]["t"]}
+            self._forget_user_ids(username)
             return {"message": "Failed to fetch balance", "error": data.get("msg")}
         return {"message": "Failed to fetch balance", "error": response.text}
 
@@ -161,13 +181,19 @@ class Category2Service(BaseGameService):
 
     @BaseGameService.retry_on_failure()
     def _search_user(self, username):
-        """Search for a user by username."""
+        """Search for a user by username, answering from the id cache when possible."""
+        cached = self._cached_user_ids(username)
+        if cached:
+            return {"user_id": cached["user_id"], "error": None}
         payload = {"type": 1, "search": username}
         response = self._make_request("POST", "/api/user/userList", json=payload)
         if response.ok:
             data = response.json()
             if data.get("msg") == "success" and data["data"]["list"]:
-                return {"user_id": data["data"]["list"][0]["user_id"], "error": None}
+                user_id = data["data"]["list"][0]["user_id"]
+                self._remember_user_ids(username, user_id=user_id)
+                return {"user_id": user_id, "error": None}
+            self._forget_user_ids(username)
             return {"user_id": None, "error": "User not found"}
         return {"user_id": None, "error": "Server unreachable"}
 
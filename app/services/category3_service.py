@@ -3,10 +3,13 @@ Service class for Category 3 game providers (e.g., Orion Stars).
 Handles web page interactions and form submissions.
 """
 import time
-from bs4 import BeautifulSoup
 import re
+import requests
 from .base_service import BaseGameService
-from twocaptcha import TwoCaptcha
+from .action_url_cache import action_url_cache
+from .async_transport import run_blocking
+from .captcha import captcha_reservoirs
+from ..utils.aspnet_form import extract_form_state
 
 class Category3Service(BaseGameService):
     """Service for Category 3 providers."""
@@ -16,26 +19,39 @@ class Category3Service(BaseGameService):
         "redeem": r"Module/AccountManager/ChangeTreasure\.aspx\?param=[A-Za-z0-9]+",
         "password": r"Module/AccountManager/ResetPassWord\.aspx\?param=[A-Za-z0-9]+",
     }
+    # AccountsList "tourl" value that links each action, and a field only its form has.
+    ACTION_TOURL = {"recharge": "0", "redeem": "1", "password": "2"}
+    ACTION_FORM_FIELDS = {"recharge": "txtAddGold", "redeem": "txtAddGold", "password": "txtConfirmPass"}
 
     def _extract_hidden_fields(self, response):
-        """Extract __VIEWSTATE and __EVENTVALIDATION from HTML."""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        viewstate = soup.find('input', {'name': '__VIEWSTATE'})['value'] if soup.find('input', {'name': '__VIEWSTATE'}) else ''
-        eventvalidation = soup.find('input', {'name': '__EVENTVALIDATION'})['value'] if soup.find('input', {'name': '__EVENTVALIDATION'}) else ''
-        viewstategenerator = soup.find('input', {'name': '__VIEWSTATEGENERATOR'})['value'] if soup.find('input', {'name': '__VIEWSTATEGENERATOR'}) else ''
+        """Extract __VIEWSTATE, __EVENTVALIDATION and __VIEWSTATEGENERATOR from HTML."""
+        fields = extract_form_state(response.text)
+        viewstate = fields["__VIEWSTATE"]
+        eventvalidation = fields["__EVENTVALIDATION"]
+        viewstategenerator = fields["__VIEWSTATEGENERATOR"]
         self.logger.debug(f"[{self.provider.name}] VIEWSTATE: {viewstate[:50]}, EVENTVALIDATION: {eventvalidation[:50]}, VIEWSTATEGENERATOR: {viewstategenerator}")
         return viewstate, eventvalidation, viewstategenerator
 
+    def _fetch_captcha(self):
+        """Download a CAPTCHA in a fresh ASP.NET session; its answer is bound to that session's cookies."""
+        session = requests.Session()
+        session.headers.update(self.DEFAULT_HEADERS)
+        try:
+            response = session.get(f"{self.base_url}/Tools/VerifyImagePage.aspx?{int(time.time())}", timeout=15)
+            response.raise_for_status()
+            return response.content, {"cookies": session.cookies.get_dict()}
+        finally:
+            session.close()
+
     def _solve_captcha(self):
-        """Solve CAPTCHA using 2Captcha."""
-        captcha_url = f"{self.base_url}/Tools/VerifyImagePage.aspx?{int(time.time())}"
-        self.logger.info(f"[{self.provider.name}] Fetching CAPTCHA from: {captcha_url}")
+        """Solve a CAPTCHA fetched in the current session."""
+        captcha_url = f"/Tools/VerifyImagePage.aspx?{int(time.time())}"
+        self.logger.info(f"[{self.provider.name}] Fetching CAPTCHA from: {self.base_url}{captcha_url}")
         try:
-            api_key = "cdfa431906375d3df98956d07371248a"  # Replace with your key
-            solver = TwoCaptcha(api_key)
-            result = solver.normal(captcha_url)
-            self.logger.info(f"[{self.provider.name}] CAPTCHA solved: {result['code']}")
-            return result['code']
+            response = self._make_request("GET", captcha_url, timeout=15)
+            code = run_blocking(captcha_reservoirs.solve, response.content)
+            self.logger.info(f"[{self.provider.name}] CAPTCHA solved: {code}")
+            return code
         except Exception as e:
             self.logger.error(f"[{self.provider.name}] CAPTCHA solving failed: {e}")
             return None
@@ -51,6 +67,44 @@ class Category3Service(BaseGameService):
         self.logger.error(f"[{self.provider.name}] Failed to extract URL for {action}")
         return None
 
+    def _open_action_form(self, username, user_id, game_id, action):
+        """
+        Open a user's action form and return (path, viewstate, eventvalidation, error).
+
+        A cached path is tried first; if the page no longer carries the form
+        it is dropped and the AccountsList postback finds the current one.
+        """
+        cached = action_url_cache.get(self.provider.id, user_id, action)
+        if cached:
+            try:
+                page = self._make_request("GET", cached)
+            except requests.HTTPError:
+                page = None
+            if page is not None and self.ACTION_FORM_FIELDS[action] in page.text:
+                viewstate, eventvalidation, _ = self._extract_hidden_fields(page)
+                if viewstate and eventvalidation:
+                    return cached, viewstate, eventvalidation, None
+            self.logger.info(f"[{self.provider.name}] Cached {action} URL for {username} is stale")
+            action_url_cache.invalidate(self.provider.id, user_id, action)
+        payload = {"tourl": self.ACTION_TOURL[action], "getpassuid": user_id, "getpassgid": game_id}
+        response = self._make_request("POST", "/Module/AccountManager/AccountsList.aspx", data=payload)
+        if not response.ok:
+            return None, None, None, "Server unreachable"
+        url = self._extract_dynamic_url(response, action)
+        if not url:
+            # The postback only links actions for a known user, so the cached ids are stale.
+            self._forget_user_ids(username)
+            return None, None, None, f"{action.capitalize()} URL not found"
+        path = url.split(self.base_url)[1]
+        page = self._make_request("GET", path)
+        if not page.ok:
+            return None, None, None, "Server unreachable"
+        viewstate, eventvalidation, _ = self._extract_hidden_fields(page)
+        if not viewstate or not eventvalidation:
+            return None, None, None, "Missing hidden fields"
+        action_url_cache.set(self.provider.id, user_id, action, path)
+        return path, viewstate, eventvalidation, None
+
     def _submit_form(self, url, payload):
         """Submit a form and return the response message."""
         response = self._make_request("POST", url, data=payload)
@@ -64,18 +118,25 @@ class Category3Service(BaseGameService):
         self.logger.error(f"[{self.provider.name}] {error_msg}")
         return error_msg
 
+    @BaseGameService.retry_on_failure()
     def login(self, username, password, max_retries=3, retry_delay=2):
         """Log in by submitting the login form."""
         for attempt in range(max_retries):
             try:
                 self.logger.info(f"[{self.provider.name}] Login attempt {attempt + 1}/{max_retries}")
+                entry = captcha_reservoirs.take(self)
+                if entry:
+                    # Continue the ASP.NET session the pre-solved captcha was issued to.
+                    self.logger.info(f"[{self.provider.name}] Using pre-solved CAPTCHA")
+                    for name, value in entry.context["cookies"].items():
+                        self.session.cookies.set(name, value)
                 response = self._make_request("GET", "/default.aspx", timeout=20)
                 viewstate, eventvalidation, viewstategenerator = self._extract_hidden_fields(response)
                 if not viewstate or not eventvalidation:
                     self.logger.error(f"[{self.provider.name}] Missing hidden fields")
                     continue
 
-                captcha_code = self._solve_captcha()
+                captcha_code = entry.code if entry else self._solve_captcha()
                 if not captcha_code:
                     continue
 
@@ -102,10 +163,11 @@ class Category3Service(BaseGameService):
                 self.logger.warning(f"[{self.provider.name}] Login failed, no success indicators found")
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Login error: {e}")
-            time.sleep(retry_delay)
+            self._sleep(retry_delay)
         self.logger.error(f"[{self.provider.name}] Max login attempts reached")
         return {"message": "Login failed", "error": "Max attempts reached"}
 
+    @BaseGameService.retry_on_failure(idempotent=False)
     def add_user(self, username, password, max_retries=3, retry_delay=2):
         """Add a new user by submitting the form."""
         url = "/Module/AccountManager/CreateAccount.aspx"
@@ -113,20 +175,19 @@ class Category3Service(BaseGameService):
             try:
                 self.logger.info(f"[{self.provider.name}] Add user attempt {attempt + 1}/{max_retries}")
                 # Fetch the form page to get hidden fields
-                response = self.session.get(f"{self.base_url}{url}")
+                response = self._make_request("GET", url)
                 self.logger.debug(f"[{self.provider.name}] GET {url} response: {response.text[:500]}")
                 if "txtLoginName" in response.text:  # Check if redirected to login
                     self.logger.error(f"[{self.provider.name}] Session expired, re-authenticating")
-                    login_result = self.login(self.provider.username, self.provider.password)
-                    if login_result["message"] != "Login successful":
+                    if not self._reauthenticate():
                         return {"message": "Failed to add user", "error": "Re-authentication failed"}
-                    response = self.session.get(f"{self.base_url}{url}")
+                    response = self._make_request("GET", url)
                     self.logger.debug(f"[{self.provider.name}] GET {url} after re-auth: {response.text[:500]}")
 
                 viewstate, eventvalidation, viewstategenerator = self._extract_hidden_fields(response)
                 if not viewstate or not eventvalidation:
                     self.logger.error(f"[{self.provider.name}] Missing hidden fields")
-                    time.sleep(retry_delay)
+                    self._sleep(retry_delay)
                     continue
 
                 payload = {
@@ -140,106 +201,93 @@ class Category3Service(BaseGameService):
                     "txtLogonPass2": password,
                 }
                 self.logger.info(f"[{self.provider.name}] Sending payload: {payload}")
-                response = self.session.post(f"{self.base_url}{url}", data=payload)
+                try:
+                    response = self._make_request("POST", url, data=payload)
+                except Exception as e:
+                    self.logger.error(f"[{self.provider.name}] Add user submit failed: {str(e)}")
+                    if not self._retry_pause(e, retry_delay, idempotent=False):
+                        # The account may have been created; do not submit the form twice.
+                        return {"message": "Failed to add user", "error": str(e)}
+                    continue
                 self.logger.debug(f"[{self.provider.name}] POST {url} response: {response.text[:500]}")
                 match = re.search(r'Alter\("([^"]+)"', response.text)
                 if match:
                     message = match.group(1)
                     if message == "Added successfully":
                         self.logger.info(f"[{self.provider.name}] User {username} added successfully")
+                        # A re-created account gets new ids.
+                        self._forget_user_ids(username)
                         return {"message": "User created", "username": username}
                     return {"message": "Failed to add user", "error": message}
                 return {"message": "Failed to add user", "error": "Failed to parse response message"}
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Add user error: {str(e)}")
-                time.sleep(retry_delay)
+                if not self._retry_pause(e, retry_delay):
+                    return {"message": "Failed to add user", "error": str(e)}
         return {"message": "Failed to add user", "error": "Max retries reached"}
 
+    @BaseGameService.retry_on_failure(idempotent=False)
     def recharge(self, username, amount):
         user_id, game_id = self._search_user(username)
         if not user_id or not game_id:
             return {"message": "User not found", "error": "Search failed"}
-        payload = {"tourl": "0", "getpassuid": user_id, "getpassgid": game_id}
-        response = self._make_request("POST", "/Module/AccountManager/AccountsList.aspx", data=payload)
-        if response.ok:
-            recharge_url = self._extract_dynamic_url(response, "recharge")
-            if not recharge_url:
-                return {"message": "Failed to recharge", "error": "Recharge URL not found"}
-            recharge_page = self._make_request("GET", recharge_url.split(self.base_url)[1])
-            if recharge_page.ok:
-                viewstate, eventvalidation, _ = self._extract_hidden_fields(recharge_page)
-                if not viewstate or not eventvalidation:
-                    return {"message": "Failed to recharge", "error": "Missing hidden fields"}
-                recharge_payload = {
-                    "__EVENTTARGET": "Button1",
-                    "__VIEWSTATE": viewstate,
-                    "__EVENTVALIDATION": eventvalidation,
-                    "txtAddGold": amount,
-                }
-                message = self._submit_form(recharge_url.split(self.base_url)[1], recharge_payload)
-                if message == "Confirmed successful":
-                    self.logger.info(f"[{self.provider.name}] Recharge successful for {username}")
-                    return {"message": "Recharged successfully"}
-                return {"message": "Failed to recharge", "error": message}
-        return {"message": "Failed to recharge", "error": "Server unreachable"}
+        recharge_path, viewstate, eventvalidation, error = self._open_action_form(username, user_id, game_id, "recharge")
+        if error:
+            return {"message": "Failed to recharge", "error": error}
+        recharge_payload = {
+            "__EVENTTARGET": "Button1",
+            "__VIEWSTATE": viewstate,
+            "__EVENTVALIDATION": eventvalidation,
+            "txtAddGold": amount,
+        }
+        message = self._submit_form(recharge_path, recharge_payload)
+        if message == "Confirmed successful":
+            self.logger.info(f"[{self.provider.name}] Recharge successful for {username}")
+            return {"message": "Recharged successfully"}
+        return {"message": "Failed to recharge", "error": message}
 
+    @BaseGameService.retry_on_failure(idempotent=False)
     def redeem(self, username, amount):
         user_id, game_id = self._search_user(username)
         if not user_id or not game_id:
             return {"message": "User not found", "error": "Search failed"}
-        payload = {"tourl": "1", "getpassuid": user_id, "getpassgid": game_id}
-        response = self._make_request("POST", "/Module/AccountManager/AccountsList.aspx", data=payload)
-        if response.ok:
-            redeem_url = self._extract_dynamic_url(response, "redeem")
-            if not redeem_url:
-                return {"message": "Failed to redeem", "error": "Redeem URL not found"}
-            redeem_page = self._make_request("GET", redeem_url.split(self.base_url)[1])
-            if redeem_page.ok:
-                viewstate, eventvalidation, _ = self._extract_hidden_fields(redeem_page)
-                if not viewstate or not eventvalidation:
-                    return {"message": "Failed to redeem", "error": "Missing hidden fields"}
-                redeem_payload = {
-                    "__EVENTTARGET": "Button1",
-                    "__VIEWSTATE": viewstate,
-                    "__EVENTVALIDATION": eventvalidation,
-                    "txtAddGold": amount,
-                }
-                message = self._submit_form(redeem_url.split(self.base_url)[1], redeem_payload)
-                if message == "Confirmed successful":
-                    self.logger.info(f"[{self.provider.name}] Redeem successful for {username}")
-                    return {"message": "Redeemed successfully"}
-                return {"message": "Failed to redeem", "error": message}
-        return {"message": "Failed to redeem", "error": "Server unreachable"}
+        redeem_path, viewstate, eventvalidation, error = self._open_action_form(username, user_id, game_id, "redeem")
+        if error:
+            return {"message": "Failed to redeem", "error": error}
+        redeem_payload = {
+            "__EVENTTARGET": "Button1",
+            "__VIEWSTATE": viewstate,
+            "__EVENTVALIDATION": eventvalidation,
+            "txtAddGold": amount,
+        }
+        message = self._submit_form(redeem_path, redeem_payload)
+        if message == "Confirmed successful":
+            self.logger.info(f"[{self.provider.name}] Redeem successful for {username}")
+            return {"message": "Redeemed successfully"}
+        return {"message": "Failed to redeem", "error": message}
 
+    @BaseGameService.retry_on_failure(idempotent=False)
     def change_password(self, username, new_password):
         user_id, game_id = self._search_user(username)
         if not user_id or not game_id:
             return {"message": "User not found", "error": "Search failed"}
-        payload = {"tourl": "2", "getpassuid": user_id, "getpassgid": game_id}
-        response = self._make_request("POST", "/Module/AccountManager/AccountsList.aspx", data=payload)
-        if response.ok:
-            password_url = self._extract_dynamic_url(response, "password")
-            if not password_url:
-                return {"message": "Failed to change password", "error": "Password URL not found"}
-            password_page = self._make_request("GET", password_url.split(self.base_url)[1])
-            if password_page.ok:
-                viewstate, eventvalidation, _ = self._extract_hidden_fields(password_page)
-                if not viewstate or not eventvalidation:
-                    return {"message": "Failed to change password", "error": "Missing hidden fields"}
-                password_payload = {
-                    "__EVENTTARGET": "Button1",
-                    "__VIEWSTATE": viewstate,
-                    "__EVENTVALIDATION": eventvalidation,
-                    "txtConfirmPass": new_password,
-                    "txtSureConfirmPass": new_password,
-                }
-                message = self._submit_form(password_url.split(self.base_url)[1], password_payload)
-                if message == "Modified success!":
-                    self.logger.info(f"[{self.provider.name}] Password changed for {username}")
-                    return {"message": "Password changed successfully"}
-                return {"message": "Failed to change password", "error": message}
-        return {"message": "Failed to change password", "error": "Server unreachable"}
+        password_path, viewstate, eventvalidation, error = self._open_action_form(username, user_id, game_id, "password")
+        if error:
+            return {"message": "Failed to change password", "error": error}
+        password_payload = {
+            "__EVENTTARGET": "Button1",
+            "__VIEWSTATE": viewstate,
+            "__EVENTVALIDATION": eventvalidation,
+            "txtConfirmPass": new_password,
+            "txtSureConfirmPass": new_password,
+        }
+        message = self._submit_form(password_path, password_payload)
+        if message == "Modified success!":
+            self.logger.info(f"[{self.provider.name}] Password changed for {username}")
+            return {"message": "Password changed successfully"}
+        return {"message": "Failed to change password", "error": message}
 
+    @BaseGameService.retry_on_failure()
     def get_balances(self, username):
         user_id, game_id = self._search_user(username)
         if not user_id or not game_id:
@@ -252,9 +300,11 @@ class Category3Service(BaseGameService):
             if match:
                 self.logger.info(f"[{self.provider.name}] Balance fetched for {username}: {match.group(1)}")
                 return {"message": "Balance fetched", "balance": match.group(1)}
+            self._forget_user_ids(username)
             return {"message": "Failed to fetch balance", "error": "Balance not found"}
         return {"message": "Failed to fetch balance", "error": "Server unreachable"}
 
+    @BaseGameService.retry_on_failure()
     def get_agent_balance(self):
         response = self._make_request("GET", "/Module/AccountManager/AccountsList.aspx")
         if response.ok:
@@ -266,8 +316,15 @@ class Category3Service(BaseGameService):
             return {"message": "Failed to fetch agent balance", "error": "Balance not found"}
         return {"message": "Failed to fetch agent balance", "error": "Server unreachable"}
 
+    def _lookup_user_ids(self, username):
+        user_id, game_id = self._search_user(username)
+        return {"user_id": user_id, "game_id": game_id} if user_id else None
+
     def _search_user(self, username, max_retries=3, retry_delay=2):
-        """Search for a user by username."""
+        """Search for a user's (UserID, GameID), answering from the id cache when possible."""
+        cached = self._cached_user_ids(username)
+        if cached:
+            return cached["user_id"], cached["game_id"]
         for attempt in range(max_retries):
             try:
                 payload = {"__EVENTTARGET": "ctl16", "txtSearch": username}
@@ -278,11 +335,14 @@ class Category3Service(BaseGameService):
                 if match:
                     user_id, game_id = match.groups()
                     self.logger.info(f"[{self.provider.name}] User {username} found - UserID: {user_id}, GameID: {game_id}")
+                    self._remember_user_ids(username, user_id=user_id, game_id=game_id)
                     return user_id, game_id
                 self.logger.warning(f"[{self.provider.name}] User {username} not found in response")
+                self._forget_user_ids(username)
                 return None, None
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Search error: {str(e)}")
-                time.sleep(retry_delay)
+                if not self._retry_pause(e, retry_delay):
+                    return None, None
         self.logger.error(f"[{self.provider.name}] Max search attempts reached for {username}")
         return None, None
\ No newline at end of file
@@ -60,11 +60,11 @@ class Category4Service(BaseGameService):
                     self.logger.warning(f"[{self.provider.name}] Login failed: {response.text[:500]}")
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Login error: {e}")
-            time.sleep(retry_delay)
+            self._sleep(retry_delay)
         self.logger.error(f"[{self.provider.name}] Max login attempts reached")
         return {"message": "Login failed", "error": "Max attempts reached"}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def add_user(self, username, password):
         """Add a new user with encrypted payload."""
         timestamp = int(time.time() * 1000)
@@ -82,7 +82,7 @@ class Category4Service(BaseGameService):
             return {"message": "Failed to add user", "error": data.get("message")}
         return {"message": "Failed to add user", "error": response.text}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def recharge(self, username, amount):
         """Recharge a user's account."""
         timestamp = int(time.time() * 1000)
@@ -101,7 +101,7 @@ class Category4Service(BaseGameService):
             return {"message": "Failed to recharge", "error": data.get("message")}
         return {"message": "Failed to recharge", "error": response.text}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def redeem(self, username, amount):
         """Redeem funds from a user's account."""
         timestamp = int(time.time() * 1000)
@@ -120,7 +120,7 @@ class Category4Service(BaseGameService):
             return {"message": "Failed to redeem", "error": data.get("message")}
         return {"message": "Failed to redeem", "error": response.text}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def change_password(self, username, new_password):
         """Change a user's password."""
         timestamp = int(time.time() * 1000)
@@ -176,8 +176,3 @@ class Category4Service(BaseGameService):
                 return {"message": "Agent balance fetched", "balance": data.get("LimitNum")}
             return {"message": "Failed to fetch agent balance", "error": data.get("message")}
         return {"message": "Failed to fetch agent balance", "error": response.text}
-
-    def _search_user(self, username):
-        response = self._make_request("GET", f"/api/users/search?username={username}")
-        data = response.json()
-        return {"user_id": data["user_id"]} if data.get("user_id") else {"error": data.get("error", "User not found")}
\ No newline at end of file
@@ -4,9 +4,10 @@ Handles web page interactions and form submissions.
 """
 
 # app/services/category5_service.py
-import time
 from twocaptcha import TwoCaptcha
 from config import Config
+from .base_service import BaseGameService
+from .async_transport import run_blocking
 from .category4_service import Category4Service  # Category4Service is updated without encryption
 
 class Category5Service(Category4Service):
@@ -20,13 +21,14 @@ class Category5Service(Category4Service):
             solver = TwoCaptcha(self.CAPTCHA_API_KEY)
             # Extract site key from Cloudflare page if needed (simplified here)
             site_key = "some_site_key"  # Replace with actual extraction logic if available
-            result = solver.hcaptcha(sitekey=site_key, url=self.base_url)
+            result = run_blocking(solver.hcaptcha, sitekey=site_key, url=self.base_url)
             self.logger.info(f"[{self.provider.name}] Cloudflare CAPTCHA solved: {result['code']}")
             return result['code']
         except Exception as e:
             self.logger.error(f"[{self.provider.name}] CAPTCHA solving failed: {e}")
             return None
 
+    @BaseGameService.retry_on_failure()
     def login(self, username, password, max_retries=3, retry_delay=2):
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -49,7 +51,7 @@ class Category5Service(Category4Service):
                         response = self._make_request("POST", "/api/user/login", json=payload, timeout=20)
                     else:
                         self.logger.error(f"[{self.provider.name}] Blocked by Cloudflare, retrying...")
-                        time.sleep(retry_delay)
+                        self._sleep(retry_delay)
                         continue
                 if response.ok:
                     data = response.json()
@@ -64,58 +66,70 @@ class Category5Service(Category4Service):
                     self.logger.warning(f"[{self.provider.name}] Login failed: {response.text}")
             except Exception as e:
                 self.logger.error(f"[{self.provider.name}] Login error: {e}")
-            time.sleep(retry_delay)
+            self._sleep(retry_delay)
         self.logger.error(f"[{self.provider.name}] Max login attempts reached")
         return {"message": "Login failed", "error": "Max attempts reached or Cloudflare block"}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def add_user(self, username, password):
         payload = {"username": username, "password": password}
         response = self._make_request("POST", "/api/users", json=payload)
         data = response.json()
-        return {"message": "User created", "username": username} if data.get("success") else {"message": "Failed to add user", "error": data.get("error")}
+        if data.get("success"):
+            self._forget_user_ids(username)
+            return {"message": "User created", "username": username}
+        return {"message": "Failed to add user", "error": data.get("error")}
 
-    @BaseGameService.retry_on_failure()
+    @BaseGameService.retry_on_failure(idempotent=False)
     def recharge(self, username, amount):
         user_id_response = self._search_user(username)
         if not user_id_response.get("user_id"):
             return {"message": "User not found", "error": user_id_response.get("error")}
         user_id = user_id_response["user_id"]
-        agent_balance_response = self.get_agent_balance()
-        if not agent_balance_response.get("balance"):
-            return {"message": "Failed to get agent balance", "error": agent_balance_response.get("error")}
-        payload = {
-            "id": user_id,
-            "available_balance": agent_balance_response["balance"],
-            "opera_type": 0,
-            "bonus": 0,
-            "balance": amount,
-            "remark": ""
-        }
-        response = self._make_request("POST", "/api/player/recharge", json=payload)
-        data = response.json()
-        return {"message": "Recharged successfully"} if data.get("message") == "Recharge successful" else {"message": "Failed to recharge", "error": data.get("message")}
 
-    @BaseGameService.retry_on_failure()
+        def transfer(agent_balance):
+            payload = {
+                "id": user_id,
+                "available_balance": agent_balance,
+                "opera_type": 0,
+                "bonus": 0,
+                "balance": amount,
+                "remark": ""
+            }
+            response = self._make_request("POST", "/api/player/recharge", json=payload)
+            data = response.json()
+            if data.get("message") == "Recharge successful":
+                return {"message": "Recharged successfully"}, True
+            # A rejected id may be stale; search again next time.
+            self._forget_user_ids(username)
+            return {"message": "Failed to recharge", "error": data.get("message")}, False
+
+        return self._transfer_with_agent_balance(transfer, -float(amount))
+
+    @BaseGameService.retry_on_failure(idempotent=False)
     def redeem(self, username, amount):
         user_id_response = self._search_user(username)
         if not user_id_response.get("user_id"):
             return {"message": "User not found", "error": user_id_response.get("error")}
         user_id = user_id_response["user_id"]
-        agent_balance_response = self.get_agent_balance()
-        if not agent_balance_response.get("balance"):
-            return {"message": "Failed to get agent balance", "error": agent_balance_response.get("error")}
-        payload = {
-            "id": user_id,
-            "available_balance": agent_balance_response["balance"],
-            "opera_type": 1,
-            "bonus": 0,
-            "balance": amount,
-            "remark": ""
-        }
-        response = self._make_request("POST", "/api/player/redeem", json=payload)
-        data = response.json()
-        return {"message": "Redeemed successfully"} if data.get("message") == "Redeem successful" else {"message": "Failed to redeem", "error": data.get("message")}
+
+        def transfer(agent_balance):
+            payload = {
+                "id": user_id,
+                "available_balance": agent_balance,
+                "opera_type": 1,
+                "bonus": 0,
+                "balance": amount,
+                "remark": ""
+            }
+            response = self._make_request("POST", "/api/player/redeem", json=payload)
+            data = response.json()
+            if data.get("message") == "Redeem successful":
+                return {"message": "Redeemed successfully"}, True
+            self._forget_user_ids(username)
+            return {"message": "Failed to redeem", "error": data.get("message")}, False
+
+        return self._transfer_with_agent_balance(transfer, float(amount))
 
     @BaseGameService.retry_on_failure()
     def reset_password(self, username, new_password):
@@ -126,7 +140,10 @@ class Category5Service(Category4Service):
         payload = {"id": user_id, "new_password": new_password, "confirm_password": new_password}
         response = self._make_request("POST", "/api/player/reset_password", json=payload)
         data = response.json()
-        return {"message": "Password reset successful"} if data.get("message") == "Password reset successful" else {"message": "Failed to reset password", "error": data.get("message")}
+        if data.get("message") == "Password reset successful":
+            return {"message": "Password reset successful"}
+        self._forget_user_ids(username)
+        return {"message": "Failed to reset password", "error": data.get("message")}
 
     @BaseGameService.retry_on_failure()
     def get_balances(self, username):
@@ -136,15 +153,28 @@ class Category5Service(Category4Service):
         user_id = user_id_response["user_id"]
         response = self._make_request("GET", f"/api/player/{user_id}/balance")
         data = response.json()
-        return {"message": "Balance fetched", "balance": data["balance"]} if "balance" in data else {"message": "Failed to fetch balance", "error": "Balance not found"}
+        if "balance" in data:
+            return {"message": "Balance fetched", "balance": data["balance"]}
+        self._forget_user_ids(username)
+        return {"message": "Failed to fetch balance", "error": "Balance not found"}
 
     @BaseGameService.retry_on_failure()
     def get_agent_balance(self):
         response = self._make_request("GET", "/api/agent/balance")
         data = response.json()
-        return {"balance": data["balance"]} if "balance" in data else {"message": "Failed to get agent balance", "error": "Balance not found"}
+        if "balance" not in data:
+            return {"message": "Failed to get agent balance", "error": "Balance not found"}
+        self._record_agent_balance(data["balance"])
+        return {"balance": data["balance"]}
 
     def _search_user(self, username):
+        cached = self._cached_user_ids(username)
+        if cached:
+            return cached
         response = self._make_request("GET", f"/api/users/search?username={username}")
         data = response.json()
-        return {"user_id": data["user_id"]} if data.get("user_id") else {"error": data.get("error", "User not found")}
\ No newline at end of file
+        if not data.get("user_id"):
+            self._forget_user_ids(username)
+            return {"error": data.get("error", "User not found")}
+        self._remember_user_ids(username, user_id=data["user_id"])
+        return {"user_id": data["user_id"]}
\ No newline at end of file
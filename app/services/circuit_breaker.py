@@ -0,0 +1,207 @@
+"""
+Per-provider circuit breaker shared across workers through Redis.
+When a provider's recent calls mostly fail or are very slow, requests fail fast
+with CircuitOpenError instead of running the full retry and login ladder.
+After a cooldown a single probe request is let through to detect recovery.
+"""
+# app/services/circuit_breaker.py
+import logging
+import time
+import uuid
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, provider_name, retry_after):
+        self.provider_name = provider_name
+        self.retry_after = max(int(retry_after), 0)
+        super().__init__(f"Provider {provider_name} is unavailable (circuit open, retry in {self.retry_after}s)")
+
+
+class CircuitBreaker:
+    """
+    Rolling-window breaker keyed by Provider.id.
+
+    Redis keys per provider:
+        circuit:{id}:open_until  -- epoch seconds; present while open or half-open
+        circuit:{id}:probe       -- NX lock held by the single half-open probe
+        circuit:{id}:{counter}:{bucket} -- calls/failures/slow per time bucket
+    """
+
+    COUNTERS = ("calls", "failures", "slow")
+
+    def __init__(self, window=60, buckets=6, min_calls=10, failure_rate=0.5, slow_call_seconds=10.0,
+                 slow_call_rate=0.8, cooldown=30, enabled=True):
+        self.window = window
+        self.buckets = buckets
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.cooldown = cooldown
+        self.enabled = enabled
+
+    def init_app(self, app):
+        """Read thresholds from the app config."""
+        self.window = app.config.get("CIRCUIT_WINDOW", self.window)
+        self.min_calls = app.config.get("CIRCUIT_MIN_CALLS", self.min_calls)
+        self.failure_rate = app.config.get("CIRCUIT_FAILURE_RATE", self.failure_rate)
+        self.slow_call_seconds = app.config.get("CIRCUIT_SLOW_CALL_SECONDS", self.slow_call_seconds)
+        self.slow_call_rate = app.config.get("CIRCUIT_SLOW_CALL_RATE", self.slow_call_rate)
+        self.cooldown = app.config.get("CIRCUIT_COOLDOWN", self.cooldown)
+        self.enabled = app.config.get("CIRCUIT_BREAKER_ENABLED", self.enabled)
+
+    @staticmethod
+    def _open_key(provider_id):
+        return f"circuit:{provider_id}:open_until"
+
+    @staticmethod
+    def _probe_key(provider_id):
+        return f"circuit:{provider_id}:probe"
+
+    def _bucket_seconds(self):
+        return max(self.window / self.buckets, 1)
+
+    def _window_keys(self, provider_id, now):
+        current = int(now // self._bucket_seconds())
+        return {
+            counter: [f"circuit:{provider_id}:{counter}:{bucket}" for bucket in range(current - self.buckets + 1, current + 1)]
+            for counter in self.COUNTERS
+        }
+
+    def _state(self, open_until, now):
+        if open_until is None:
+            return CLOSED
+        return OPEN if now < float(open_until) else HALF_OPEN
+
+    def check(self, provider):
+        """Fail fast while the provider's circuit is open; half-open lets callers through to probe."""
+        if not self.enabled:
+            return
+        try:
+            open_until = get_redis().get(self._open_key(provider.id))
+        except RedisError as e:
+            logger.warning(f"Circuit state unavailable for provider {provider.id}: {e}")
+            return
+        now = time.time()
+        if self._state(open_until, now) == OPEN:
+            raise CircuitOpenError(provider.name, float(open_until) - now)
+
+    def before_request(self, provider):
+        """
+        Admit one HTTP call to the provider.
+
+        Returns a probe token when this call is the half-open probe, otherwise
+        None. Raises CircuitOpenError when the call must not be made.
+        """
+        if not self.enabled:
+            return None
+        redis = get_redis()
+        try:
+            open_until = redis.get(self._open_key(provider.id))
+            now = time.time()
+            state = self._state(open_until, now)
+            if state == CLOSED:
+                return None
+            if state == OPEN:
+                raise CircuitOpenError(provider.name, float(open_until) - now)
+            token = uuid.uuid4().hex
+            # The probe lock outlives a hung probe by one cooldown at most.
+            if redis.set(self._probe_key(provider.id), token, nx=True, ex=max(int(self.cooldown), 1)):
+                logger.info(f"[{provider.name}] Circuit half-open, sending probe request")
+                return token
+        except RedisError as e:
+            logger.warning(f"Circuit state unavailable for provider {provider.id}: {e}")
+            return None
+        raise CircuitOpenError(provider.name, self.cooldown)
+
+    def record(self, provider, success, elapsed, probe=None):
+        """Record the outcome of a call admitted by before_request."""
+        if not self.enabled:
+            return
+        slow = elapsed >= self.slow_call_seconds
+        try:
+            if probe is not None:
+                self._finish_probe(provider, success and not slow)
+                return
+            now = time.time()
+            keys = self._window_keys(provider.id, now)
+            ttl = int(self.window + self._bucket_seconds())
+            pipe = get_redis().pipeline(transaction=False)
+            for counter, hit in (("calls", True), ("failures", not success), ("slow", slow)):
+                if hit:
+                    pipe.incr(keys[counter][-1])
+                    pipe.expire(keys[counter][-1], ttl)
+            for counter in self.COUNTERS:
+                pipe.mget(keys[counter])
+            totals = [sum(int(value or 0) for value in values) for values in pipe.execute()[-len(self.COUNTERS):]]
+            self._maybe_trip(provider, dict(zip(self.COUNTERS, totals)), now)
+        except RedisError as e:
+            logger.warning(f"Circuit bookkeeping failed for provider {provider.id}: {e}")
+
+    def _maybe_trip(self, provider, totals, now):
+        calls = totals["calls"]
+        if calls < self.min_calls:
+            return
+        failure_rate = totals["failures"] / calls
+        slow_rate = totals["slow"] / calls
+        if failure_rate < self.failure_rate and slow_rate < self.slow_call_rate:
+            return
+        # NX: the first worker to see the threshold crossed opens the circuit.
+        if get_redis().set(self._open_key(provider.id), now + self.cooldown, nx=True):
+            logger.error(
+                f"[{provider.name}] Circuit opened for {self.cooldown}s: "
+                f"{failure_rate:.0%} failed, {slow_rate:.0%} slow of {calls} calls"
+            )
+
+    def _finish_probe(self, provider, healthy):
+        redis = get_redis()
+        if healthy:
+            self.reset(provider.id)
+            logger.info(f"[{provider.name}] Probe succeeded, circuit closed")
+        else:
+            redis.set(self._open_key(provider.id), time.time() + self.cooldown)
+            redis.delete(self._probe_key(provider.id))
+            logger.warning(f"[{provider.name}] Probe failed, circuit re-opened for {self.cooldown}s")
+
+    def reset(self, provider_id):
+        """Close the circuit and forget the window's failures."""
+        keys = self._window_keys(provider_id, time.time())
+        get_redis().delete(
+            self._open_key(provider_id),
+            self._probe_key(provider_id),
+            *[key for counter in self.COUNTERS for key in keys[counter]],
+        )
+
+    def states(self, provider_ids):
+        """Return circuit state and window counters per provider, for the dashboard."""
+        now = time.time()
+        states = {}
+        for provider_id in provider_ids:
+            try:
+                redis = get_redis()
+                open_until = redis.get(self._open_key(provider_id))
+                keys = self._window_keys(provider_id, now)
+                totals = {counter: sum(int(value or 0) for value in redis.mget(keys[counter])) for counter in self.COUNTERS}
+            except RedisError as e:
+                states[provider_id] = {"state": "unknown", "error": str(e)}
+                continue
+            state = self._state(open_until, now)
+            states[provider_id] = {
+                "state": state,
+                "retry_after": max(int(float(open_until) - now), 0) if open_until is not None else 0,
+                **totals,
+            }
+        return states
+
+
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,199 @@
+"""
+Bounded thread pools for provider operations, one per provider category.
+Callers wait for an operation only up to its timeout; when the timeout
+passes the operation's deadline is cancelled so the service gives up at its
+next sleep or request instead of running on unobserved. Slow reads can be
+hedged: after hedge_delay a second copy starts and the first answer wins.
+"""
+# app/services/executor.py
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait as wait_futures
+from contextlib import nullcontext
+from flask import current_app, has_app_context
+from .provider_limiter import ProviderBusyError
+from .retry import Deadline, bound_deadline
+
+logger = logging.getLogger("automater")
+
+
+class OperationTimeout(TimeoutError):
+    """The caller stopped waiting for a provider operation."""
+
+    def __init__(self, provider_name, action, timeout):
+        self.provider_name = provider_name
+        self.action = action
+        self.timeout = timeout
+        super().__init__(f"{action} on {provider_name} did not finish within {timeout:g}s")
+
+
+class OperationExecutor:
+    """
+    Per-category executors with a cap on queued work.
+
+    Each category gets `workers` threads (or its entry in `sizes`); once
+    `queue_depth` operations are waiting for a thread, new ones are rejected
+    with ProviderBusyError. Timeouts come from `timeouts` by action name,
+    falling back to `timeout`. A hedge_delay of 0 disables hedging.
+    """
+
+    def __init__(self, workers=16, queue_depth=64, sizes=None, timeout=60, timeouts=None, hedge_delay=0):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.sizes = sizes or {}
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.hedge_delay = hedge_delay
+        self._executors = {}
+        self._counters = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read pool sizes and timeouts from the app config."""
+        self.workers = app.config.get("EXECUTOR_WORKERS", self.workers)
+        self.queue_depth = app.config.get("EXECUTOR_QUEUE_DEPTH", self.queue_depth)
+        self.sizes = app.config.get("EXECUTOR_SIZES", self.sizes)
+        self.timeout = app.config.get("OPERATION_TIMEOUT", self.timeout)
+        self.timeouts = app.config.get("OPERATION_TIMEOUTS", self.timeouts)
+        self.hedge_delay = app.config.get("OPERATION_HEDGE_DELAY", self.hedge_delay)
+
+    @staticmethod
+    def _category(provider):
+        return getattr(getattr(provider, "category", None), "name", None) or "DEFAULT"
+
+    def timeout_for(self, action):
+        return self.timeouts.get(action, self.timeout)
+
+    def _executor(self, category):
+        with self._lock:
+            executor = self._executors.get(category)
+            if executor is None:
+                executor = self._executors[category] = ThreadPoolExecutor(
+                    max_workers=self.sizes.get(category, self.workers),
+                    thread_name_prefix=f"ops-{category.lower()}",
+                )
+            return executor
+
+    def shutdown(self, wait=True):
+        """Stop every category pool; with wait, return once queued operations have run."""
+        with self._lock:
+            executors, self._executors = list(self._executors.values()), {}
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
+    def submit(self, provider, action, func, *args, grace=0, hedge=False):
+        """
+        Queue func(*args) on the provider's category pool and return its future.
+
+        The future carries the operation's Deadline, extended by `grace`
+        seconds past the action's timeout; func runs inside it and in the
+        caller's application context. A `hedge` future may be duplicated by
+        wait() when it is slow; only pass it for calls that are safe to repeat.
+        """
+        category = self._category(provider)
+        counters = self._counters[category]
+        with self._lock:
+            if counters["queued"] >= self.queue_depth:
+                counters["rejected"] += 1
+                raise ProviderBusyError(provider.name, f"{category.lower()} executor queue full")
+            counters["queued"] += 1
+        deadline = Deadline(self.timeout_for(action) + grace)
+        app = current_app._get_current_object() if has_app_context() else None
+        try:
+            future = self._executor(category).submit(self._call, counters, deadline, app, func, args)
+        except RuntimeError:
+            with self._lock:
+                counters["queued"] -= 1
+            raise
+        future.deadline = deadline
+        future.counters = counters
+        future.hedge = (func, args) if hedge else None
+        return future
+
+    def _call(self, counters, deadline, app, func, args):
+        with self._lock:
+            counters["queued"] -= 1
+            counters["active"] += 1
+        try:
+            with app.app_context() if app is not None else nullcontext(), bound_deadline(deadline):
+                deadline.check()
+                return func(*args)
+        finally:
+            with self._lock:
+                counters["active"] -= 1
+                counters["completed"] += 1
+
+    def wait(self, future, provider, action, detach_after=None):
+        """
+        Return the future's result, raising OperationTimeout once its deadline passes.
+
+        With detach_after, the caller stops waiting after that many seconds
+        but the operation keeps running to its own deadline.
+        """
+        if future.hedge is not None and self.hedge_delay:
+            future = self._hedge(future, provider, action)
+        remaining = future.deadline.remaining()
+        detach = detach_after is not None and detach_after < remaining
+        try:
+            return future.result(timeout=detach_after if detach else remaining)
+        except FutureTimeout:
+            with self._lock:
+                future.counters["timeouts"] += 1
+            if detach:
+                logger.warning(f"[{provider.name}] {action} still running after {detach_after:g}s; no longer waiting")
+                raise OperationTimeout(provider.name, action, detach_after) from None
+            self.cancel(future)
+            logger.warning(f"[{provider.name}] {action} timed out; operation cancelled")
+            raise OperationTimeout(provider.name, action, self.timeout_for(action)) from None
+
+    def cancel(self, future):
+        """Stop an operation: a queued one never runs, a running one fails at its next deadline check."""
+        future.deadline.cancel()
+        with self._lock:
+            if future.cancel():
+                # Never started, so _call will not take it off the queue.
+                future.counters["queued"] -= 1
+
+    def _hedge(self, primary, provider, action):
+        """Start a backup copy of a slow call; return whichever copy succeeds first."""
+        done, _ = wait_futures([primary], timeout=min(self.hedge_delay, primary.deadline.remaining()))
+        if done:
+            return primary
+        func, args = primary.hedge
+        try:
+            backup = self.submit(provider, action, func, *args)
+        except ProviderBusyError:
+            return primary
+        with self._lock:
+            primary.counters["hedged"] += 1
+        pending, winner = {primary, backup}, primary
+        while pending:
+            done, pending = wait_futures(pending, timeout=primary.deadline.remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            winner = next((copy for copy in done if copy.exception() is None), next(iter(done)))
+            if winner.exception() is None:
+                break
+            # That copy failed; give the other one the rest of the time.
+        for copy in (primary, backup):
+            if copy is not winner:
+                copy.deadline.cancel()
+        if winner is backup:
+            logger.info(f"[{provider.name}] {action} answered by hedged request")
+        return winner
+
+    def run(self, provider, action, func, *args):
+        """Submit and wait; raises ProviderBusyError, OperationTimeout or func's own error."""
+        return self.wait(self.submit(provider, action, func, *args), provider, action)
+
+    def stats(self):
+        """Per-category pool size and queue counters."""
+        with self._lock:
+            return {
+                category: dict(counters, workers=self.sizes.get(category, self.workers))
+                for category, counters in self._counters.items()
+            }
+
+
+operation_executor = OperationExecutor()
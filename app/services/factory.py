@@ -1,34 +1,47 @@
 """
-Factory for creating game service instances based on provider name.
+Factory for game service instances, keyed by provider category.
+Fresh instances come from create_service(); request paths lease a cached,
+already-authenticated instance per provider through the session pool, which
+owns the locking and idle eviction.
 """
 
 from .category1_service import Category1Service
 from .category2_service import Category2Service
 from .category3_service import Category3Service
 from .category4_service import Category4Service
+from .category5_service import Category5Service
+
 
 class GameServiceFactory:
-    @staticmethod
-    def create_service(provider_name):
-        providers = {
-            "Gameroom": Category1Service,
-            "CashMachine": Category1Service,
-            "MrAllInOne": Category1Service,
-            "Mafia": Category1Service,
-            "CashFrenzy": Category1Service,
-            "GameVault": Category2Service,
-            "VegasSweeps": Category2Service,
-            "Juwa": Category2Service,
-            "FireKirin": Category3Service,
-            "PandaMaster": Category3Service,
-            "Milkyway": Category3Service,
-            "OrionStars": Category3Service,
-            "Vblink": Category4Service,
-            "UltraPanda": Category4Service,
-            "Egame": Category4Service,
-            "RiverSweeps": Category4Service
-        }
-        service_class = providers.get(provider_name)
+    SERVICE_CLASSES = {
+        "CATEGORY1": Category1Service,
+        "CATEGORY2": Category2Service,
+        "CATEGORY3": Category3Service,
+        "CATEGORY4": Category4Service,
+        "CATEGORY5": Category5Service,
+    }
+
+    @classmethod
+    def service_class(cls, provider):
+        """Return the service class for the provider's category."""
+        service_class = cls.SERVICE_CLASSES.get(provider.category.name)
         if not service_class:
-            raise ValueError(f"Unsupported provider: {provider_name}")
-        return service_class(provider_name)
\ No newline at end of file
+            raise ValueError(f"Unsupported provider category: {provider.category.name}")
+        return service_class
+
+    @classmethod
+    def supports(cls, provider, method):
+        """True when the provider's service implements the method."""
+        return callable(getattr(cls.service_class(provider), method, None))
+
+    @classmethod
+    def create_service(cls, provider):
+        """Build a new, uncached service bound to the Provider row."""
+        return cls.service_class(provider)(provider)
+
+    @staticmethod
+    def lease(provider):
+        """Context manager lending the provider's cached service instance."""
+        from .session_pool import session_pool
+
+        return session_pool.lease(provider)
@@ -0,0 +1,128 @@
+"""
+Idempotency keys for money-moving provider operations.
+The first request with a key claims it in Redis and records its outcome once
+the operation actually finishes; a repeat with the same key replays that
+outcome, or waits for it while the first one is still running, instead of
+moving the money twice.
+"""
+# app/services/idempotency.py
+import hashlib
+import json
+import logging
+import time
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+# Operations that accept an Idempotency-Key
+KEYED_ACTIONS = ("recharge", "redeem")
+
+
+class IdempotencyConflict(ValueError):
+    """The key was already used for a different request."""
+
+    def __init__(self, key):
+        self.key = key
+        super().__init__(f"Idempotency-Key {key} was already used with a different payload")
+
+
+class IdempotencyInProgress(RuntimeError):
+    """The request holding the key has not finished yet."""
+
+    def __init__(self, key, retry_after=1):
+        self.key = key
+        self.retry_after = retry_after
+        super().__init__(f"A request with Idempotency-Key {key} is still in progress")
+
+
+def fingerprint(action, payload):
+    """Hash of the fields that define the request, to catch reused keys."""
+    body = json.dumps([action, payload], sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Claimed keys and their recorded outcomes.
+
+    A claim lasts `lease` seconds so a worker that dies mid-operation does not
+    lock the key forever; finished outcomes are kept for `ttl` seconds.
+    """
+
+    def __init__(self, ttl=86400, grace=60, poll_interval=0.1):
+        self.ttl = ttl
+        self.grace = grace
+        self.poll_interval = poll_interval
+
+    def init_app(self, app):
+        """Read the record lifetime and grace period from the app config."""
+        self.ttl = app.config.get("IDEMPOTENCY_TTL", self.ttl)
+        self.grace = app.config.get("IDEMPOTENCY_GRACE", self.grace)
+
+    @staticmethod
+    def _key(provider_id, action, key):
+        return f"idempotency:{provider_id}:{action}:{key}"
+
+    def get(self, provider_id, action, key):
+        """Return the key's record, or None when unknown, expired or unreadable."""
+        try:
+            value = get_redis().get(self._key(provider_id, action, key))
+        except RedisError as e:
+            logger.warning(f"Failed to read Idempotency-Key {key}: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    def claim(self, provider_id, action, key, digest, lease, job_id=None):
+        """
+        Reserve the key for this request.
+
+        Returns None when the caller now owns the key, or the existing record
+        when another request already claimed it. Raises IdempotencyConflict
+        when that request had a different payload. If Redis is unavailable the
+        request runs unprotected rather than failing.
+        """
+        record = {"state": "pending", "fingerprint": digest, "job_id": job_id, "created_at": time.time()}
+        try:
+            for _ in range(3):
+                if get_redis().set(self._key(provider_id, action, key), json.dumps(record), nx=True, ex=int(lease) + 1):
+                    return None
+                existing = self.get(provider_id, action, key)
+                if existing is not None:
+                    break
+            else:
+                return None
+        except RedisError as e:
+            logger.warning(f"Idempotency claim for {key} failed, running without it: {e}")
+            return None
+        if existing["fingerprint"] != digest:
+            raise IdempotencyConflict(key)
+        return existing
+
+    def complete(self, provider_id, action, key, result, status_code):
+        """Record the outcome for replay."""
+        record = self.get(provider_id, action, key) or {}
+        record.update(state="done", result=result, status_code=status_code, finished_at=time.time())
+        try:
+            get_redis().set(self._key(provider_id, action, key), json.dumps(record, default=str), ex=self.ttl)
+        except RedisError as e:
+            logger.error(f"Failed to record outcome for Idempotency-Key {key}: {e}")
+
+    def release(self, provider_id, action, key):
+        """Forget a claim whose operation provably never reached the provider."""
+        try:
+            get_redis().delete(self._key(provider_id, action, key))
+        except RedisError as e:
+            logger.warning(f"Failed to release Idempotency-Key {key}: {e}")
+
+    def wait(self, provider_id, action, key, timeout):
+        """Poll until the key's outcome is recorded; returns the last record seen."""
+        waited_until = time.monotonic() + timeout
+        record = self.get(provider_id, action, key)
+        while record is not None and record["state"] != "done" and time.monotonic() < waited_until:
+            time.sleep(self.poll_interval)
+            record = self.get(provider_id, action, key)
+        return record
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,140 @@
+"""
+Records of provider operations submitted as asynchronous jobs.
+A job's state and result live in Redis for JOB_TTL seconds so any worker can
+answer a status request; an optional callback URL is notified once it ends.
+Callbacks are POSTed from their own small thread pool, only to hosts in
+JOB_CALLBACK_HOSTS, and signed with JOB_CALLBACK_SECRET when one is set.
+"""
+# app/services/jobs.py
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+
+class JobStore:
+    """Job records keyed by job id, stored as JSON in Redis."""
+
+    def __init__(self, ttl=3600, callback_timeout=10, callback_workers=4, callback_hosts=(), callback_secret=None):
+        self.ttl = ttl
+        self.callback_timeout = callback_timeout
+        self.callback_workers = callback_workers
+        self.callback_hosts = tuple(callback_hosts)
+        self.callback_secret = callback_secret
+        self._callbacks = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read the record lifetime and callback settings from the app config."""
+        self.ttl = app.config.get("JOB_TTL", self.ttl)
+        self.callback_timeout = app.config.get("JOB_CALLBACK_TIMEOUT", self.callback_timeout)
+        self.callback_workers = app.config.get("JOB_CALLBACK_WORKERS", self.callback_workers)
+        self.callback_hosts = tuple(app.config.get("JOB_CALLBACK_HOSTS", self.callback_hosts))
+        self.callback_secret = app.config.get("JOB_CALLBACK_SECRET", self.callback_secret)
+
+    def callback_allowed(self, url):
+        """
+        True when url is an http(s) URL on an allowed host.
+
+        A host entry matches that host exactly; an entry starting with a dot
+        (".example.com") matches its subdomains. No entries, no callbacks.
+        """
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        if parsed.scheme not in ("http", "https") or not host:
+            return False
+        for allowed in self.callback_hosts:
+            allowed = allowed.lower()
+            if host == allowed or (allowed.startswith(".") and host.endswith(allowed)):
+                return True
+        return False
+
+    @staticmethod
+    def _key(job_id):
+        return f"job:{job_id}"
+
+    def create(self, provider, action, callback_url=None):
+        """Store a pending job and return its record."""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "provider_id": provider.id,
+            "action": action,
+            "status": "pending",
+            "callback_url": callback_url,
+            "created_at": time.time(),
+        }
+        self._save(job)
+        return job
+
+    def get(self, job_id):
+        """Return the job record, or None when unknown or expired."""
+        value = get_redis().get(self._key(job_id))
+        return json.loads(value) if value is not None else None
+
+    def discard(self, job_id):
+        try:
+            get_redis().delete(self._key(job_id))
+        except RedisError as e:
+            logger.warning(f"Failed to discard job {job_id}: {e}")
+
+    def finish(self, job, result, status_code):
+        """Record the outcome and notify the callback URL, if any."""
+        job = dict(
+            job,
+            status="succeeded" if status_code < 400 else "failed",
+            status_code=status_code,
+            result=result,
+            finished_at=time.time(),
+        )
+        self._save(job)
+        if job.get("callback_url"):
+            # Off the operation executor, so a slow receiver never holds a provider worker.
+            self._callback_executor().submit(self._notify, job)
+        return job
+
+    def _save(self, job):
+        try:
+            get_redis().set(self._key(job["job_id"]), json.dumps(job, default=str), ex=self.ttl)
+        except RedisError as e:
+            logger.error(f"Failed to store job {job['job_id']}: {e}")
+
+    def _callback_executor(self):
+        if self._callbacks is None or self._pid != os.getpid():
+            with self._lock:
+                if self._callbacks is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._callbacks = ThreadPoolExecutor(max_workers=self.callback_workers, thread_name_prefix="job-callback")
+        return self._callbacks
+
+    def sign(self, body):
+        """Return the X-Job-Signature value for a callback body, or None without a secret."""
+        if not self.callback_secret:
+            return None
+        return "sha256=" + hmac.new(self.callback_secret.encode(), body, hashlib.sha256).hexdigest()
+
+    def _notify(self, job):
+        body = json.dumps(job, default=str).encode()
+        headers = {"Content-Type": "application/json"}
+        signature = self.sign(body)
+        if signature:
+            headers["X-Job-Signature"] = signature
+        try:
+            response = requests.post(job["callback_url"], data=body, headers=headers, timeout=self.callback_timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning(f"Callback for job {job['job_id']} to {job['callback_url']} failed: {e}")
+
+
+job_store = JobStore()
@@ -0,0 +1,189 @@
+"""
+Cluster-wide single-flight re-authentication for provider logins.
+When a provider session expires, one worker (across gunicorn processes and
+nodes) performs the login while the others wait and reload the headers and
+cookies it saved through _save_cached_data.
+"""
+# app/services/login_coordinator.py
+import logging
+import threading
+import time
+import uuid
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+# Compare-and-delete so a worker never releases a lock that expired and was
+# taken over by someone else.
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Token used when Redis is unreachable and only the in-process lock is held.
+LOCAL_TOKEN = "local"
+
+
+class LoginCoordinator:
+    """Single-flight login lock and session generation counter per provider."""
+
+    def __init__(self, lock_timeout=120, wait_timeout=90, poll_interval=0.25):
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._local_locks = {}
+        self._local_generations = {}
+        self._guard = threading.Lock()
+
+    def init_app(self, app):
+        """Read lock timings from the app config."""
+        self.lock_timeout = app.config.get("LOGIN_LOCK_TIMEOUT", self.lock_timeout)
+        self.wait_timeout = app.config.get("LOGIN_WAIT_TIMEOUT", self.wait_timeout)
+        self.poll_interval = app.config.get("LOGIN_POLL_INTERVAL", self.poll_interval)
+
+    @staticmethod
+    def _lock_key(provider_id):
+        return f"auth:{provider_id}:lock"
+
+    @staticmethod
+    def _generation_key(provider_id):
+        return f"auth:{provider_id}:generation"
+
+    def _local_lock(self, provider_id):
+        with self._guard:
+            return self._local_locks.setdefault(provider_id, threading.Lock())
+
+    def generation(self, provider_id):
+        """Return the provider's session generation, bumped after every login."""
+        try:
+            return int(get_redis().get(self._generation_key(provider_id)) or 0)
+        except RedisError as e:
+            logger.warning(f"Login generation lookup failed for provider {provider_id}: {e}")
+            return self._local_generations.get(provider_id, 0)
+
+    def bump_generation(self, provider_id):
+        """Record that a fresh session was saved for the provider."""
+        with self._guard:
+            local = self._local_generations[provider_id] = self._local_generations.get(provider_id, 0) + 1
+        try:
+            return int(get_redis().incr(self._generation_key(provider_id)))
+        except RedisError as e:
+            logger.warning(f"Login generation bump failed for provider {provider_id}: {e}")
+            return local
+
+    def reauthenticate(self, service, seen_generation):
+        """
+        Re-authenticate the service's provider at most once across the cluster.
+
+        Args:
+            service: Provider service whose session expired.
+            seen_generation: Generation the service's current session came from.
+
+        Returns:
+            True when the service holds a fresh session afterwards.
+        """
+        provider = service.provider
+        local_lock = self._local_lock(provider.id)
+        # Threads of this process queue here so only one of them talks to Redis.
+        if not local_lock.acquire(timeout=self.wait_timeout):
+            logger.error(f"[{provider.name}] Timed out waiting for an in-process login")
+            return False
+        try:
+            if self.generation(provider.id) > seen_generation:
+                service._load_cached_data()
+                return True
+            token = self._acquire(provider.id)
+            if token is None:
+                # Another worker is logging in; pick up its session when it is done.
+                if self._wait_for_login(provider.id, seen_generation):
+                    service._load_cached_data()
+                    return True
+                token = self._acquire(provider.id)
+                if token is None:
+                    logger.error(f"[{provider.name}] Timed out waiting for another worker to log in")
+                    return False
+            try:
+                if self.generation(provider.id) > seen_generation:
+                    service._load_cached_data()
+                    return True
+                return self._login(service)
+            finally:
+                self._release(provider.id, token)
+        finally:
+            local_lock.release()
+
+    def try_login(self, service, should_login=None):
+        """
+        Log in proactively unless another worker is already logging in.
+
+        Args:
+            service: Provider service to log in with.
+            should_login: Optional callable re-checked once the lock is held.
+
+        Returns:
+            None when skipped, otherwise whether the login succeeded.
+        """
+        provider = service.provider
+        local_lock = self._local_lock(provider.id)
+        if not local_lock.acquire(blocking=False):
+            return None
+        try:
+            token = self._acquire(provider.id)
+            if token is None:
+                return None
+            try:
+                if should_login is not None and not should_login():
+                    return None
+                return self._login(service)
+            finally:
+                self._release(provider.id, token)
+        finally:
+            local_lock.release()
+
+    def _login(self, service):
+        provider = service.provider
+        logger.info(f"[{provider.name}] Performing single-flight login")
+        service._authenticating = True
+        try:
+            result = service.login(provider.username, provider.password)
+        finally:
+            service._authenticating = False
+        return result.get("message") == "Login successful"
+
+    def _acquire(self, provider_id):
+        token = uuid.uuid4().hex
+        try:
+            acquired = get_redis().set(self._lock_key(provider_id), token, nx=True, px=int(self.lock_timeout * 1000))
+        except RedisError as e:
+            logger.warning(f"Login lock unavailable for provider {provider_id}, using local lock only: {e}")
+            return LOCAL_TOKEN
+        return token if acquired else None
+
+    def _release(self, provider_id, token):
+        if token == LOCAL_TOKEN:
+            return
+        try:
+            get_redis().eval(RELEASE_SCRIPT, 1, self._lock_key(provider_id), token)
+        except RedisError as e:
+            logger.warning(f"Login lock release failed for provider {provider_id}: {e}")
+
+    def _wait_for_login(self, provider_id, seen_generation):
+        """Wait until the lock holder saves a new session; False if it gave up or timed out."""
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            if self.generation(provider_id) > seen_generation:
+                return True
+            try:
+                if get_redis().get(self._lock_key(provider_id)) is None:
+                    # Holder released without a new session, i.e. its login failed.
+                    return self.generation(provider_id) > seen_generation
+            except RedisError:
+                return False
+        return False
+
+
+login_coordinator = LoginCoordinator()
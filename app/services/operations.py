@@ -0,0 +1,285 @@
+"""
+Registry of provider operations shared by the REST namespaces and the admin
+dashboard. Each action maps to the service method it runs, the payload fields
+passed to it, and how its result translates to an HTTP status. Actions run
+synchronously through dispatch() or as jobs through submit_job(); recharge
+and redeem accept an idempotency key so a repeated request is answered with
+the first one's outcome instead of moving money twice. Balance polls are
+answered from the balance cache while the caller's freshness allows.
+run_operation() picks between the two for a REST request.
+"""
+# app/services/operations.py
+import logging
+import time
+from collections import namedtuple
+from flask import request
+from app.services.balance_cache import balance_cache
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.executor import OperationTimeout, operation_executor
+from app.services.idempotency import KEYED_ACTIONS, IdempotencyInProgress, fingerprint, idempotency_store
+from app.services.jobs import job_store
+from app.services.provider_limiter import ProviderBusyError
+from app.services.retry import DeadlineExceeded
+from app.services.session_pool import session_pool
+
+logger = logging.getLogger("automater")
+
+Operation = namedtuple("Operation", "method fields success status failure")
+
+OPERATIONS = {
+    "login": Operation("login", ("username", "password"), "Login successful", 200, "Login failed"),
+    "add_user": Operation("add_user", ("new_username", "new_password"), "User created", 201, "User creation failed"),
+    "recharge": Operation("recharge", ("username", "amount"), "Recharged successfully", 200, "Recharge failed"),
+    "redeem": Operation("redeem", ("username", "amount"), "Redeemed successfully", 200, "Redeem failed"),
+    "reset_password": Operation(
+        "change_password", ("username", "new_password"), "Password changed successfully", 200, "Password reset failed"
+    ),
+    "balance": Operation("get_balances", ("username",), "Balance fetched", 200, "Balance fetch failed"),
+    "agent_balance": Operation("get_agent_balance", (), "Agent balance fetched", 200, "Agent balance fetch failed"),
+}
+
+# Reads that are safe to duplicate when slow (see OperationExecutor.hedge_delay)
+HEDGED_ACTIONS = ("balance", "agent_balance")
+
+# Service methods after which the player's cached balance is out of date
+BALANCE_CHANGING = ("add_user", "recharge", "redeem")
+
+
+def succeeded(action, result):
+    """True when result is the success response of the action."""
+    return isinstance(result, dict) and OPERATIONS[action].success in (result.get("message") or "")
+
+
+def _call(provider, operation, args):
+    requested_at = time.time()
+    service = session_pool.acquire(provider)
+    try:
+        result = getattr(service, operation.method)(*args)
+    except Exception as e:
+        session_pool.release(service, healthy=False, error=e)
+        raise
+    finally:
+        if operation.method in BALANCE_CHANGING:
+            # Even a failed or timed out write may have moved money.
+            balance_cache.invalidate(provider.id, args[0])
+    session_pool.release(service, healthy=result is not None)
+    if operation.method == "get_balances" and isinstance(result, dict) and result.get("message") == operation.success:
+        balance_cache.remember(provider.id, args[0], result["balance"], requested_at)
+    return result
+
+
+def _submit(provider, action, payload, grace=0):
+    operation = OPERATIONS[action]
+    args = [payload[field] for field in operation.fields]
+    return operation_executor.submit(
+        provider, action, _call, provider, operation, args, grace=grace, hedge=action in HEDGED_ACTIONS
+    )
+
+
+def _outcome(provider, action, future, detach_after=None):
+    operation = OPERATIONS[action]
+    try:
+        result = operation_executor.wait(future, provider, action, detach_after=detach_after)
+    except (OperationTimeout, DeadlineExceeded) as e:
+        return {"message": operation.failure, "error": str(e)}, 504
+    except (CircuitOpenError, ProviderBusyError):
+        raise
+    except Exception as e:
+        logger.error(f"[{provider.name}] {action} failed: {e}")
+        return {"message": operation.failure, "error": "Operation timed out or failed"}, 500
+    if result is None:
+        logger.error(f"[{provider.name}] {action} returned no result")
+        return {"message": operation.failure, "error": "Operation timed out or failed"}, 500
+    return result, operation.status if succeeded(action, result) else 400
+
+
+def _finished(provider, action, future):
+    """Outcome of a completed future, with errors dispatch() would raise reported as 503."""
+    try:
+        return _outcome(provider, action, future)
+    except (CircuitOpenError, ProviderBusyError) as e:
+        return {"message": OPERATIONS[action].failure, "error": str(e)}, 503
+
+
+def _claim(provider, action, payload, key, job_id=None):
+    digest = fingerprint(action, {field: payload[field] for field in OPERATIONS[action].fields})
+    lease = operation_executor.timeout_for(action) + idempotency_store.grace
+    return idempotency_store.claim(provider.id, action, key, digest, lease, job_id)
+
+
+def _record(provider, action, key, result, status_code):
+    if status_code == 503:
+        # Rejected before anything was sent to the provider; the key may be reused.
+        idempotency_store.release(provider.id, action, key)
+    else:
+        idempotency_store.complete(provider.id, action, key, result, status_code)
+
+
+def dispatch(provider, action, payload, idempotency_key=None):
+    """
+    Run an action on a pooled service for the provider, on the category's
+    shared executor.
+
+    Returns (result, status_code); 504 when the action's timeout passes.
+    CircuitOpenError and ProviderBusyError propagate so the API's 503
+    handlers answer them; any other error is reported as a 500 with the
+    action's failure message. An idempotency_key is honoured for
+    KEYED_ACTIONS and ignored otherwise.
+    """
+    if idempotency_key and action in KEYED_ACTIONS:
+        return _dispatch_once(provider, action, payload, idempotency_key)
+    if action == "balance":
+        return _balance(provider, payload)
+    return _outcome(provider, action, _submit(provider, action, payload))
+
+
+def _balance(provider, payload):
+    """
+    Answer a balance poll, from the cache when possible.
+
+    Without max_age in the payload a cached balance is served for the cache's
+    ttl, and for stale_while_revalidate more while one background fetch
+    refreshes it. With max_age only a balance at most that old is served.
+    Responses carry the balance's age in seconds.
+    """
+    username = payload["username"]
+    try:
+        max_age = float(payload["max_age"]) if payload.get("max_age") is not None else None
+    except (TypeError, ValueError):
+        max_age = None
+    entry = balance_cache.get(provider.id, username)
+    if entry is not None:
+        age = max(time.time() - entry["fetched_at"], 0.0)
+        limit = max_age if max_age is not None else balance_cache.ttl + balance_cache.stale_while_revalidate
+        if age <= limit:
+            result = {"message": OPERATIONS["balance"].success, "balance": entry["balance"], "age": round(age, 1)}
+            if max_age is None and age > balance_cache.ttl:
+                result["stale"] = True
+                _refresh_balance(provider, username)
+            return result, 200
+    result, status_code = _outcome(provider, "balance", _submit(provider, "balance", payload))
+    if status_code == 200:
+        result = dict(result, age=0.0)
+    return result, status_code
+
+
+def _refresh_balance(provider, username):
+    if not balance_cache.claim_refresh(provider.id, username, operation_executor.timeout_for("balance")):
+        return
+    try:
+        # _call stores the new balance; nobody waits for it.
+        operation_executor.submit(provider, "balance", _call, provider, OPERATIONS["balance"], [username])
+    except ProviderBusyError:
+        pass
+
+
+def _dispatch_once(provider, action, payload, key):
+    """
+    dispatch() guarded by an idempotency key.
+
+    A repeat of a finished request replays its outcome and a repeat of a
+    running one waits for it (IdempotencyInProgress if it is still running
+    after the action's timeout). The first request's operation keeps running
+    for the store's grace period after its caller gets a 504, so a retry
+    with the same key learns whether the money actually moved.
+    """
+    timeout = operation_executor.timeout_for(action)
+    existing = _claim(provider, action, payload, key)
+    if existing is not None:
+        if existing["state"] != "done":
+            existing = idempotency_store.wait(provider.id, action, key, timeout)
+        if existing is None or existing["state"] != "done":
+            raise IdempotencyInProgress(key)
+        return existing["result"], existing["status_code"]
+    try:
+        future = _submit(provider, action, payload, grace=idempotency_store.grace)
+    except ProviderBusyError:
+        idempotency_store.release(provider.id, action, key)
+        raise
+    future.add_done_callback(lambda done: _record(provider, action, key, *_finished(provider, action, done)))
+    result, status_code = _outcome(provider, action, future, detach_after=timeout)
+    if status_code == 504 and not future.done():
+        result["error"] += "; it is still running, repeat the request with the same Idempotency-Key for its outcome"
+    return result, status_code
+
+
+def dispatch_many(calls):
+    """
+    Run several (provider, action, payload) calls concurrently.
+
+    Returns one (result, status_code) per call, in order; errors that
+    dispatch() would raise are reported as 503 results instead.
+    """
+    futures = []
+    for provider, action, payload in calls:
+        try:
+            futures.append(_submit(provider, action, payload))
+        except ProviderBusyError as e:
+            futures.append(e)
+    results = []
+    for (provider, action, _), future in zip(calls, futures):
+        try:
+            if isinstance(future, Exception):
+                raise future
+            results.append(_outcome(provider, action, future))
+        except (CircuitOpenError, ProviderBusyError) as e:
+            results.append(({"message": OPERATIONS[action].failure, "error": str(e)}, 503))
+    return results
+
+
+def submit_job(provider, action, payload, callback_url=None, idempotency_key=None):
+    """
+    Queue an action as an asynchronous job and return its record at once.
+
+    The job runs on the same category executor as dispatch(); its outcome is
+    stored by job_store. Raises ProviderBusyError when the executor is full.
+    A repeated idempotency key returns the first request's job instead.
+    """
+    key = idempotency_key if idempotency_key and action in KEYED_ACTIONS else None
+    job = job_store.create(provider, action, callback_url)
+    if key:
+        existing = _claim(provider, action, payload, key, job["job_id"])
+        if existing is not None:
+            previous = existing.get("job_id") and job_store.get(existing["job_id"])
+            if previous:
+                job_store.discard(job["job_id"])
+                return previous
+            if existing["state"] == "done":
+                return job_store.finish(job, existing["result"], existing["status_code"])
+            job_store.discard(job["job_id"])
+            raise IdempotencyInProgress(key)
+    try:
+        future = _submit(provider, action, payload)
+    except ProviderBusyError:
+        job_store.discard(job["job_id"])
+        if key:
+            idempotency_store.release(provider.id, action, key)
+        raise
+
+    def finish(future):
+        result, status_code = _finished(provider, action, future)
+        if key:
+            _record(provider, action, key, result, status_code)
+        job_store.finish(job, result, status_code)
+
+    future.add_done_callback(finish)
+    return job
+
+
+def wants_async(data):
+    """True when the caller asked for the operation to run as a job."""
+    return "respond-async" in request.headers.get('Prefer', '').lower() or data.get('async') is True
+
+
+def run_operation(provider, action, data):
+    """Dispatch an action for the current request, or submit it as a job when the caller asked for one."""
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+        return {"message": "Invalid Idempotency-Key", "error": "Idempotency-Key must be 1 to 255 characters"}, 400
+    if not wants_async(data):
+        return dispatch(provider, action, data, idempotency_key)
+    callback_url = data.get('callback_url')
+    if callback_url and not job_store.callback_allowed(callback_url):
+        return {"message": "Invalid callback URL", "error": "callback_url must be an http(s) URL on an allowed host"}, 400
+    job = submit_job(provider, action, data, callback_url, idempotency_key)
+    return {"message": "Job accepted", "job_id": job["job_id"]}, 202, {"Location": f"/jobs/{job['job_id']}"}
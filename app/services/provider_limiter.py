@@ -0,0 +1,204 @@
+"""
+Per-provider concurrency lanes and rate limits for outbound calls.
+Every HTTP request a service sends takes an in-flight slot and a token from
+the provider's bucket, both held in Redis so the limits apply across workers.
+Callers that cannot get a slot wait in a bounded queue.
+"""
+# app/services/provider_limiter.py
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+# KEYS: in-flight slots (zset scored by lease expiry), token bucket (hash)
+# ARGV: token, now ms, lease ms, max in flight, rate per second, burst
+# Returns 0 when a slot was taken, -1 when every slot is busy, otherwise the
+# milliseconds until the bucket has a token again.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+redis.call("zremrangebyscore", KEYS[1], "-inf", now)
+local limit = tonumber(ARGV[4])
+if limit > 0 and redis.call("zcard", KEYS[1]) >= limit then
+    return -1
+end
+local rate = tonumber(ARGV[5])
+if rate > 0 then
+    local burst = tonumber(ARGV[6])
+    local state = redis.call("hmget", KEYS[2], "tokens", "ts")
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(now - ts, 0) * rate / 1000)
+    if tokens < 1 then
+        return math.ceil((1 - tokens) * 1000 / rate)
+    end
+    redis.call("hset", KEYS[2], "tokens", tokens - 1, "ts", now)
+    redis.call("pexpire", KEYS[2], math.ceil(burst * 1000 / rate) + 1000)
+end
+redis.call("zadd", KEYS[1], now + lease, ARGV[1])
+redis.call("pexpire", KEYS[1], lease)
+return 0
+"""
+
+
+class ProviderBusyError(Exception):
+    """Raised when a provider's queue is full or a queued call waited too long."""
+
+    def __init__(self, provider_name, reason, retry_after=1):
+        self.provider_name = provider_name
+        self.retry_after = max(int(retry_after), 1)
+        super().__init__(f"Provider {provider_name} is busy ({reason})")
+
+
+class ProviderLimiter:
+    """
+    Concurrency lane, token bucket and wait queue keyed by Provider.id.
+
+    Limits are max_in_flight (0 = unlimited), rate in requests per second with
+    a burst allowance (rate 0 = unlimited) and queue_depth callers allowed to
+    wait. Defaults apply to every provider and can be overridden per category
+    name (e.g. "CATEGORY3") or per provider name, the latter taking precedence.
+
+    Redis keys per provider:
+        lane:{id}:slots  -- zset of in-flight tokens scored by lease expiry (ms)
+        lane:{id}:bucket -- token bucket state
+        lane:{id}:queue  -- zset of waiting callers scored by wait expiry (ms)
+    """
+
+    def __init__(self, max_in_flight=8, rate=0.0, burst=None, queue_depth=32, queue_timeout=30,
+                 lease=120, poll_interval=0.05, overrides=None, enabled=True):
+        self.defaults = {
+            "max_in_flight": max_in_flight,
+            "rate": rate,
+            "burst": burst,
+            "queue_depth": queue_depth,
+            "queue_timeout": queue_timeout,
+        }
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.overrides = overrides or {}
+        self.enabled = enabled
+
+    def init_app(self, app):
+        """Read default limits and per-provider overrides from the app config."""
+        self.defaults.update({
+            "max_in_flight": app.config.get("PROVIDER_MAX_IN_FLIGHT", self.defaults["max_in_flight"]),
+            "rate": app.config.get("PROVIDER_RATE_LIMIT", self.defaults["rate"]),
+            "burst": app.config.get("PROVIDER_RATE_BURST", self.defaults["burst"]),
+            "queue_depth": app.config.get("PROVIDER_QUEUE_DEPTH", self.defaults["queue_depth"]),
+            "queue_timeout": app.config.get("PROVIDER_QUEUE_TIMEOUT", self.defaults["queue_timeout"]),
+        })
+        self.lease = app.config.get("PROVIDER_LANE_LEASE", self.lease)
+        self.overrides = app.config.get("PROVIDER_LIMITS", self.overrides)
+        self.enabled = app.config.get("PROVIDER_LIMITS_ENABLED", self.enabled)
+
+    @staticmethod
+    def _key(provider_id, field):
+        return f"lane:{provider_id}:{field}"
+
+    def limits(self, provider):
+        """Return the effective limits for a provider."""
+        limits = dict(self.defaults)
+        category = getattr(getattr(provider, "category", None), "name", None)
+        limits.update(self.overrides.get(category, {}))
+        limits.update(self.overrides.get(provider.name, {}))
+        if not limits["burst"]:
+            limits["burst"] = max(limits["rate"], 1)
+        return limits
+
+    @contextmanager
+    def lane(self, provider, sleep=time.sleep):
+        """
+        Hold one in-flight slot for the provider while the block runs.
+
+        Args:
+            provider: Provider the call goes to.
+            sleep: Used while queued; services pass their deadline-aware _sleep.
+
+        Raises:
+            ProviderBusyError: The queue is full or the wait exceeded queue_timeout.
+        """
+        token = self.acquire(provider, sleep) if self.enabled else None
+        try:
+            yield
+        finally:
+            if token is not None:
+                self.release(provider, token)
+
+    def acquire(self, provider, sleep=time.sleep):
+        """Take a slot, waiting in the queue if needed; returns the slot token (None if unlimited)."""
+        limits = self.limits(provider)
+        if not limits["max_in_flight"] and not limits["rate"]:
+            return None
+        token = uuid.uuid4().hex
+        queued = False
+        give_up_at = time.monotonic() + limits["queue_timeout"]
+        try:
+            while True:
+                wait_ms = self._try_acquire(provider, token, limits)
+                if wait_ms == 0:
+                    return token
+                if not queued:
+                    queued = True
+                    self._enqueue(provider, token, limits)
+                delay = self.poll_interval if wait_ms < 0 else wait_ms / 1000.0
+                remaining = give_up_at - time.monotonic()
+                if remaining <= 0:
+                    raise ProviderBusyError(provider.name, f"waited {limits['queue_timeout']}s for a slot")
+                sleep(min(delay, remaining))
+        except RedisError as e:
+            logger.warning(f"Provider lane unavailable for provider {provider.id}, not limiting: {e}")
+            return None
+        finally:
+            if queued:
+                self._dequeue(provider, token)
+
+    def release(self, provider, token):
+        """Give back a slot taken by acquire."""
+        try:
+            get_redis().zrem(self._key(provider.id, "slots"), token)
+        except RedisError as e:
+            logger.warning(f"Provider lane release failed for provider {provider.id}: {e}")
+
+    def _try_acquire(self, provider, token, limits):
+        return int(get_redis().eval(
+            ACQUIRE_SCRIPT, 2,
+            self._key(provider.id, "slots"), self._key(provider.id, "bucket"),
+            token, int(time.time() * 1000), int(self.lease * 1000),
+            limits["max_in_flight"], limits["rate"], limits["burst"],
+        ))
+
+    def _enqueue(self, provider, token, limits):
+        now_ms = int(time.time() * 1000)
+        key = self._key(provider.id, "queue")
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.zremrangebyscore(key, "-inf", now_ms)
+        pipe.zadd(key, {token: now_ms + int(limits["queue_timeout"] * 1000)})
+        pipe.pexpire(key, int(limits["queue_timeout"] * 1000))
+        pipe.zcard(key)
+        waiting = pipe.execute()[-1]
+        if waiting > limits["queue_depth"]:
+            logger.warning(f"[{provider.name}] Queue full ({limits['queue_depth']} waiting), rejecting call")
+            raise ProviderBusyError(provider.name, f"{limits['queue_depth']} calls already queued")
+
+    def _dequeue(self, provider, token):
+        try:
+            get_redis().zrem(self._key(provider.id, "queue"), token)
+        except RedisError as e:
+            logger.warning(f"Provider queue cleanup failed for provider {provider.id}: {e}")
+
+    def stats(self, provider_id):
+        """Return in-flight and queued call counts for a provider."""
+        now_ms = int(time.time() * 1000)
+        redis = get_redis()
+        return {
+            "in_flight": redis.zcount(self._key(provider_id, "slots"), now_ms, "+inf"),
+            "queued": redis.zcount(self._key(provider_id, "queue"), now_ms, "+inf"),
+        }
+
+
+provider_limiter = ProviderLimiter()
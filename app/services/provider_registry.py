@@ -0,0 +1,166 @@
+"""
+Process-local registry of Provider rows.
+API calls look providers up in memory instead of querying the database per
+request. Any commit that inserts, updates or deletes a provider bumps a
+version key in Redis; every process re-reads the table once it notices the
+new version, and drops pooled sessions of providers whose connection
+details changed.
+"""
+# app/services/provider_registry.py
+import logging
+import threading
+import time
+from collections import namedtuple
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+VERSION_KEY = "providers:version"
+
+
+def _slug(name):
+    return "".join(name.split()).lower()
+
+
+class ProviderSnapshot(namedtuple("ProviderSnapshot", "id name category base_url username password created_at")):
+    """Immutable copy of a Provider row, safe to share across threads and sessions."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.id, row.name, row.category, row.base_url, row.username, row.password, row.created_at)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "category": self.category.name,
+            "base_url": self.base_url,
+            "username": self.username,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class ProviderRegistry:
+    """
+    Provider snapshots keyed by id.
+
+    The shared version is checked at most every check_interval seconds, so a
+    change made by another process is seen within that time; changes
+    committed in this process are seen immediately.
+    """
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._providers = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read the check interval and watch the session for provider changes."""
+        self.check_interval = app.config.get("PROVIDER_REGISTRY_CHECK_INTERVAL", self.check_interval)
+        self._listen()
+
+    def get(self, provider_id):
+        """Return the provider's snapshot, or None."""
+        try:
+            provider_id = int(provider_id)
+        except (TypeError, ValueError):
+            return None
+        return self._current().get(provider_id)
+
+    def all(self):
+        """Every provider, ordered by id."""
+        return [provider for _, provider in sorted(self._current().items())]
+
+    def by_ids(self, provider_ids):
+        """Return {id: snapshot} for the ids that exist."""
+        providers = self._current()
+        return {provider_id: providers[provider_id] for provider_id in provider_ids if provider_id in providers}
+
+    def find(self, key):
+        """
+        Look a provider up by id or by name; names match ignoring case and
+        spaces, so "CashMachine" finds "Cash Machine".
+        """
+        if str(key).isdigit():
+            return self.get(key)
+        slug = _slug(key)
+        return next((provider for provider in self._current().values() if _slug(provider.name) == slug), None)
+
+    def bump(self):
+        """Announce a provider change to every process."""
+        self._checked_at = 0.0
+        try:
+            get_redis().incr(VERSION_KEY)
+        except RedisError as e:
+            logger.warning(f"Failed to publish provider change: {e}")
+            # At least this process reloads on its next lookup.
+            self._version = None
+
+    def _shared_version(self):
+        try:
+            return get_redis().get(VERSION_KEY) or "0"
+        except RedisError as e:
+            logger.warning(f"Provider version check failed: {e}")
+            return self._version
+
+    def _current(self):
+        providers = self._providers
+        if providers is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return providers
+        with self._lock:
+            if self._providers is None or time.monotonic() - self._checked_at >= self.check_interval:
+                version = self._shared_version()
+                if self._providers is None or version is None or version != self._version:
+                    self._reload(version)
+                self._checked_at = time.monotonic()
+            return self._providers
+
+    @staticmethod
+    def _load():
+        from app.models import Provider
+
+        return {row.id: ProviderSnapshot.from_row(row) for row in Provider.query.all()}
+
+    def _reload(self, version):
+        from .session_pool import session_pool
+
+        previous = self._providers or {}
+        self._providers = self._load()
+        self._version = version
+        changed = [
+            provider_id for provider_id, provider in previous.items()
+            if self._providers.get(provider_id) != provider
+        ]
+        for provider_id in changed:
+            # Sessions built for the old URL or credentials are useless now.
+            session_pool.invalidate(provider_id)
+        if previous:
+            logger.info(f"Provider registry reloaded (version {version}, {len(changed)} changed)")
+
+    def _listen(self):
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session, object_session
+        from app.models import Provider
+
+        def mark(mapper, connection, target):
+            session = object_session(target)
+            if session is not None:
+                session.info["providers_changed"] = True
+
+        def after_commit(session):
+            if session.info.pop("providers_changed", False):
+                self.bump()
+
+        for name in ("after_insert", "after_update", "after_delete"):
+            if not event.contains(Provider, name, mark):
+                event.listen(Provider, name, mark)
+        if not event.contains(Session, "after_commit", after_commit):
+            event.listen(Session, "after_commit", after_commit)
+
+
+provider_registry = ProviderRegistry()
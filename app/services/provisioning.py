@@ -0,0 +1,247 @@
+"""
+Player provisioning across providers.
+add_user runs on every requested provider at once, on each provider's
+category executor, so onboarding takes as long as the slowest provider. Legs that failed without an answer (errors and
+timeouts) are retried in the background with backoff; the job record in Redis shows each provider's outcome and the
+remote ids it returned.
+"""
+# app/services/provisioning.py
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from Crypto.Cipher import AES
+from redis.exceptions import RedisError
+from app.services.executor import OperationTimeout, operation_executor
+from app.services.provider_limiter import ProviderBusyError
+from app.services.retry import DeadlineExceeded
+from app.services.session_pool import session_pool
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+RETRY_QUEUE = "provision:retries"
+
+
+class Provisioner:
+    """
+    Creates a player on many providers concurrently and retries legs whose
+    outcome is unknown.
+
+    A job is a Redis hash provision:{job_id} with a "meta" field and one JSON
+    field per provider. While legs are waiting for a retry the password is
+    kept in a separate key, AES-GCM encrypted with a key derived from the
+    app's SECRET_KEY. Retries are claimed from a sorted set by due time, so
+    any worker's background thread can pick them up.
+    """
+
+    def __init__(self, retry_delays=(30, 120, 600), record_ttl=86400, interval=10, secret_key=None):
+        self.retry_delays = tuple(retry_delays)
+        self.record_ttl = record_ttl
+        self.interval = interval
+        self.secret_key = secret_key
+        self.enabled = False
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read retry settings and start the retry thread lazily on the first request."""
+        self.retry_delays = tuple(app.config.get("PROVISION_RETRY_DELAYS", self.retry_delays))
+        self.record_ttl = app.config.get("PROVISION_RECORD_TTL", self.record_ttl)
+        self.interval = app.config.get("PROVISION_RETRY_INTERVAL", self.interval)
+        self.enabled = app.config.get("PROVISION_RETRY_ENABLED", self.enabled)
+        self.secret_key = app.config.get("SECRET_KEY", self.secret_key)
+        self._app = app
+        app.before_request(self.ensure_started)
+
+    @staticmethod
+    def _key(job_id):
+        return f"provision:{job_id}"
+
+    @staticmethod
+    def _password_key(job_id):
+        return f"provision:{job_id}:password"
+
+    def _cipher(self, nonce=None):
+        key = hashlib.sha256(f"provision-password:{self.secret_key}".encode()).digest()
+        return AES.new(key, AES.MODE_GCM, nonce=nonce)
+
+    def _seal(self, password):
+        cipher = self._cipher()
+        ciphertext, tag = cipher.encrypt_and_digest(password.encode())
+        return base64.b64encode(cipher.nonce + tag + ciphertext).decode()
+
+    def _unseal(self, sealed):
+        """Decrypt a stored password; None when it was sealed with another secret."""
+        raw = base64.b64decode(sealed)
+        try:
+            return self._cipher(raw[:16]).decrypt_and_verify(raw[32:], raw[16:32]).decode()
+        except ValueError:
+            return None
+
+    def provision(self, username, password, providers, app=None):
+        """Run add_user on every provider concurrently and return the job record."""
+        job_id = uuid.uuid4().hex
+        meta = {"job_id": job_id, "username": username, "created_at": time.time()}
+        with app.app_context() if app is not None else nullcontext():
+            legs = self._attempt_all([(provider, username, password, 1) for provider in providers])
+
+        client = get_redis()
+        try:
+            pipe = client.pipeline()
+            pipe.hset(self._key(job_id), mapping={"meta": json.dumps(meta), **{
+                str(leg["provider_id"]): json.dumps(leg) for leg in legs
+            }})
+            pipe.expire(self._key(job_id), self.record_ttl)
+            retries = {f"{job_id}:{leg['provider_id']}": leg["next_retry_at"] for leg in legs if leg["status"] == "retrying"}
+            if retries:
+                pipe.set(self._password_key(job_id), self._seal(password), ex=sum(self.retry_delays) + self.interval * len(self.retry_delays) + 300)
+                pipe.zadd(RETRY_QUEUE, retries)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to record provisioning job {job_id}: {e}")
+        return dict(meta, legs=legs)
+
+    def job(self, job_id):
+        """Return the job record with its legs, or None when unknown or expired."""
+        fields = get_redis().hgetall(self._key(job_id))
+        if not fields or "meta" not in fields:
+            return None
+        meta = json.loads(fields.pop("meta"))
+        return dict(meta, legs=[json.loads(fields[provider_id]) for provider_id in sorted(fields, key=int)])
+
+    def _attempt_all(self, attempts):
+        """
+        Run (provider, username, password, attempt) legs concurrently on the
+        category executors and return their legs in order.
+
+        A leg that overruns the add_user timeout is cancelled; it may still
+        have created the account, so it is retried like any unknown outcome.
+        """
+        futures = []
+        for provider, username, password, attempt in attempts:
+            try:
+                futures.append(operation_executor.submit(provider, "add_user", self._attempt, provider, username, password, attempt))
+            except ProviderBusyError as e:
+                futures.append(e)
+        legs = []
+        for (provider, username, _, attempt), future in zip(attempts, futures):
+            if isinstance(future, ProviderBusyError):
+                # Never sent, so trying again later is safe.
+                legs.append(self._leg(provider, attempt, {"message": "User creation failed", "error": str(future)}, retryable=True))
+                continue
+            try:
+                legs.append(operation_executor.wait(future, provider, "add_user"))
+            except (OperationTimeout, DeadlineExceeded) as e:
+                logger.error(f"[{provider.name}] Provisioning {username} timed out on attempt {attempt}")
+                legs.append(self._leg(provider, attempt, {"message": "User creation failed", "error": str(e)}, retryable=True))
+        return legs
+
+    def _attempt(self, provider, username, password, attempt):
+        try:
+            with session_pool.lease(provider) as service:
+                # Only legs whose outcome was unknown are retried, so an account
+                # found now was created by the attempt whose answer was lost.
+                found = service._lookup_user_ids(username) if attempt > 1 else None
+                if found:
+                    result, ids = {"message": "User created"}, found
+                else:
+                    result = service.add_user(username, password)
+                    ids = service._cached_user_ids(username) or {}
+        except Exception as e:
+            logger.error(f"[{provider.name}] Provisioning {username} failed on attempt {attempt}: {e}")
+            return self._leg(provider, attempt, {"message": "User creation failed", "error": str(e)}, retryable=True)
+        return self._leg(provider, attempt, result, ids)
+
+    def _leg(self, provider, attempt, result, ids=None, retryable=False):
+        leg = {"provider_id": provider.id, "provider": provider.name, "attempts": attempt}
+        if isinstance(result, dict) and result.get("message") == "User created":
+            ids = dict(ids or {})
+            if result.get("user_id"):
+                ids["user_id"] = result["user_id"]
+            leg.update(status="created", remote_ids=ids)
+            return leg
+        leg["error"] = (result.get("error") or result.get("message")) if isinstance(result, dict) else "Operation failed"
+        # A provider's answer is final (e.g. the username is taken); only errors
+        # and timeouts may have created the account unseen and are retried.
+        if retryable and attempt <= len(self.retry_delays):
+            leg.update(status="retrying", next_retry_at=time.time() + self.retry_delays[attempt - 1])
+        else:
+            leg["status"] = "failed"
+        return leg
+
+    @staticmethod
+    def _providers(provider_ids):
+        from .provider_registry import provider_registry
+
+        return provider_registry.by_ids(provider_ids)
+
+    def retry_due(self, limit=50):
+        """Retry legs whose backoff has elapsed; returns how many were attempted."""
+        client = get_redis()
+        due = client.zrangebyscore(RETRY_QUEUE, "-inf", time.time(), start=0, num=limit)
+        # zrem is the claim: only one worker gets a given leg.
+        claimed = [member for member in due if client.zrem(RETRY_QUEUE, member)]
+        if not claimed:
+            return 0
+
+        providers = self._providers({int(member.rsplit(":", 1)[1]) for member in claimed})
+        retries, attempts = [], []
+        for member in claimed:
+            job_id, provider_id = member.rsplit(":", 1)
+            sealed = client.get(self._password_key(job_id))
+            password = self._unseal(sealed) if sealed is not None else None
+            previous, meta = client.hmget(self._key(job_id), provider_id, "meta")
+            provider = providers.get(int(provider_id))
+            if password is None or previous is None or meta is None or provider is None:
+                logger.warning(f"Dropping provisioning retry {member}: job, password or provider no longer available")
+                continue
+            retries.append((member, job_id, provider_id))
+            attempts.append((provider, json.loads(meta)["username"], password, json.loads(previous)["attempts"] + 1))
+
+        for (member, job_id, provider_id), (provider, *_), leg in zip(retries, attempts, self._attempt_all(attempts)):
+            client.hset(self._key(job_id), mapping={provider_id: json.dumps(leg)})
+            if leg["status"] == "retrying":
+                client.zadd(RETRY_QUEUE, {member: leg["next_retry_at"]})
+                continue
+            logger.info(f"[{provider.name}] Provisioning retry for job {job_id} finished: {leg['status']}")
+            legs = [json.loads(value) for field, value in client.hgetall(self._key(job_id)).items() if field != "meta"]
+            if not any(other["status"] == "retrying" for other in legs):
+                client.delete(self._password_key(job_id))
+        return len(claimed)
+
+    def ensure_started(self):
+        """Start the retry thread once per process."""
+        if not self.enabled or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="provision-retry", daemon=True)
+            self._thread.start()
+            logger.info("Provisioning retry thread started")
+
+    def stop(self):
+        """Stop the retry thread."""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self._app.app_context():
+                    self.retry_due()
+            except Exception as e:
+                logger.error(f"Provisioning retry cycle failed: {e}")
+
+
+provisioner = Provisioner()
@@ -0,0 +1,220 @@
+"""
+Retry policy engine for provider operations.
+The outermost retrying call starts a per-operation deadline that nested calls,
+HTTP timeouts and backoff sleeps all draw from, so one API request can no
+longer multiply attempts across nested retry loops.
+"""
+# app/services/retry.py
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+import httpx
+import requests
+from urllib3.exceptions import NewConnectionError
+from .circuit_breaker import CircuitOpenError
+from .provider_limiter import ProviderBusyError
+
+logger = logging.getLogger("automater")
+
+_current_deadline = contextvars.ContextVar("operation_deadline", default=None)
+_retrying = contextvars.ContextVar("retrying", default=False)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The operation's time budget ran out or it was cancelled."""
+
+
+class ReauthenticationFailed(ValueError):
+    """The provider rejected the session and logging in again failed."""
+
+
+class Deadline:
+    """Absolute time budget for one operation; sleeps against it can be cancelled."""
+
+    def __init__(self, seconds, parent=None):
+        self.expires_at = time.monotonic() + seconds
+        # A nested deadline shares its parent's cancellation.
+        self._cancelled = parent._cancelled if parent is not None else threading.Event()
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self):
+        return self.cancelled or self.remaining() <= 0
+
+    def cancel(self):
+        """Wake any sleeper and fail the operation at its next checkpoint."""
+        self._cancelled.set()
+
+    def check(self):
+        if self.cancelled:
+            raise DeadlineExceeded("Operation cancelled")
+        if self.remaining() <= 0:
+            raise DeadlineExceeded("Operation deadline exceeded")
+
+    def sleep(self, seconds):
+        """Sleep for up to `seconds`, never past the deadline."""
+        seconds = min(seconds, self.remaining())
+        if seconds > 0:
+            self._cancelled.wait(seconds)
+        self.check()
+
+    def clamp(self, timeout):
+        """Return an HTTP timeout that does not outlive the deadline."""
+        self.check()
+        remaining = self.remaining()
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(min(part, remaining) if part is not None else remaining for part in timeout)
+        return min(timeout, remaining)
+
+
+def current_deadline():
+    """Return the Deadline of the operation in progress, if any."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def operation_deadline(seconds):
+    """Run a block under a deadline; an enclosing deadline that ends sooner wins."""
+    outer = _current_deadline.get()
+    if seconds is None or (outer is not None and outer.remaining() <= seconds):
+        yield outer
+        return
+    deadline = Deadline(seconds, parent=outer)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def bound_deadline(deadline):
+    """Run a block under a Deadline created elsewhere, e.g. by a thread that may cancel it."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def _never_connected(exc):
+    """True when the request provably never reached the provider."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    cause = exc
+    while cause is not None:
+        if isinstance(cause, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return True
+        reason = getattr(cause, "reason", None)
+        if isinstance(cause, NewConnectionError) or isinstance(reason, NewConnectionError):
+            return True
+        cause = cause.args[0] if cause.args and isinstance(cause.args[0], BaseException) else cause.__cause__
+    return False
+
+
+class RetryEngine:
+    """Runs operations with jittered exponential backoff inside a shared deadline."""
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=8.0, deadline=60):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def init_app(self, app):
+        """Read retry settings from the app config."""
+        self.max_attempts = app.config.get("RETRY_MAX_ATTEMPTS", self.max_attempts)
+        self.base_delay = app.config.get("RETRY_BASE_DELAY", self.base_delay)
+        self.max_delay = app.config.get("RETRY_MAX_DELAY", self.max_delay)
+        self.deadline = app.config.get("OPERATION_DEADLINE", self.deadline)
+
+    @staticmethod
+    def should_retry(exc, idempotent=True):
+        """
+        Classify a failure.
+
+        Reads and logins are retried on transport and HTTP errors. Money-moving
+        writes are only retried when the request never reached the provider,
+        since a timeout or 5xx after sending may already have been applied.
+        A failed re-authentication is final (the login already used its own
+        attempts), and so are an open circuit and a provider whose queue is
+        full or already made the call wait.
+        """
+        if isinstance(exc, (DeadlineExceeded, ReauthenticationFailed, CircuitOpenError, ProviderBusyError)):
+            return False
+        if idempotent:
+            return isinstance(exc, (requests.RequestException, ValueError))
+        return _never_connected(exc)
+
+    def backoff(self, attempt, base_delay=None):
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        base = self.base_delay if base_delay is None else base_delay
+        return random.uniform(0, min(self.max_delay, base * 2 ** (attempt - 1)))
+
+    def run(self, func, args=(), kwargs=None, idempotent=True, max_attempts=None, base_delay=None, sleep=None):
+        """
+        Call func under the retry policy.
+
+        Nested calls made while another run() is active execute once; the
+        outermost call owns retries and the deadline.
+        """
+        kwargs = kwargs or {}
+        if _retrying.get():
+            return func(*args, **kwargs)
+        attempts = max_attempts or self.max_attempts
+        with operation_deadline(self.deadline) as deadline:
+            token = _retrying.set(True)
+            try:
+                attempt = 0
+                while True:
+                    attempt += 1
+                    try:
+                        return func(*args, **kwargs)
+                    except Exception as e:
+                        if attempt >= attempts or not self.should_retry(e, idempotent):
+                            raise
+                        delay = self.backoff(attempt, base_delay)
+                        if deadline is not None and deadline.remaining() <= delay:
+                            raise
+                        logger.warning(f"Retry {attempt}/{attempts - 1} for {func.__name__} after {delay:.2f}s: {e}")
+                        if sleep is not None:
+                            sleep(delay)
+                        elif deadline is not None:
+                            deadline.sleep(delay)
+                        else:
+                            time.sleep(delay)
+            finally:
+                _retrying.reset(token)
+
+
+retry_engine = RetryEngine()
+
+
+def retry_policy(idempotent=True, max_attempts=None, base_delay=None):
+    """Decorator running a service method under retry_engine."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(service, *args, **kwargs):
+            return retry_engine.run(
+                func,
+                (service,) + args,
+                kwargs,
+                idempotent=idempotent,
+                max_attempts=max_attempts,
+                base_delay=base_delay,
+                sleep=service._sleep,
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,204 @@
+"""
+Process-wide pool of provider service instances.
+Keeps logged-in sessions alive across requests so a warm provider only pays for
+the business round trips instead of a new TCP/TLS handshake and login.
+"""
+# app/services/session_pool.py
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from .circuit_breaker import circuit_breaker
+from .factory import GameServiceFactory
+from .login_coordinator import login_coordinator
+
+logger = logging.getLogger("automater")
+
+
+class _ProviderSlot:
+    """Idle service instances and health counters for one provider."""
+
+    def __init__(self):
+        self.idle = deque()  # (service, released_at) pairs, most recent on the right
+        self.in_use = 0
+        self.created = 0
+        self.reused = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_used = time.monotonic()
+
+
+class ProviderSessionPool:
+    """Hands out long-lived, already-authenticated services keyed by Provider.id."""
+
+    def __init__(self, max_providers=32, max_idle_per_provider=4, idle_timeout=900, max_consecutive_failures=3):
+        self.max_providers = max_providers
+        self.max_idle_per_provider = max_idle_per_provider
+        self.idle_timeout = idle_timeout
+        self.max_consecutive_failures = max_consecutive_failures
+        self._slots = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def init_app(self, app):
+        """Read pool limits from the app config."""
+        self.max_providers = app.config.get("SESSION_POOL_MAX_PROVIDERS", self.max_providers)
+        self.max_idle_per_provider = app.config.get("SESSION_POOL_MAX_IDLE_PER_PROVIDER", self.max_idle_per_provider)
+        self.idle_timeout = app.config.get("SESSION_POOL_IDLE_TIMEOUT", self.idle_timeout)
+        self.max_consecutive_failures = app.config.get("SESSION_POOL_MAX_CONSECUTIVE_FAILURES", self.max_consecutive_failures)
+        app.extensions["session_pool"] = self
+
+    def _service_class(self, provider):
+        return GameServiceFactory.service_class(provider)
+
+    def acquire(self, provider):
+        """
+        Check out a service for the provider, reusing an idle one when possible.
+
+        Raises CircuitOpenError while the provider's circuit is open.
+        """
+        circuit_breaker.check(provider)
+        discarded = []
+        with self._lock:
+            discarded.extend(self._sweep_locked())
+            slot = self._slots.get(provider.id)
+            if slot is None:
+                slot = self._slots[provider.id] = _ProviderSlot()
+            self._slots.move_to_end(provider.id)
+            slot.in_use += 1
+            slot.last_used = time.monotonic()
+            discarded.extend(self._enforce_capacity_locked())
+            service = None
+            if slot.idle:
+                service, _ = slot.idle.pop()
+                slot.reused += 1
+        self._close_all(discarded)
+
+        if service is not None:
+            # Rebind to the caller's row so credential changes are picked up.
+            service.provider = provider
+            if login_coordinator.generation(provider.id) > service._auth_generation:
+                # Another worker (or the background refresher) logged in since.
+                service._load_cached_data()
+            return service
+        try:
+            service = self._service_class(provider)(provider)
+        except Exception:
+            with self._lock:
+                slot.in_use -= 1
+            raise
+        with self._lock:
+            slot.created += 1
+        logger.info(f"[{provider.name}] Created pooled service session")
+        return service
+
+    def release(self, service, healthy=True, error=None):
+        """Return a service to the pool, discarding it if it is unhealthy."""
+        provider_id = service.provider.id
+        discarded = []
+        with self._lock:
+            slot = self._slots.get(provider_id)
+            if slot is None:
+                discarded.append(service)
+            else:
+                slot.in_use = max(slot.in_use - 1, 0)
+                slot.last_used = time.monotonic()
+                if healthy:
+                    slot.consecutive_failures = 0
+                else:
+                    slot.failures += 1
+                    slot.consecutive_failures += 1
+                    slot.last_error = str(error) if error else "Operation failed"
+                if not healthy or len(slot.idle) >= self.max_idle_per_provider:
+                    discarded.append(service)
+                else:
+                    slot.idle.append((service, time.monotonic()))
+                if slot.consecutive_failures >= self.max_consecutive_failures:
+                    # Drop every idle session; the provider is likely logged out or down.
+                    discarded.extend(service for service, _ in slot.idle)
+                    slot.idle.clear()
+        self._close_all(discarded)
+
+    @contextmanager
+    def lease(self, provider):
+        """Context manager around acquire/release that records failures."""
+        service = self.acquire(provider)
+        try:
+            yield service
+        except Exception as e:
+            self.release(service, healthy=False, error=e)
+            raise
+        else:
+            self.release(service)
+
+    def invalidate(self, provider_id):
+        """Close every idle session for a provider."""
+        with self._lock:
+            slot = self._slots.get(provider_id)
+            discarded = [service for service, _ in slot.idle] if slot else []
+            if slot:
+                slot.idle.clear()
+        self._close_all(discarded)
+
+    def evict_idle(self):
+        """Close sessions that have been idle longer than idle_timeout."""
+        with self._lock:
+            discarded = self._sweep_locked(force=True)
+        self._close_all(discarded)
+        return len(discarded)
+
+    def stats(self):
+        """Return per-provider pool and health counters."""
+        with self._lock:
+            return {
+                provider_id: {
+                    "idle": len(slot.idle),
+                    "in_use": slot.in_use,
+                    "created": slot.created,
+                    "reused": slot.reused,
+                    "failures": slot.failures,
+                    "consecutive_failures": slot.consecutive_failures,
+                    "healthy": slot.consecutive_failures < self.max_consecutive_failures,
+                    "last_error": slot.last_error,
+                }
+                for provider_id, slot in self._slots.items()
+            }
+
+    def _sweep_locked(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_sweep < min(self.idle_timeout, 60):
+            return []
+        self._last_sweep = now
+        discarded = []
+        for provider_id in list(self._slots):
+            slot = self._slots[provider_id]
+            while slot.idle and now - slot.idle[0][1] > self.idle_timeout:
+                discarded.append(slot.idle.popleft()[0])
+            if not slot.idle and not slot.in_use and now - slot.last_used > self.idle_timeout:
+                del self._slots[provider_id]
+        return discarded
+
+    def _enforce_capacity_locked(self):
+        discarded = []
+        for provider_id in list(self._slots):
+            if len(self._slots) <= self.max_providers:
+                break
+            slot = self._slots[provider_id]
+            if slot.in_use:
+                continue
+            discarded.extend(service for service, _ in slot.idle)
+            del self._slots[provider_id]
+        return discarded
+
+    def _close_all(self, services):
+        for service in services:
+            try:
+                service.close()
+            except Exception as e:
+                logger.error(f"Failed to close pooled session: {e}")
+
+
+session_pool = ProviderSessionPool()
@@ -0,0 +1,161 @@
+"""
+Background refresher that re-authenticates providers before their sessions expire.
+Tracks each provider's observed session lifetime (login to first expiry) in Redis
+and logs in proactively at a fraction of it, so user-facing calls almost never
+pay for a captcha login.
+"""
+# app/services/session_refresher.py
+import logging
+import os
+import threading
+import time
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+from .login_coordinator import login_coordinator
+
+logger = logging.getLogger("automater")
+
+
+class SessionRefresher:
+    """Session lifetime tracker plus a daemon thread that refreshes due providers."""
+
+    def __init__(self, interval=30, margin=0.8, smoothing=0.5, min_lifetime=60, default_lifetimes=None):
+        self.interval = interval
+        self.margin = margin
+        self.smoothing = smoothing
+        self.min_lifetime = min_lifetime
+        self.default_lifetimes = default_lifetimes or {}
+        self.enabled = False
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read refresh settings and start the thread lazily on the first request."""
+        self.interval = app.config.get("SESSION_REFRESH_INTERVAL", self.interval)
+        self.margin = app.config.get("SESSION_REFRESH_MARGIN", self.margin)
+        self.min_lifetime = app.config.get("SESSION_REFRESH_MIN_LIFETIME", self.min_lifetime)
+        self.default_lifetimes = app.config.get("SESSION_DEFAULT_LIFETIMES", self.default_lifetimes)
+        self.enabled = app.config.get("SESSION_REFRESH_ENABLED", self.enabled)
+        self._app = app
+        # Started per request instead of here so forked gunicorn workers each get a thread.
+        app.before_request(self.ensure_started)
+
+    @staticmethod
+    def _key(provider_id, field):
+        return f"session:{provider_id}:{field}"
+
+    def record_login(self, provider_id):
+        """Remember when the provider's current session was created."""
+        try:
+            get_redis().set(self._key(provider_id, "logged_in_at"), time.time())
+        except RedisError as e:
+            logger.warning(f"Failed to record login time for provider {provider_id}: {e}")
+
+    def record_expiry(self, provider_id):
+        """Fold the lifetime of the session that just expired into the estimate."""
+        client = get_redis()
+        try:
+            logged_in_at = client.get(self._key(provider_id, "logged_in_at"))
+            if logged_in_at is None:
+                return
+            # Only the first worker to notice this session's expiry records it.
+            if not client.delete(self._key(provider_id, "logged_in_at")):
+                return
+            observed = max(time.time() - float(logged_in_at), self.min_lifetime)
+            previous = client.get(self._key(provider_id, "lifetime"))
+            lifetime = observed if previous is None else (
+                self.smoothing * observed + (1 - self.smoothing) * float(previous)
+            )
+            client.set(self._key(provider_id, "lifetime"), lifetime)
+            logger.info(f"Provider {provider_id} session lasted {observed:.0f}s, lifetime estimate {lifetime:.0f}s")
+        except RedisError as e:
+            logger.warning(f"Failed to record session expiry for provider {provider_id}: {e}")
+
+    def lifetime(self, provider_id, category=None):
+        """Return the estimated session lifetime in seconds, or None if unknown."""
+        try:
+            value = get_redis().get(self._key(provider_id, "lifetime"))
+        except RedisError:
+            value = None
+        if value is not None:
+            return float(value)
+        return self.default_lifetimes.get(category)
+
+    def is_due(self, provider_id, category=None):
+        """True when the provider's session is close enough to expiry to refresh."""
+        lifetime = self.lifetime(provider_id, category)
+        if not lifetime:
+            return False
+        try:
+            logged_in_at = get_redis().get(self._key(provider_id, "logged_in_at"))
+        except RedisError:
+            return False
+        if logged_in_at is None:
+            # No live session known; the next request logs in reactively.
+            return False
+        return time.time() >= float(logged_in_at) + lifetime * self.margin
+
+    def ensure_started(self):
+        """Start the refresh thread once per process."""
+        if not self.enabled or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="session-refresher", daemon=True)
+            self._thread.start()
+            logger.info("Session refresher started")
+
+    def stop(self):
+        """Stop the refresh thread."""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self._app.app_context():
+                    self.refresh_due()
+            except Exception as e:
+                logger.error(f"Session refresh cycle failed: {e}")
+
+    def refresh_due(self):
+        """
+        Log in again for every provider whose session is about to expire.
+
+        Providers whose circuit is open are skipped, and a provider that fails
+        to refresh does not stop the others from being refreshed.
+        """
+        from .circuit_breaker import CircuitOpenError, circuit_breaker
+        from .provider_registry import provider_registry
+        from .session_pool import session_pool
+
+        refreshed = 0
+        for provider in provider_registry.all():
+            category = provider.category.name
+            try:
+                circuit_breaker.check(provider)
+                if not self.is_due(provider.id, category):
+                    continue
+                with session_pool.lease(provider) as service:
+                    # Another worker may have refreshed while we were taking the lock.
+                    result = login_coordinator.try_login(service, should_login=lambda: self.is_due(provider.id, category))
+            except CircuitOpenError:
+                logger.info(f"[{provider.name}] Circuit open, skipping proactive session refresh")
+                continue
+            except Exception as e:
+                logger.error(f"[{provider.name}] Proactive session refresh failed: {e}")
+                continue
+            if result:
+                refreshed += 1
+                logger.info(f"[{provider.name}] Session refreshed proactively")
+            elif result is False:
+                logger.warning(f"[{provider.name}] Proactive session refresh failed")
+        return refreshed
+
+
+session_refresher = SessionRefresher()
@@ -0,0 +1,106 @@
+"""
+Two-level cache of provider usernames to remote user ids.
+Money operations look the player up on every call; with the ids cached they
+skip that round trip. Entries live in a small per-process LRU in front of
+Redis, which shares them across workers.
+"""
+# app/services/user_cache.py
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from redis.exceptions import RedisError
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("automater")
+
+
+class UserIdCache:
+    """
+    Maps (provider_id, username) to the ids a provider needs, e.g.
+    {"user_id": "123"} or {"user_id": "123", "game_id": "456"} for Category3.
+
+    The local level has a short TTL so an invalidation in one worker reaches
+    the others quickly; the Redis level keeps entries for a day by default,
+    since remote ids only change when an account is deleted.
+    """
+
+    def __init__(self, max_local=10000, local_ttl=300, ttl=86400, enabled=True):
+        self.max_local = max_local
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self.enabled = enabled
+        self._local = OrderedDict()  # key -> (ids, expires_at)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read cache sizes and TTLs from the app config."""
+        self.max_local = app.config.get("USER_ID_CACHE_MAX_LOCAL", self.max_local)
+        self.local_ttl = app.config.get("USER_ID_CACHE_LOCAL_TTL", self.local_ttl)
+        self.ttl = app.config.get("USER_ID_CACHE_TTL", self.ttl)
+        self.enabled = app.config.get("USER_ID_CACHE_ENABLED", self.enabled)
+
+    @staticmethod
+    def _key(provider_id, username):
+        return f"userid:{provider_id}:{username}"
+
+    def get(self, provider_id, username):
+        """Return the cached ids, or None on a miss."""
+        if not self.enabled:
+            return None
+        key = self._key(provider_id, username)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._local.move_to_end(key)
+                    return dict(entry[0])
+                del self._local[key]
+        try:
+            value = get_redis().get(key)
+        except RedisError as e:
+            logger.warning(f"User id cache lookup failed for provider {provider_id}: {e}")
+            return None
+        if value is None:
+            return None
+        ids = json.loads(value)
+        self._store_local(key, ids)
+        return dict(ids)
+
+    def set(self, provider_id, username, ids):
+        """Remember the ids a search or add_user returned."""
+        if not self.enabled:
+            return
+        key = self._key(provider_id, username)
+        self._store_local(key, ids)
+        try:
+            get_redis().set(key, json.dumps(ids), ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"User id cache store failed for provider {provider_id}: {e}")
+
+    def invalidate(self, provider_id, username):
+        """Forget a user, e.g. after the provider no longer recognises the cached id."""
+        key = self._key(provider_id, username)
+        with self._lock:
+            self._local.pop(key, None)
+        try:
+            get_redis().delete(key)
+        except RedisError as e:
+            logger.warning(f"User id cache invalidation failed for provider {provider_id}: {e}")
+
+    def clear_local(self):
+        """Drop the in-process level."""
+        with self._lock:
+            self._local.clear()
+
+    def _store_local(self, key, ids):
+        with self._lock:
+            self._local[key] = (dict(ids), time.monotonic() + self.local_ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local:
+                self._local.popitem(last=False)
+
+
+user_id_cache = UserIdCache()
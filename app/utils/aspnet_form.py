@@ -0,0 +1,46 @@
+"""
+Single-pass extraction of ASP.NET WebForms state from HTML pages.
+Scans the page for <input> tags only, skipping comments, and stops as soon as
+every requested field has been seen, instead of building a full parse tree.
+"""
+
+import html
+import re
+
+FORM_STATE_FIELDS = ("__VIEWSTATE", "__EVENTVALIDATION", "__VIEWSTATEGENERATOR")
+
+# An <input> tag (quoted attribute values may contain '>') or a comment to skip.
+_TAG_RE = re.compile(r"""<!--.*?-->|<input\b((?:[^>"']|"[^"]*"|'[^']*')*)>""", re.IGNORECASE | re.DOTALL)
+_ATTR_RE = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?""")
+
+
+def _attributes(raw):
+    attributes = {}
+    for match in _ATTR_RE.finditer(raw):
+        # A repeated attribute keeps its last value, as BeautifulSoup does.
+        attributes[match.group(1).lower()] = next((group for group in match.groups()[1:] if group is not None), "")
+    return attributes
+
+
+def extract_form_state(text, fields=FORM_STATE_FIELDS):
+    """
+    Return {name: value} for the first <input> carrying each requested name.
+
+    Values are HTML-unescaped. Fields missing from the page map to ''. Names
+    must appear literally in the tag (not as character references).
+    """
+    wanted = set(fields)
+    found = dict.fromkeys(fields, "")
+    for match in _TAG_RE.finditer(text):
+        raw = match.group(1)
+        # Cheap substring test first: most inputs on list pages are unrelated.
+        if raw is None or not any(name in raw for name in wanted):
+            continue
+        attributes = _attributes(raw)
+        name = html.unescape(attributes.get("name", ""))
+        if name in wanted:
+            found[name] = html.unescape(attributes.get("value", ""))
+            wanted.discard(name)
+            if not wanted:
+                break
+    return found
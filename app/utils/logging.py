@@ -2,8 +2,7 @@
 Utility for logging API requests.
 """
 
-from app.models import APILog
-from app import db
+from app.services.api_log_writer import api_log_writer
 import logging
 
 def setup_logging():
@@ -18,8 +17,8 @@ def setup_logging():
 
 
 def log_api_call(account_id, token, remote_provider, method, path, status_code, is_successful, description=None):
-    """Log an API request."""
-    log = APILog(
+    """Log an API request; the row is written in the background by api_log_writer."""
+    api_log_writer.write(
         account_id=account_id,
         token=token,
         remote_provider=remote_provider,
@@ -29,5 +28,3 @@ def log_api_call(account_id, token, remote_provider, method, path, status_code,
         is_successful=is_successful,
         description=description
     )
-    db.session.add(log)
-    db.session.commit()
\ No newline at end of file
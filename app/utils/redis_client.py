@@ -0,0 +1,43 @@
+"""
+Shared Redis client for state that must be visible across workers and nodes
+(login locks, counters, circuit state).
+"""
+
+import logging
+import threading
+import redis
+from flask import current_app, has_app_context
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis():
+    """
+    Return the shared Redis client.
+
+    The client is created lazily from CACHE_REDIS_URL, so it also works from
+    background threads that run outside an application context.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                url = current_app.config.get("CACHE_REDIS_URL") if has_app_context() else Config.CACHE_REDIS_URL
+                _client = redis.Redis.from_url(
+                    url,
+                    decode_responses=True,
+                    socket_timeout=2,
+                    socket_connect_timeout=2,
+                )
+    return _client
+
+
+def set_redis(client):
+    """Replace the shared client (e.g. with a fake in tests)."""
+    global _client
+    with _client_lock:
+        _client = client
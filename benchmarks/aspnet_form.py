@@ -0,0 +1,83 @@
+"""
+CPU time and peak allocations per page for extracting ASP.NET form state, comparing
+the BeautifulSoup lookup Category3Service used before with the single-pass
+extractor in app.utils.aspnet_form.
+
+Pages come from tests/fixtures/category3 unless a directory of recorded pages
+(*.html) is given.
+
+Usage:
+    python -m benchmarks.aspnet_form
+    python -m benchmarks.aspnet_form --pages recorded_pages/ --iterations 500
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from app.utils.aspnet_form import FORM_STATE_FIELDS, extract_form_state
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "fixtures", "category3")
+
+
+def soup_form_state(text):
+    """The previous implementation: full html.parser tree, two finds per field."""
+    soup = BeautifulSoup(text, "html.parser")
+    return {
+        name: soup.find("input", {"name": name})["value"] if soup.find("input", {"name": name}) else ""
+        for name in FORM_STATE_FIELDS
+    }
+
+
+def cpu_per_call(extract, text, iterations):
+    started = time.process_time()
+    for _ in range(iterations):
+        extract(text)
+    return (time.process_time() - started) / iterations
+
+
+def peak_allocation(extract, text):
+    """Peak memory allocated by the Python allocator during one call."""
+    tracemalloc.start()
+    try:
+        extract(text)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def load_pages(directory):
+    pages = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as page:
+                pages[name] = page.read()
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=FIXTURES, help="directory of recorded *.html pages")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    print(f"{'page':<24}{'size':>9}  {'soup cpu':>10}{'fast cpu':>10}{'speedup':>9}  {'soup peak':>11}{'fast peak':>11}")
+    for name, text in pages.items():
+        if extract_form_state(text) != soup_form_state(text):
+            print(f"{name:<24}  MISMATCH between extractors")
+            continue
+        soup_cpu = cpu_per_call(soup_form_state, text, args.iterations)
+        fast_cpu = cpu_per_call(extract_form_state, text, args.iterations)
+        soup_peak = peak_allocation(soup_form_state, text)
+        fast_peak = peak_allocation(extract_form_state, text)
+        print(
+            f"{name:<24}{len(text) // 1024:>7}KB  "
+            f"{soup_cpu * 1000:>8.2f}ms{fast_cpu * 1000:>8.3f}ms{soup_cpu / max(fast_cpu, 1e-9):>8.0f}x  "
+            f"{soup_peak / 1024:>9.0f}KB{fast_peak / 1024:>9.0f}KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
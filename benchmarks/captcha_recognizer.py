@@ -0,0 +1,112 @@
+"""
+Accuracy and latency benchmark for the offline numeric captcha recognizer.
+
+Trains the k-NN model on one part of a corpus and reports full-answer accuracy,
+per-digit accuracy and per-image latency on the rest. The corpus is either a
+directory of recorded captchas named '<answer>_<anything>.png' or a synthetic
+set rendered here.
+
+Usage:
+    python -m benchmarks.captcha_recognizer
+    python -m benchmarks.captcha_recognizer --corpus captchas/ --save-model captcha_model.npz
+"""
+
+import argparse
+import io
+import random
+import statistics
+import time
+from PIL import Image, ImageDraw, ImageFont
+from app.services.captcha_recognizer import DigitCaptchaRecognizer, LocalCaptchaSolver, load_labelled_samples
+
+
+def render_captcha(answer, rng, scale=3):
+    """Render a noisy numeric captcha roughly like the provider ones."""
+    font = ImageFont.load_default()
+    width, height = 12 + 8 * len(answer), 20
+    image = Image.new("L", (width, height), color=rng.randint(215, 255))
+    draw = ImageDraw.Draw(image)
+    x = 4
+    for digit in answer:
+        draw.text((x + rng.randint(-1, 1), 4 + rng.randint(-2, 2)), digit, fill=rng.randint(0, 60), font=font)
+        x += 8
+    image = image.resize((width * scale, height * scale), Image.NEAREST)
+    draw = ImageDraw.Draw(image)
+    for _ in range(2):
+        # Thin interference lines, as on the provider captchas.
+        draw.line(
+            [(0, rng.randint(0, height * scale)), (width * scale, rng.randint(0, height * scale))],
+            fill=rng.randint(120, 200),
+            width=1,
+        )
+    pixels = image.load()
+    for _ in range(width * height // 4):
+        pixels[rng.randrange(width * scale), rng.randrange(height * scale)] = rng.choice((0, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def synthetic_corpus(size, seed):
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(size):
+        answer = "".join(rng.choice("0123456789") for _ in range(rng.choice((4, 5))))
+        samples.append((render_captcha(answer, rng), answer))
+    return samples
+
+
+def run(samples, train_fraction, min_confidence, save_model=None):
+    split = int(len(samples) * train_fraction)
+    train, test = samples[:split], samples[split:]
+    recognizer = DigitCaptchaRecognizer()
+    started = time.perf_counter()
+    used = recognizer.train(train)
+    train_seconds = time.perf_counter() - started
+    if save_model:
+        recognizer.save(save_model)
+
+    solver = LocalCaptchaSolver(recognizer, min_confidence=min_confidence)
+    latencies, correct, digits_correct, digits_total = [], 0, 0, 0
+    accepted, accepted_correct = 0, 0
+    for image, answer in test:
+        started = time.perf_counter()
+        text, _ = recognizer.recognize(image)
+        latencies.append((time.perf_counter() - started) * 1000)
+        correct += text == answer
+        digits_total += len(answer)
+        digits_correct += sum(a == b for a, b in zip(text, answer)) if len(text) == len(answer) else 0
+        solved = solver.solve(image)
+        if solved is not None:
+            accepted += 1
+            accepted_correct += solved == answer
+
+    latencies.sort()
+    print(f"training samples used : {used}/{len(train)} ({train_seconds:.2f}s)")
+    print(f"test samples          : {len(test)}")
+    print(f"answer accuracy       : {correct / len(test):.1%}")
+    print(f"digit accuracy        : {digits_correct / digits_total:.1%}")
+    # What the solver chain sees: declined answers go on to 2Captcha.
+    print(f"accepted locally      : {accepted / len(test):.1%} "
+          f"(accuracy {accepted_correct / max(accepted, 1):.1%} at min_confidence={min_confidence})")
+    print(f"latency p50/p95/max   : {statistics.median(latencies):.2f} / "
+          f"{latencies[int(len(latencies) * 0.95) - 1]:.2f} / {latencies[-1]:.2f} ms per image")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of recorded, labelled captcha images")
+    parser.add_argument("--size", type=int, default=600, help="Synthetic corpus size")
+    parser.add_argument("--train-fraction", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--min-confidence", type=float, default=1.0)
+    parser.add_argument("--save-model", help="Write the trained model (.npz) for CAPTCHA_MODEL_PATH")
+    args = parser.parse_args()
+
+    samples = load_labelled_samples(args.corpus) if args.corpus else synthetic_corpus(args.size, args.seed)
+    random.Random(args.seed).shuffle(samples)
+    run(samples, args.train_fraction, args.min_confidence, args.save_model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Worst-case latency of provider operations against a failing provider, before
+and after the deadline-aware retry engine.
+
+Runs the real service code on a virtual clock, so minutes of simulated backoff
+and hung requests finish instantly. "before" swaps in a replica of the old
+retry_on_failure decorator (no deadline, every nested decorator retries,
+4 s/8 s sleeps, writes retried like reads); "after" is the shipped engine with
+the jitter pinned to its maximum.
+
+Usage:
+    python -m benchmarks.retry_latency
+    python -m benchmarks.retry_latency --hang 120 --deadline 45
+"""
+
+import argparse
+import logging
+import time
+import types
+import requests
+from flask import Flask
+from app.services import base_service, retry
+from app.services.category1_service import Category1Service
+from app.services.category4_service import Category4Service
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class VirtualClock:
+    """Replaces time.monotonic/time.sleep; sleeping just advances the clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class LegacyRetryEngine(retry.RetryEngine):
+    """The pre-engine retry_on_failure behaviour, for comparison."""
+
+    def __init__(self):
+        super().__init__(deadline=None)
+
+    @staticmethod
+    def should_retry(exc, idempotent=True):
+        # Internal write loops used to retry every exception.
+        return True
+
+    def run(self, func, args=(), kwargs=None, idempotent=True, max_attempts=None, base_delay=None, sleep=None):
+        max_retries, base_delay = max_attempts or 3, base_delay or 2
+        attempts = 0
+        while attempts < max_retries:
+            try:
+                return func(*args, **(kwargs or {}))
+            except (requests.RequestException, ValueError):
+                attempts += 1
+                if attempts == max_retries:
+                    raise
+                time.sleep(base_delay * (2 ** attempts))
+
+
+def failing_transport(clock, scenario, hang):
+    """Build a Session.request replacement that fails the way `scenario` says."""
+    def request(method, url, timeout=None, **kwargs):
+        if scenario == "hang":
+            # No response until the client timeout (or the provider's own `hang`).
+            limit = timeout[-1] if isinstance(timeout, tuple) else timeout
+            clock.sleep(hang if limit is None else min(limit, hang))
+            raise requests.ReadTimeout(f"{method} {url} timed out")
+        if scenario == "refused":
+            clock.sleep(0.05)
+            raise requests.ConnectionError(f"{method} {url} refused")
+        clock.sleep(0.2)
+        response = requests.Response()
+        response.status_code = 401
+        response._content = b'{"message": "Unauthenticated"}'
+        response.url = url
+        return response
+    return request
+
+
+OPERATIONS = {
+    "category1.recharge": (Category1Service, lambda service: service.recharge("player1", 10)),
+    "category1.get_balances": (Category1Service, lambda service: service.get_balances("player1")),
+    "category4.get_balances": (Category4Service, lambda service: service.get_balances("player1")),
+}
+
+
+def measure(app, clock, operation, scenario, hang):
+    service_class, call = OPERATIONS[operation]
+    provider = types.SimpleNamespace(id=1, name="Benchmark", base_url="http://provider.invalid", username="agent", password="secret")
+    with app.app_context():
+        set_redis(FakeRedis())
+        service = service_class(provider)
+        service.session.request = failing_transport(clock, scenario, hang)
+        started = clock.monotonic()
+        try:
+            outcome = call(service).get("message")
+        except Exception as e:
+            outcome = type(e).__name__
+        return clock.monotonic() - started, outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hang", type=float, default=60.0, help="seconds a hung provider takes to fail a request")
+    parser.add_argument("--deadline", type=float, default=60.0, help="OPERATION_DEADLINE for the new engine")
+    args = parser.parse_args()
+    logging.getLogger("automater").setLevel(logging.CRITICAL)
+
+    clock = VirtualClock()
+    time.monotonic, time.sleep = clock.monotonic, clock.sleep
+    # Deadline sleeps wait on an Event so they can be cancelled; make them virtual too.
+    retry.threading = types.SimpleNamespace(Event=lambda: types.SimpleNamespace(wait=clock.sleep, is_set=lambda: False))
+    retry.random.uniform = lambda low, high: high  # worst-case jitter
+    app = Flask(__name__)
+    app.logger.setLevel(logging.CRITICAL)
+
+    engines = {"before": LegacyRetryEngine(), "after": retry.RetryEngine(deadline=args.deadline)}
+    print(f"{'operation':<26}{'scenario':<10}{'before (s)':>12}{'after (s)':>12}  outcome after")
+    for operation in OPERATIONS:
+        for scenario in ("hang", "refused", "expired"):
+            results = {}
+            for label, engine in engines.items():
+                retry.retry_engine = base_service.retry_engine = engine
+                results[label] = measure(app, clock, operation, scenario, args.hang)
+            print(f"{operation:<26}{scenario:<10}{results['before'][0]:>12.1f}{results['after'][0]:>12.1f}  {results['after'][1]}")
+
+
+if __name__ == "__main__":
+    main()
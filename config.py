@@ -26,9 +26,130 @@ class Config:
     CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', f'redis://{os.getenv("REDIS_HOST", "localhost")}:{os.getenv("REDIS_PORT", "6379")}/{os.getenv("REDIS_DB", "0")}')
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 300))  # 5 minutes default
 
+    # Provider session pool: logged-in service instances reused across requests
+    SESSION_POOL_MAX_PROVIDERS = int(os.getenv('SESSION_POOL_MAX_PROVIDERS', 32))
+    SESSION_POOL_MAX_IDLE_PER_PROVIDER = int(os.getenv('SESSION_POOL_MAX_IDLE_PER_PROVIDER', 4))
+    SESSION_POOL_IDLE_TIMEOUT = int(os.getenv('SESSION_POOL_IDLE_TIMEOUT', 900))  # seconds
+    SESSION_POOL_MAX_CONSECUTIVE_FAILURES = int(os.getenv('SESSION_POOL_MAX_CONSECUTIVE_FAILURES', 3))
+
+    # Single-flight provider re-authentication (shared through Redis)
+    LOGIN_LOCK_TIMEOUT = int(os.getenv('LOGIN_LOCK_TIMEOUT', 120))  # seconds a login may hold the lock
+    LOGIN_WAIT_TIMEOUT = int(os.getenv('LOGIN_WAIT_TIMEOUT', 90))  # seconds other workers wait for it
+
+    # Retry policy: one deadline per provider operation shared by nested calls, sleeps and HTTP timeouts
+    OPERATION_DEADLINE = int(os.getenv('OPERATION_DEADLINE', 60))  # seconds
+    RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', 3))
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 1.0))  # seconds, doubled per attempt with full jitter
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 8.0))
+
+    # Shared per-category executors for API operations
+    EXECUTOR_WORKERS = int(os.getenv('EXECUTOR_WORKERS', 16))  # threads per provider category
+    EXECUTOR_SIZES = {}  # per-category overrides, e.g. {"CATEGORY3": 8}
+    EXECUTOR_QUEUE_DEPTH = int(os.getenv('EXECUTOR_QUEUE_DEPTH', 64))  # operations waiting for a thread
+    OPERATION_TIMEOUT = float(os.getenv('OPERATION_TIMEOUT', 60))  # seconds before an API call answers 504
+    OPERATION_TIMEOUTS = {"login": 120, "add_user": 90}  # per-action overrides (captcha logins are slow)
+    OPERATION_HEDGE_DELAY = float(os.getenv('OPERATION_HEDGE_DELAY', 3))  # seconds before a slow balance read is duplicated (0 = off)
+
+    # Asynchronous jobs (Prefer: respond-async)
+    JOB_TTL = int(os.getenv('JOB_TTL', 3600))  # seconds a job's result is kept
+    JOB_CALLBACK_TIMEOUT = int(os.getenv('JOB_CALLBACK_TIMEOUT', 10))  # seconds
+    JOB_CALLBACK_WORKERS = int(os.getenv('JOB_CALLBACK_WORKERS', 4))  # threads sending callbacks
+    # Hosts callback_url may point at, comma separated; ".example.com" allows its subdomains. Empty disables callbacks.
+    JOB_CALLBACK_HOSTS = [host.strip() for host in os.getenv('JOB_CALLBACK_HOSTS', '').split(',') if host.strip()]
+    JOB_CALLBACK_SECRET = os.getenv('JOB_CALLBACK_SECRET')  # HMAC-SHA256 key for the X-Job-Signature header
+
+    # APILog rows are queued and inserted in batches by a background thread
+    API_LOG_BUFFERED = os.getenv('API_LOG_BUFFERED', 'true').lower() == 'true'
+    API_LOG_QUEUE_SIZE = int(os.getenv('API_LOG_QUEUE_SIZE', 10000))  # rows held before new ones are dropped
+    API_LOG_BATCH_SIZE = int(os.getenv('API_LOG_BATCH_SIZE', 500))  # rows per INSERT
+    API_LOG_FLUSH_INTERVAL = float(os.getenv('API_LOG_FLUSH_INTERVAL', 1.0))  # seconds a row may wait
+    API_LOG_RETRY_DELAY = float(os.getenv('API_LOG_RETRY_DELAY', 1.0))  # seconds before retrying a failed batch
+
+    # Idempotency-Key on recharge/redeem
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))  # seconds a finished outcome is replayed
+    IDEMPOTENCY_GRACE = int(os.getenv('IDEMPOTENCY_GRACE', 60))  # seconds a keyed write may run past its 504
+
+    # In-memory provider registry, reloaded when the providers:version key changes
+    PROVIDER_REGISTRY_CHECK_INTERVAL = float(os.getenv('PROVIDER_REGISTRY_CHECK_INTERVAL', 5))  # seconds
+
+    # Circuit breaker per provider (state shared through Redis)
+    CIRCUIT_BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+    CIRCUIT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', 60))  # seconds of calls considered
+    CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', 10))  # calls in the window before it can trip
+    CIRCUIT_FAILURE_RATE = float(os.getenv('CIRCUIT_FAILURE_RATE', 0.5))
+    CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', 10.0))
+    CIRCUIT_SLOW_CALL_RATE = float(os.getenv('CIRCUIT_SLOW_CALL_RATE', 0.8))
+    CIRCUIT_COOLDOWN = int(os.getenv('CIRCUIT_COOLDOWN', 30))  # seconds open before a probe is sent
+
+    # Per-provider outbound limits (shared through Redis); 0 disables a limit
+    PROVIDER_LIMITS_ENABLED = os.getenv('PROVIDER_LIMITS_ENABLED', 'true').lower() == 'true'
+    PROVIDER_MAX_IN_FLIGHT = int(os.getenv('PROVIDER_MAX_IN_FLIGHT', 8))  # concurrent requests per provider
+    PROVIDER_RATE_LIMIT = float(os.getenv('PROVIDER_RATE_LIMIT', 0))  # requests per second
+    PROVIDER_RATE_BURST = int(os.getenv('PROVIDER_RATE_BURST', 0))  # bucket size, defaults to one second of rate
+    PROVIDER_QUEUE_DEPTH = int(os.getenv('PROVIDER_QUEUE_DEPTH', 32))  # callers allowed to wait for a slot
+    PROVIDER_QUEUE_TIMEOUT = int(os.getenv('PROVIDER_QUEUE_TIMEOUT', 30))  # seconds a caller may wait
+    PROVIDER_LANE_LEASE = int(os.getenv('PROVIDER_LANE_LEASE', 120))  # seconds before a crashed worker's slot frees
+    # Overrides by category name or provider name, e.g. {"Fire Kirin": {"max_in_flight": 2, "rate": 5}}
+    PROVIDER_LIMITS = {
+        # ASP.NET backends share one VIEWSTATE per agent session, so serialize them.
+        "CATEGORY3": {"max_in_flight": 1},
+    }
+
+    # Username -> remote user id cache (in-process LRU in front of Redis)
+    USER_ID_CACHE_ENABLED = os.getenv('USER_ID_CACHE_ENABLED', 'true').lower() == 'true'
+    USER_ID_CACHE_MAX_LOCAL = int(os.getenv('USER_ID_CACHE_MAX_LOCAL', 10000))  # entries per process
+    USER_ID_CACHE_LOCAL_TTL = int(os.getenv('USER_ID_CACHE_LOCAL_TTL', 300))  # seconds
+    USER_ID_CACHE_TTL = int(os.getenv('USER_ID_CACHE_TTL', 86400))  # seconds in Redis
+
+    # Category3 per-user action page URLs (GrantTreasure/ChangeTreasure/ResetPassWord)
+    ACTION_URL_CACHE_ENABLED = os.getenv('ACTION_URL_CACHE_ENABLED', 'true').lower() == 'true'
+    ACTION_URL_CACHE_TTL = int(os.getenv('ACTION_URL_CACHE_TTL', 21600))  # seconds
+
+    # Shadow agent balance for Category1/5 transfers, re-read from the provider after this age
+    AGENT_LEDGER_ENABLED = os.getenv('AGENT_LEDGER_ENABLED', 'true').lower() == 'true'
+    AGENT_LEDGER_MAX_AGE = int(os.getenv('AGENT_LEDGER_MAX_AGE', 300))  # seconds
+
+    # Bulk recharge/redeem endpoint
+    BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', 500))  # items per request
+    BULK_MAX_PER_PROVIDER = int(os.getenv('BULK_MAX_PER_PROVIDER', 4))  # concurrent items per provider
+
+    # Cross-provider player balance lookups
+    BALANCE_FANOUT_DEADLINE = float(os.getenv('BALANCE_FANOUT_DEADLINE', 8))  # seconds, default per request
+    BALANCE_FANOUT_MAX_DEADLINE = float(os.getenv('BALANCE_FANOUT_MAX_DEADLINE', 30))  # seconds a caller may ask for
+
+    # Player balance cache (shared by /categoryN/balance and the fan-out)
+    BALANCE_CACHE_TTL = float(os.getenv('BALANCE_CACHE_TTL', 10))  # seconds a balance is served without asking the provider
+    BALANCE_CACHE_STALE_WHILE_REVALIDATE = float(os.getenv('BALANCE_CACHE_STALE_WHILE_REVALIDATE', 60))  # further seconds served while refreshing
+    BALANCE_CACHE_RETENTION = int(os.getenv('BALANCE_CACHE_RETENTION', 600))  # seconds a last known balance is kept
+
+    # Multi-provider player provisioning, failed legs retried in the background
+    PROVISION_RETRY_ENABLED = os.getenv('PROVISION_RETRY_ENABLED', 'true').lower() == 'true'
+    PROVISION_RETRY_DELAYS = (30, 120, 600)  # seconds before each retry of a failed leg
+    PROVISION_RETRY_INTERVAL = int(os.getenv('PROVISION_RETRY_INTERVAL', 10))  # seconds between retry sweeps
+    PROVISION_RECORD_TTL = int(os.getenv('PROVISION_RECORD_TTL', 86400))  # seconds a job record is kept
+
+    # Background session refresher: re-login at a fraction of the observed session lifetime
+    SESSION_REFRESH_ENABLED = os.getenv('SESSION_REFRESH_ENABLED', 'true').lower() == 'true'
+    SESSION_REFRESH_INTERVAL = int(os.getenv('SESSION_REFRESH_INTERVAL', 30))  # seconds between checks
+    SESSION_REFRESH_MARGIN = float(os.getenv('SESSION_REFRESH_MARGIN', 0.8))
+    SESSION_REFRESH_MIN_LIFETIME = int(os.getenv('SESSION_REFRESH_MIN_LIFETIME', 60))
+    # Lifetimes (seconds) assumed before any expiry has been observed, by category
+    SESSION_DEFAULT_LIFETIMES = {}
+
     # TwoCaptcha Settings
     CAPTCHA_API_KEY = os.getenv("CAPTCHA_API_KEY", "your-2captcha-api-key-here")
 
+    # Offline numeric captcha recognizer tried before 2Captcha (trained k-NN model, .npz)
+    CAPTCHA_MODEL_PATH = os.getenv('CAPTCHA_MODEL_PATH')
+    CAPTCHA_MIN_CONFIDENCE = float(os.getenv('CAPTCHA_MIN_CONFIDENCE', 1.0))
+    CAPTCHA_LENGTHS = (4, 5)
+
+    # Pre-solved CAPTCHA reservoir for Category 2/3 logins
+    CAPTCHA_RESERVOIR_ENABLED = os.getenv('CAPTCHA_RESERVOIR_ENABLED', 'true').lower() == 'true'
+    CAPTCHA_RESERVOIR_DEPTH = int(os.getenv('CAPTCHA_RESERVOIR_DEPTH', 2))  # solved captchas kept per provider
+    CAPTCHA_RESERVOIR_TTL = int(os.getenv('CAPTCHA_RESERVOIR_TTL', 90))  # seconds a solved captcha stays usable
+    CAPTCHA_RESERVOIR_IDLE_TIMEOUT = int(os.getenv('CAPTCHA_RESERVOIR_IDLE_TIMEOUT', 600))  # stop refilling when unused
+
    # Provider URLs for each category (list all providers)
     CATEGORY1_PROVIDERS = [
         "https://agentserver.gameroom777.com",
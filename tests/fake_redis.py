@@ -0,0 +1,212 @@
+"""
+Minimal in-process stand-in for the Redis commands the app uses.
+Shared between test modules; thread-safe so it can back concurrency tests.
+"""
+
+import math
+import threading
+import time
+from app.services.login_coordinator import RELEASE_SCRIPT
+from app.services.provider_limiter import ACQUIRE_SCRIPT
+from app.services.agent_ledger import APPLY_SCRIPT
+
+
+class FakeRedis:
+    """Dictionary-backed Redis with key expiry."""
+
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self._lock = threading.RLock()
+
+    def _purge(self, key):
+        expires_at = self._expiry.get(key)
+        if expires_at is not None and time.monotonic() >= expires_at:
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+
+    def _set_ttl(self, key, ex=None, px=None):
+        if px is not None:
+            self._expiry[key] = time.monotonic() + px / 1000.0
+        elif ex is not None:
+            self._expiry[key] = time.monotonic() + ex
+        else:
+            self._expiry.pop(key, None)
+
+    def get(self, key):
+        with self._lock:
+            self._purge(key)
+            return self._data.get(key)
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        with self._lock:
+            self._purge(key)
+            if nx and key in self._data:
+                return None
+            self._data[key] = str(value)
+            self._set_ttl(key, ex, px)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                self._purge(key)
+                if key in self._data:
+                    del self._data[key]
+                    self._expiry.pop(key, None)
+                    removed += 1
+            return removed
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._purge(key)
+            value = int(self._data.get(key, 0)) + amount
+            self._data[key] = str(value)
+            return value
+
+    def incrbyfloat(self, key, amount=1.0):
+        with self._lock:
+            self._purge(key)
+            value = float(self._data.get(key, 0)) + float(amount)
+            self._data[key] = repr(value)
+            return value
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(self.get(key) is not None for key in keys)
+
+    def expire(self, key, seconds):
+        with self._lock:
+            self._purge(key)
+            if key not in self._data:
+                return False
+            self._set_ttl(key, ex=seconds)
+            return True
+
+    def mget(self, keys):
+        with self._lock:
+            return [self.get(key) for key in keys]
+
+    def pexpire(self, key, milliseconds):
+        with self._lock:
+            self._purge(key)
+            if key not in self._data:
+                return False
+            self._set_ttl(key, px=milliseconds)
+            return True
+
+    def _zset(self, key):
+        self._purge(key)
+        return self._data.setdefault(key, {})
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            zset = self._zset(key)
+            added = len(set(mapping) - set(zset))
+            zset.update({member: float(score) for member, score in mapping.items()})
+            return added
+
+    def zrem(self, key, *members):
+        with self._lock:
+            zset = self._zset(key)
+            return sum(zset.pop(member, None) is not None for member in members)
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._zset(key))
+
+    @staticmethod
+    def _score(bound):
+        return {"-inf": -math.inf, "+inf": math.inf}.get(bound, bound)
+
+    def zcount(self, key, low, high):
+        with self._lock:
+            low, high = float(self._score(low)), float(self._score(high))
+            return sum(low <= score <= high for score in self._zset(key).values())
+
+    def zremrangebyscore(self, key, low, high):
+        with self._lock:
+            low, high = float(self._score(low)), float(self._score(high))
+            zset = self._zset(key)
+            expired = [member for member, score in zset.items() if low <= score <= high]
+            for member in expired:
+                del zset[member]
+            return len(expired)
+
+    def zrangebyscore(self, key, low, high, start=None, num=None):
+        with self._lock:
+            low, high = float(self._score(low)), float(self._score(high))
+            members = sorted((score, member) for member, score in self._zset(key).items() if low <= score <= high)
+            members = [member for _, member in members]
+            return members[start:start + num] if start is not None and num is not None else members
+
+    def hmget(self, key, *fields):
+        with self._lock:
+            self._purge(key)
+            return [self._data.get(key, {}).get(field) for field in fields]
+
+    def hgetall(self, key):
+        with self._lock:
+            self._purge(key)
+            return dict(self._data.get(key, {}))
+
+    def hset(self, key, mapping):
+        with self._lock:
+            self._purge(key)
+            self._data.setdefault(key, {}).update({field: str(value) for field, value in mapping.items()})
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def eval(self, script, numkeys, *args):
+        keys, argv = args[:numkeys], args[numkeys:]
+        with self._lock:
+            if script == RELEASE_SCRIPT:
+                if self.get(keys[0]) == argv[0]:
+                    return self.delete(keys[0])
+                return 0
+            if script == ACQUIRE_SCRIPT:
+                return self._acquire_lane(keys, *argv)
+            if script == APPLY_SCRIPT:
+                return self.incrbyfloat(keys[0], argv[0]) if self.exists(keys[0]) else None
+        raise NotImplementedError("Script not supported by FakeRedis")
+
+    def _acquire_lane(self, keys, token, now, lease, limit, rate, burst):
+        """Python rendering of ACQUIRE_SCRIPT."""
+        now, lease, limit, rate, burst = int(now), int(lease), int(limit), float(rate), float(burst)
+        self.zremrangebyscore(keys[0], "-inf", now)
+        if limit > 0 and self.zcard(keys[0]) >= limit:
+            return -1
+        if rate > 0:
+            tokens, ts = self.hmget(keys[1], "tokens", "ts")
+            tokens = float(tokens) if tokens is not None else burst
+            ts = float(ts) if ts is not None else now
+            tokens = min(burst, tokens + max(now - ts, 0) * rate / 1000)
+            if tokens < 1:
+                return math.ceil((1 - tokens) * 1000 / rate)
+            self.hset(keys[1], {"tokens": tokens - 1, "ts": now})
+            self.pexpire(keys[1], math.ceil(burst * 1000 / rate) + 1000)
+        self.zadd(keys[0], {token: now + lease})
+        self.pexpire(keys[0], lease)
+        return 0
+
+
+class FakePipeline:
+    """Queues commands and runs them in order on execute()."""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._commands.append((getattr(self._redis, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self._redis._lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
@@ -0,0 +1,104 @@
+"""
+Unit tests for the shadow agent balance ledger.
+"""
+
+import unittest
+from types import SimpleNamespace
+from app.services.agent_ledger import AgentBalanceLedger, agent_ledger
+from app.services.base_service import BaseGameService
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class TransferService(BaseGameService):
+    """Provider whose agent balance fetches are counted."""
+
+    def __init__(self, provider, live_balance="100.00"):
+        super().__init__(provider)
+        self.live_balance = live_balance
+        self.fetches = 0
+
+    def get_agent_balance(self):
+        self.fetches += 1
+        self._record_agent_balance(self.live_balance)
+        return {"message": "Agent balance fetched", "balance": self.live_balance}
+
+
+class AgentBalanceLedgerTestCase(unittest.TestCase):
+    """Test case for AgentBalanceLedger."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        self.ledger = AgentBalanceLedger(max_age=60)
+
+    def tearDown(self):
+        set_redis(None)
+
+    def test_apply_only_after_sync(self):
+        self.assertIsNone(self.ledger.apply(1, -10))
+        self.assertIsNone(self.ledger.balance(1))
+        self.ledger.sync(1, "1,250.50")
+        self.assertEqual(self.ledger.apply(1, -50), "1200.50")
+        self.assertEqual(self.ledger.balance(1), "1200.50")
+
+    def test_unparsable_balance_is_ignored(self):
+        self.ledger.sync(1, "N/A")
+        self.assertIsNone(self.ledger.balance(1))
+
+    def test_invalidate(self):
+        self.ledger.sync(1, 10)
+        self.ledger.invalidate(1)
+        self.assertIsNone(self.ledger.balance(1))
+
+
+class TransferWithAgentBalanceTestCase(unittest.TestCase):
+    """Test case for BaseGameService._transfer_with_agent_balance."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        self.service = TransferService(SimpleNamespace(id=9, name="Gameroom", base_url="http://provider.test"))
+
+    def tearDown(self):
+        set_redis(None)
+
+    def test_second_transfer_skips_the_fetch(self):
+        quoted = []
+
+        def transfer(balance):
+            quoted.append(balance)
+            return {"message": "Recharged successfully"}, True
+
+        self.service._transfer_with_agent_balance(transfer, -30)
+        self.service._transfer_with_agent_balance(transfer, -20)
+        self.assertEqual(quoted, ["100.00", "70.00"])
+        self.assertEqual(self.service.fetches, 1)
+        self.assertEqual(agent_ledger.balance(9), "50.00")
+
+    def test_rejected_ledger_balance_is_refetched_once(self):
+        agent_ledger.sync(9, "80.00")
+        quoted = []
+
+        def transfer(balance):
+            quoted.append(balance)
+            if balance == "80.00":
+                return {"message": "Failed to recharge", "error": "Balance mismatch"}, False
+            return {"message": "Recharged successfully"}, True
+
+        result = self.service._transfer_with_agent_balance(transfer, -10)
+        self.assertEqual(result, {"message": "Recharged successfully"})
+        self.assertEqual(quoted, ["80.00", "100.00"])
+        self.assertEqual(agent_ledger.balance(9), "90.00")
+
+    def test_unknown_outcome_drops_the_ledger(self):
+        agent_ledger.sync(9, "80.00")
+
+        def transfer(balance):
+            raise TimeoutError("read timed out")
+
+        with self.assertRaises(TimeoutError):
+            self.service._transfer_with_agent_balance(transfer, -10)
+        self.assertIsNone(agent_ledger.balance(9))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Parity tests for the single-pass ASP.NET form-state extractor.
+"""
+
+import os
+import unittest
+from bs4 import BeautifulSoup
+from app.utils.aspnet_form import FORM_STATE_FIELDS, extract_form_state
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "category3")
+
+
+def read_page(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as page:
+        return page.read()
+
+
+def soup_form_state(text):
+    """The BeautifulSoup lookup Category3Service used before."""
+    soup = BeautifulSoup(text, "html.parser")
+    return {
+        name: soup.find("input", {"name": name})["value"] if soup.find("input", {"name": name}) else ""
+        for name in FORM_STATE_FIELDS
+    }
+
+
+class ExtractFormStateTestCase(unittest.TestCase):
+    """Test case for extract_form_state."""
+
+    def test_parity_with_beautifulsoup(self):
+        for name in sorted(os.listdir(FIXTURES)):
+            with self.subTest(page=name):
+                text = read_page(name)
+                self.assertEqual(extract_form_state(text), soup_form_state(text))
+
+    def test_login_page(self):
+        state = extract_form_state(read_page("default.html"))
+        self.assertEqual(state["__VIEWSTATEGENERATOR"], "CA0B0334")
+        self.assertTrue(state["__VIEWSTATE"])
+        self.assertTrue(state["__EVENTVALIDATION"])
+
+    def test_skips_commented_out_inputs(self):
+        state = extract_form_state(read_page("create_account.html"))
+        self.assertNotEqual(state["__VIEWSTATE"], "STALE-COMMENTED-OUT")
+        self.assertEqual(state["__VIEWSTATEGENERATOR"], "5E1D9B3B")
+
+    def test_unescapes_values_and_reports_missing_fields(self):
+        state = extract_form_state(read_page("grant_treasure.html"))
+        self.assertTrue(state["__EVENTVALIDATION"].endswith("&v=2"))
+        self.assertEqual(state["__VIEWSTATEGENERATOR"], "")
+
+    def test_stops_once_all_fields_are_found(self):
+        text = read_page("default.html") + '<input name="__VIEWSTATE" value="later">'
+        self.assertNotEqual(extract_form_state(text)["__VIEWSTATE"], "later")
+        self.assertEqual(extract_form_state(text, ("txtVerifyCode",)), {"txtVerifyCode": ""})
+
+
+if __name__ == "__main__":
+    unittest.main()
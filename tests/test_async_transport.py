@@ -0,0 +1,126 @@
+"""
+Unit tests for the asyncio provider transport.
+"""
+
+import asyncio
+import contextvars
+import time
+import unittest
+from types import SimpleNamespace
+import httpx
+import requests
+from app.services.async_transport import await_only, greenlet_spawn
+from app.services.base_service import BaseGameService
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class EchoService(BaseGameService):
+    """Minimal provider whose balance lookup needs a cookie set by login."""
+
+    def login(self, username, password):
+        self._make_request("POST", "/login", data={"user": username, "pwd": password})
+        return {"message": "Login successful"}
+
+    def get_balances(self, username):
+        self._sleep(0.1)
+        response = self._make_request("GET", "/balance", params={"user": username})
+        return {"message": "Balance fetched", "balance": response.json()["balance"]}
+
+
+def handler(request):
+    if request.url.path == "/login":
+        return httpx.Response(200, text="ok", headers={"Set-Cookie": "sid=abc; Path=/"})
+    if "sid=abc" not in request.headers.get("cookie", ""):
+        return httpx.Response(403, text="forbidden")
+    return httpx.Response(200, json={"balance": "12.50", "agent": request.headers["User-Agent"]})
+
+
+class AsyncTransportTestCase(unittest.TestCase):
+    """Test case for greenlet_spawn and the async service methods."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+
+    def tearDown(self):
+        set_redis(None)
+
+    def make_service(self, provider_id=1):
+        service = EchoService(SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", base_url="http://provider.test"))
+        service._get_async_client = lambda: httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), cookies=service.session.cookies
+        )
+        return service
+
+    def test_greenlet_spawn_awaits_and_keeps_context(self):
+        """Sync code can await coroutines and sees the caller's context variables."""
+        async def double(value):
+            await asyncio.sleep(0)
+            return value * 2
+
+        def operation(value):
+            return await_only(double(value)), request_id.get()
+
+        async def main():
+            request_id.set("r-1")
+            return await greenlet_spawn(operation, 21)
+
+        self.assertEqual(asyncio.run(main()), (42, "r-1"))
+
+    def test_greenlet_spawn_propagates_errors(self):
+        """Exceptions raised by the awaited coroutine surface in the sync code and back out."""
+        async def fail():
+            raise ValueError("provider down")
+
+        def operation():
+            try:
+                await_only(fail())
+            except ValueError as e:
+                raise RuntimeError(str(e))
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(greenlet_spawn(operation))
+
+    def test_await_only_requires_greenlet_spawn(self):
+        coroutine = asyncio.sleep(0)
+        with self.assertRaises(RuntimeError):
+            await_only(coroutine)
+        coroutine.close()
+
+    def test_async_operations_share_session_state(self):
+        """Cookies from an async login are sent by later async calls and the sync session."""
+        service = self.make_service()
+
+        async def main():
+            await service.login_async("agent", "secret")
+            return await service.get_balances_async("player1")
+
+        result = asyncio.run(main())
+        self.assertEqual(result, {"message": "Balance fetched", "balance": "12.50"})
+        self.assertEqual(service.session.cookies.get("sid"), "abc")
+
+    def test_operations_run_concurrently(self):
+        """Sleeps inside operations yield to the loop instead of blocking it."""
+        services = [self.make_service(provider_id) for provider_id in range(1, 6)]
+        for service in services:
+            service.session.cookies.set("sid", "abc")
+
+        async def main():
+            return await asyncio.gather(*(service.get_balances_async("player1") for service in services))
+
+        started = time.monotonic()
+        results = asyncio.run(main())
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual([result["balance"] for result in results], ["12.50"] * 5)
+
+    def test_http_errors_match_requests(self):
+        """Error responses raise requests.HTTPError like the sync transport."""
+        service = self.make_service()
+        with self.assertRaises(requests.HTTPError):
+            asyncio.run(service.get_balances_async("player1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
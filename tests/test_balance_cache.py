@@ -0,0 +1,128 @@
+"""
+Unit tests for cached balance polls and their invalidation.
+"""
+
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from app.services import operations
+from app.services.balance_cache import BalanceCache
+from app.services.executor import OperationExecutor
+from app.services.operations import dispatch
+from app.services.session_pool import ProviderSessionPool
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class FakeService:
+    """Provider service stand-in holding one player's balance."""
+
+    balances = None
+    calls = None
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._auth_generation = 0
+
+    def _load_cached_data(self):
+        pass
+
+    def close(self):
+        pass
+
+    def get_balances(self, username):
+        self.calls.append("get_balances")
+        return {"message": "Balance fetched", "balance": str(self.balances[username])}
+
+    def recharge(self, username, amount):
+        self.calls.append("recharge")
+        self.balances[username] += amount
+        return {"message": "Recharged successfully"}
+
+
+class FakePool(ProviderSessionPool):
+    def _service_class(self, provider):
+        return FakeService
+
+
+def make_provider(provider_id):
+    return SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", category=SimpleNamespace(name="CATEGORY2"))
+
+
+class BalanceCacheTestCase(unittest.TestCase):
+    """Test case for balance polls through dispatch."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        FakeService.balances = {"alice": 10}
+        FakeService.calls = self.calls = []
+        self.cache = BalanceCache(ttl=30, stale_while_revalidate=60)
+        for name, value in (
+            ("session_pool", FakePool()),
+            ("balance_cache", self.cache),
+            ("operation_executor", OperationExecutor()),
+        ):
+            patch = mock.patch.object(operations, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.provider = make_provider(1)
+
+    def tearDown(self):
+        set_redis(None)
+
+    def balance(self, **payload):
+        return dispatch(self.provider, "balance", dict(payload, username="alice"))
+
+    def age_entry(self, seconds):
+        entry = self.cache.get(1, "alice")
+        self.cache.remember(1, "alice", entry["balance"])
+        with mock.patch.object(time, "time", return_value=time.time() + seconds):
+            return self.balance()
+
+    def test_repeated_poll_is_served_from_cache_with_age(self):
+        first, status = self.balance()
+        self.assertEqual((first["balance"], first["age"], status), ("10", 0.0, 200))
+        second, status = self.balance()
+        self.assertEqual((second["balance"], status), ("10", 200))
+        self.assertIn("age", second)
+        self.assertEqual(self.calls, ["get_balances"])
+
+    def test_max_age_zero_asks_provider(self):
+        self.balance()
+        self.balance(max_age=0)
+        self.assertEqual(self.calls, ["get_balances", "get_balances"])
+
+    def test_stale_balance_is_served_while_refreshing(self):
+        self.balance()
+        result, status = self.age_entry(45)
+        self.assertTrue(result["stale"])
+        self.assertEqual(result["balance"], "10")
+        for _ in range(100):
+            if len(self.calls) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.calls, ["get_balances", "get_balances"])
+
+    def test_expired_balance_is_fetched_again(self):
+        self.balance()
+        result, _ = self.age_entry(120)
+        self.assertNotIn("stale", result)
+        self.assertEqual(self.calls, ["get_balances", "get_balances"])
+
+    def test_recharge_invalidates_balance(self):
+        self.balance()
+        dispatch(self.provider, "recharge", {"username": "alice", "amount": 5})
+        result, _ = self.balance()
+        self.assertEqual(result["balance"], "15")
+        self.assertEqual(self.calls, ["get_balances", "recharge", "get_balances"])
+
+    def test_balance_read_before_invalidation_is_not_stored(self):
+        requested_at = time.time()
+        self.cache.invalidate(1, "alice")
+        self.cache.remember(1, "alice", "10", requested_at - 1)
+        self.assertIsNone(self.cache.get(1, "alice"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Unit tests for cross-provider balance lookups.
+"""
+
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from app.services import balance_fanout as fanout_module
+from app.services.balance_cache import balance_cache
+from app.services.balance_fanout import BalanceFanout
+from app.services.executor import OperationExecutor
+from app.services.retry import current_deadline
+from app.services.session_pool import ProviderSessionPool
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class FakeService:
+    """Answers get_balances after a per-provider delay."""
+
+    delays = {}
+    calls = []
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._auth_generation = 0
+
+    def _load_cached_data(self):
+        pass
+
+    def close(self):
+        pass
+
+    def get_balances(self, username):
+        self.calls.append(self.provider.id)
+        current_deadline().sleep(self.delays.get(self.provider.id, 0))
+        if username == "ghost":
+            return {"message": "User not found", "error": "No such user"}
+        if username == "crash":
+            raise RuntimeError("connection reset")
+        return {"message": "Balance fetched", "balance": f"{self.provider.id}0.00"}
+
+
+class FakePool(ProviderSessionPool):
+    def _service_class(self, provider):
+        return FakeService
+
+
+def make_provider(provider_id):
+    return SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", category=SimpleNamespace(name="CATEGORY1"))
+
+
+class BalanceFanoutTestCase(unittest.TestCase):
+    """Test case for BalanceFanout."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        FakeService.delays = {}
+        FakeService.calls = []
+        self.executor = OperationExecutor()
+        for name, value in (("session_pool", FakePool()), ("operation_executor", self.executor)):
+            patch = mock.patch.object(fanout_module, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.fanout = BalanceFanout(deadline=1)
+        self.providers = [make_provider(i) for i in (1, 2, 3)]
+
+    def tearDown(self):
+        self.executor.shutdown()
+        set_redis(None)
+
+    def test_queries_providers_concurrently(self):
+        FakeService.delays = {1: 0.2, 2: 0.2, 3: 0.2}
+        started = time.monotonic()
+        entries = self.fanout.fetch([(provider, "alice") for provider in self.providers])
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual([entry["status"] for entry in entries], ["ok"] * 3)
+        self.assertEqual([entry["balance"] for entry in entries], ["10.00", "20.00", "30.00"])
+
+    def test_slow_provider_times_out_without_delaying_others(self):
+        FakeService.delays = {2: 1.0}
+        started = time.monotonic()
+        entries = self.fanout.fetch([(provider, "alice") for provider in self.providers], deadline=0.2)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual([entry["status"] for entry in entries], ["ok", "timeout", "ok"])
+
+    def test_missed_calls_are_cancelled(self):
+        FakeService.delays = {2: 1.0}
+        self.fanout.fetch([(provider, "alice") for provider in self.providers], deadline=0.2)
+        started = time.monotonic()
+        self.executor.shutdown()
+        self.assertLess(time.monotonic() - started, 0.3)
+        self.assertIsNone(balance_cache.get(2, "alice"))
+        self.assertEqual(self.executor.stats()["CATEGORY1"]["completed"], 3)
+
+    def test_slow_provider_falls_back_to_last_known_balance(self):
+        balance_cache.remember(2, "alice", "15.00")
+        FakeService.delays = {2: 1.0}
+        entries = self.fanout.fetch([(provider, "alice") for provider in self.providers], deadline=0.2)
+        self.assertEqual(entries[1]["status"], "stale")
+        self.assertEqual(entries[1]["balance"], "15.00")
+        self.assertIn("age", entries[1])
+
+    def test_recent_balance_served_from_cache(self):
+        self.fanout.fetch([(self.providers[0], "alice")])
+        entries = self.fanout.fetch([(self.providers[0], "alice")], max_age=30)
+        self.assertEqual(entries[0]["status"], "cached")
+        self.assertEqual(FakeService.calls, [1])
+
+    def test_errors_reported_per_provider(self):
+        entries = self.fanout.fetch([(self.providers[0], "ghost"), (self.providers[1], "crash")])
+        self.assertEqual(entries[0], {
+            "provider_id": 1, "provider": "Provider 1", "username": "ghost", "status": "error", "error": "No such user"
+        })
+        self.assertEqual(entries[1]["status"], "error")
+        self.assertEqual(entries[1]["error"], "connection reset")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Unit tests for the bulk transfer runner.
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from app.services import bulk
+from app.services.bulk import BulkRunner
+from app.services.executor import OperationExecutor
+from app.services.provider_limiter import ProviderLimiter
+from app.services.session_pool import ProviderSessionPool
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class FakeService:
+    """Provider service stand-in that records concurrency per provider."""
+
+    tracker = None
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._auth_generation = 0
+
+    def _load_cached_data(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _transfer(self, username, amount, message):
+        self.tracker.enter(self.provider.id)
+        try:
+            time.sleep(0.01)
+            if username == "broken":
+                raise RuntimeError("connection reset")
+            if amount > 100:
+                return {"message": "Failed to recharge", "error": "Insufficient agent balance"}
+            return {"message": message}
+        finally:
+            self.tracker.leave(self.provider.id)
+
+    def recharge(self, username, amount):
+        return self._transfer(username, amount, "Recharged successfully")
+
+    def redeem(self, username, amount):
+        return self._transfer(username, amount, "Redeemed successfully")
+
+
+class Tracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = {}
+        self.peak = {}
+
+    def enter(self, provider_id):
+        with self.lock:
+            self.current[provider_id] = self.current.get(provider_id, 0) + 1
+            self.peak[provider_id] = max(self.peak.get(provider_id, 0), self.current[provider_id])
+
+    def leave(self, provider_id):
+        with self.lock:
+            self.current[provider_id] -= 1
+
+
+class FakePool(ProviderSessionPool):
+    def _service_class(self, provider):
+        return FakeService
+
+
+def make_provider(provider_id, category="CATEGORY1"):
+    return SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", category=SimpleNamespace(name=category))
+
+
+class BulkRunnerTestCase(unittest.TestCase):
+    """Test case for BulkRunner."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        FakeService.tracker = self.tracker = Tracker()
+        self.pool = FakePool(max_idle_per_provider=8)
+        self.limiter = ProviderLimiter(max_in_flight=8, overrides={"CATEGORY3": {"max_in_flight": 1}})
+        self.executor = OperationExecutor()
+        patches = [
+            mock.patch.object(bulk, "session_pool", self.pool),
+            mock.patch.object(bulk, "provider_limiter", self.limiter),
+            mock.patch.object(bulk, "operation_executor", self.executor),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        set_redis(None)
+
+    def jobs(self, provider, count, start=0, **item):
+        return [
+            (start + i, provider, dict({"username": f"player{i}", "amount": 10, "op": "recharge"}, **item))
+            for i in range(count)
+        ]
+
+    def test_runs_every_item_and_reuses_sessions(self):
+        runner = BulkRunner(max_per_provider=2)
+        jobs = self.jobs(make_provider(1), 10)
+        outcomes = list(runner.run(jobs))
+        self.assertEqual(sorted(outcome["index"] for outcome in outcomes), list(range(10)))
+        self.assertTrue(all(outcome["ok"] for outcome in outcomes))
+        # One session per lane, not per item.
+        self.assertEqual(self.pool.stats()[1]["created"], 2)
+        self.assertLessEqual(self.tracker.peak[1], 2)
+        self.assertEqual(self.executor.stats()["CATEGORY1"]["completed"], 10)
+
+    def test_respects_provider_lane_limit(self):
+        runner = BulkRunner(max_per_provider=4)
+        jobs = self.jobs(make_provider(1), 8) + self.jobs(make_provider(2, "CATEGORY3"), 4, start=8)
+        outcomes = list(runner.run(jobs))
+        self.assertEqual(len(outcomes), 12)
+        self.assertEqual(self.tracker.peak[2], 1)
+        self.assertGreater(self.tracker.peak[1], 1)
+
+    def test_reports_partial_failures(self):
+        runner = BulkRunner()
+        provider = make_provider(1)
+        jobs = [
+            (0, provider, {"username": "alice", "amount": 10, "op": "recharge"}),
+            (1, provider, {"username": "broken", "amount": 10, "op": "redeem"}),
+            (2, provider, {"username": "bob", "amount": 500, "op": "recharge"}),
+            (3, provider, {"username": "carol", "amount": 5, "op": "redeem"}),
+        ]
+        outcomes = list(runner.run(jobs))
+        summary = runner.summarize(outcomes)
+        self.assertEqual(summary["total"], 4)
+        self.assertEqual(summary["succeeded"], 2)
+        self.assertEqual([failure["index"] for failure in summary["failures"]], [1, 2])
+        self.assertEqual(summary["failures"][0]["error"], "connection reset")
+        self.assertEqual(summary["failures"][1]["error"], "Insufficient agent balance")
+
+    def test_full_executor_queue_fails_the_item(self):
+        self.executor.queue_depth = 0
+        outcomes = list(BulkRunner().run(self.jobs(make_provider(1), 3)))
+        self.assertEqual(len(outcomes), 3)
+        self.assertFalse(any(outcome["ok"] for outcome in outcomes))
+        self.assertIn("queue full", outcomes[0]["error"])
+        self.assertEqual(self.executor.stats()["CATEGORY1"]["rejected"], 3)
+
+    def test_failed_session_is_not_reused(self):
+        runner = BulkRunner(max_per_provider=1)
+        provider = make_provider(1)
+        jobs = [
+            (0, provider, {"username": "broken", "amount": 10, "op": "recharge"}),
+            (1, provider, {"username": "alice", "amount": 10, "op": "recharge"}),
+        ]
+        list(runner.run(jobs))
+        self.assertEqual(self.pool.stats()[1]["created"], 2)
+        self.assertEqual(self.pool.stats()[1]["failures"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Unit tests for the pre-solved CAPTCHA reservoir.
+"""
+
+import time
+import unittest
+from app.services.captcha import CaptchaReservoir, CaptchaSolver
+
+
+class StubSolver(CaptchaSolver):
+    """Solver that answers instantly with the image contents."""
+
+    def solve(self, image):
+        return image.decode()
+
+
+class CaptchaReservoirTestCase(unittest.TestCase):
+    """Test case for CaptchaReservoir."""
+
+    def setUp(self):
+        self.fetched = 0
+
+    def fetch(self):
+        self.fetched += 1
+        return str(1000 + self.fetched).encode(), {"t": self.fetched}
+
+    def test_take_returns_entry_with_context(self):
+        """Entries keep the t value/cookies the answer is bound to."""
+        reservoir = CaptchaReservoir("Game Vault", self.fetch, StubSolver(), depth=2, ttl=60)
+        reservoir.fill_one()
+        entry = reservoir.take()
+        self.assertEqual(entry.code, "1001")
+        self.assertEqual(entry.context, {"t": 1})
+        self.assertIsNone(reservoir.take())
+
+    def test_expired_entries_are_skipped(self):
+        """Entries past their TTL are never handed out."""
+        reservoir = CaptchaReservoir("Game Vault", self.fetch, StubSolver(), depth=2, ttl=0.05)
+        reservoir.fill_one()
+        time.sleep(0.1)
+        self.assertIsNone(reservoir.take())
+
+    def test_background_refill_to_depth(self):
+        """The refill thread keeps `depth` solved captchas ready."""
+        reservoir = CaptchaReservoir("Game Vault", self.fetch, StubSolver(), depth=3, ttl=60)
+        reservoir.start()
+        try:
+            deadline = time.monotonic() + 2
+            while len(reservoir) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(len(reservoir), 3)
+            reservoir.take()
+            deadline = time.monotonic() + 2
+            while len(reservoir) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(len(reservoir), 3)
+            self.assertEqual(self.fetched, 4)
+        finally:
+            reservoir.stop()
+
+    def test_failed_solve_is_not_stored(self):
+        """Solver errors leave the reservoir empty instead of storing bad answers."""
+        class FailingSolver(CaptchaSolver):
+            def solve(self, image):
+                raise RuntimeError("solver down")
+
+        reservoir = CaptchaReservoir("Orion Stars", self.fetch, FailingSolver(), depth=1, ttl=60)
+        self.assertIsNone(reservoir.fill_one())
+        self.assertEqual(len(reservoir), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Unit tests for the offline numeric captcha recognizer.
+"""
+
+import unittest
+import numpy as np
+from app.services.captcha_recognizer import KNNDigitClassifier, LocalCaptchaSolver, normalize, segment
+
+
+class SegmentTestCase(unittest.TestCase):
+    """Test case for glyph segmentation and classification."""
+
+    def _mask(self, widths, gap=3, height=10):
+        mask = np.zeros((height + 4, sum(widths) + gap * (len(widths) + 1)), dtype=bool)
+        x = gap
+        for width in widths:
+            mask[2:2 + height, x:x + width] = True
+            x += width + gap
+        return mask
+
+    def test_segments_separated_digits(self):
+        """Each ink run between blank columns becomes one glyph cropped to its ink."""
+        glyphs = segment(self._mask([4, 5, 4, 6]))
+        self.assertEqual([glyph.shape for glyph in glyphs], [(10, 4), (10, 5), (10, 4), (10, 6)])
+
+    def test_splits_touching_digits_to_expected_length(self):
+        """Runs are split when fewer glyphs than expected are found."""
+        glyphs = segment(self._mask([4, 12]), expected_length=3)
+        self.assertEqual(len(glyphs), 3)
+
+    def test_drops_noise_beyond_expected_length(self):
+        """The faintest extra run is dropped when more glyphs than expected are found."""
+        mask = self._mask([5, 5, 5])
+        mask[:, 1] = False
+        mask[0, 0:2] = True
+        glyphs = segment(mask, expected_length=3)
+        self.assertEqual(len(glyphs), 3)
+
+    def test_knn_predicts_nearest_label(self):
+        """The classifier returns the majority label of the nearest samples."""
+        ones = normalize(np.ones((10, 3), dtype=bool))
+        blocks = normalize(np.ones((10, 8), dtype=bool) & (np.arange(8) % 7 == 0))
+        classifier = KNNDigitClassifier(k=1).fit([ones, blocks], ["1", "0"])
+        labels, confidences = classifier.predict([ones, blocks])
+        self.assertEqual(labels, ["1", "0"])
+        self.assertEqual(confidences, [1.0, 1.0])
+
+
+class LocalCaptchaSolverTestCase(unittest.TestCase):
+    """Test case for LocalCaptchaSolver's confidence gate."""
+
+    class StubRecognizer:
+        lengths = (4, 5)
+
+        def __init__(self, result):
+            self.result = result
+
+        def recognize(self, image):
+            return self.result
+
+    def test_returns_confident_answer(self):
+        solver = LocalCaptchaSolver(self.StubRecognizer(("1234", 1.0)))
+        self.assertEqual(solver.solve(b""), "1234")
+
+    def test_declines_low_confidence_or_wrong_length(self):
+        """Declined answers return None so the next solver (2Captcha) runs."""
+        self.assertIsNone(LocalCaptchaSolver(self.StubRecognizer(("1234", 0.5))).solve(b""))
+        self.assertIsNone(LocalCaptchaSolver(self.StubRecognizer(("12", 1.0))).solve(b""))
+
+
+if __name__ == '__main__':
+    unittest.main()
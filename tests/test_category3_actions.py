@@ -0,0 +1,75 @@
+"""
+Unit tests for Category3 action page reuse.
+"""
+
+import os
+import unittest
+from types import SimpleNamespace
+from app.services.category3_service import Category3Service
+from app.services.user_cache import user_id_cache
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "category3")
+
+with open(os.path.join(FIXTURES, "grant_treasure.html"), encoding="utf-8") as page:
+    GRANT_PAGE = page.read()
+
+
+class ScriptedCategory3Service(Category3Service):
+    """Category3 service answering requests from a small fake provider."""
+
+    def __init__(self, provider):
+        super().__init__(provider)
+        self.calls = []
+        self.param = "Q2x7a9"
+
+    def _make_request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        if url.endswith("AccountsList.aspx"):
+            return SimpleNamespace(ok=True, text=f"<a href='Module/AccountManager/GrantTreasure.aspx?param={self.param}'>Grant</a>")
+        if not url.endswith(f"param={self.param}"):
+            # Expired params bounce to an error page without the form.
+            return SimpleNamespace(ok=True, text="<html><body>Parameter error</body></html>")
+        if method == "GET":
+            return SimpleNamespace(ok=True, text=GRANT_PAGE)
+        return SimpleNamespace(ok=True, text='<script>Alter("Confirmed successful")</script>')
+
+
+class ActionUrlReuseTestCase(unittest.TestCase):
+    """Test case for Category3Service._open_action_form."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        user_id_cache.clear_local()
+        provider = SimpleNamespace(id=11, name="Orion Stars", base_url="https://orionstars.test")
+        self.service = ScriptedCategory3Service(provider)
+        user_id_cache.set(provider.id, "player1", {"user_id": "100001", "game_id": "900007"})
+
+    def tearDown(self):
+        user_id_cache.clear_local()
+        set_redis(None)
+
+    def test_repeat_recharge_skips_the_postback(self):
+        self.assertEqual(self.service.recharge("player1", 10), {"message": "Recharged successfully"})
+        self.assertEqual(len(self.service.calls), 3)
+        self.service.calls.clear()
+        self.assertEqual(self.service.recharge("player1", 10), {"message": "Recharged successfully"})
+        path = "/Module/AccountManager/GrantTreasure.aspx?param=Q2x7a9"
+        self.assertEqual(self.service.calls, [("GET", path), ("POST", path)])
+
+    def test_stale_url_falls_back_to_full_flow(self):
+        self.service.recharge("player1", 10)
+        self.service.param = "R8k2b1"
+        self.service.calls.clear()
+        self.assertEqual(self.service.recharge("player1", 10), {"message": "Recharged successfully"})
+        self.assertEqual([url.rsplit("/", 1)[1] for _, url in self.service.calls], [
+            "GrantTreasure.aspx?param=Q2x7a9",
+            "AccountsList.aspx",
+            "GrantTreasure.aspx?param=R8k2b1",
+            "GrantTreasure.aspx?param=R8k2b1",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Unit tests for the per-provider circuit breaker.
+"""
+
+import unittest
+from types import SimpleNamespace
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    """Test case for CircuitBreaker."""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        set_redis(self.redis)
+        self.breaker = CircuitBreaker(min_calls=4, failure_rate=0.5, slow_call_seconds=1.0, cooldown=30)
+        self.provider = SimpleNamespace(id=3, name="Fire Kirin")
+
+    def tearDown(self):
+        set_redis(None)
+
+    def state(self):
+        return self.breaker.states([self.provider.id])[self.provider.id]["state"]
+
+    def fail(self, times):
+        for _ in range(times):
+            self.breaker.record(self.provider, False, 0.1, self.breaker.before_request(self.provider))
+
+    def open_and_cool_down(self):
+        self.fail(4)
+        self.redis.set(CircuitBreaker._open_key(self.provider.id), 0)
+
+    def test_trips_on_failure_rate(self):
+        self.breaker.record(self.provider, True, 0.1)
+        self.fail(3)
+        self.assertEqual(self.state(), OPEN)
+        with self.assertRaises(CircuitOpenError) as ctx:
+            self.breaker.before_request(self.provider)
+        self.assertGreater(ctx.exception.retry_after, 0)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.check(self.provider)
+
+    def test_stays_closed_below_min_calls(self):
+        self.fail(3)
+        self.assertEqual(self.state(), CLOSED)
+        self.assertIsNone(self.breaker.before_request(self.provider))
+
+    def test_trips_on_slow_calls(self):
+        for _ in range(4):
+            self.breaker.record(self.provider, True, 2.0)
+        self.assertEqual(self.state(), OPEN)
+
+    def test_half_open_admits_single_probe(self):
+        self.open_and_cool_down()
+        self.assertEqual(self.state(), HALF_OPEN)
+        self.breaker.check(self.provider)
+        probe = self.breaker.before_request(self.provider)
+        self.assertIsNotNone(probe)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request(self.provider)
+        self.breaker.record(self.provider, True, 0.1, probe)
+        self.assertEqual(self.state(), CLOSED)
+        self.assertIsNone(self.breaker.before_request(self.provider))
+
+    def test_failed_probe_reopens(self):
+        self.open_and_cool_down()
+        probe = self.breaker.before_request(self.provider)
+        self.breaker.record(self.provider, False, 0.1, probe)
+        self.assertEqual(self.state(), OPEN)
+
+    def test_disabled_breaker_never_blocks(self):
+        self.breaker.enabled = False
+        self.fail(10)
+        self.assertIsNone(self.breaker.before_request(self.provider))
+
+
+if __name__ == "__main__":
+    unittest.main()
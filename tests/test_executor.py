@@ -0,0 +1,111 @@
+"""
+Unit tests for the per-category operation executors.
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from app.services.executor import OperationExecutor, OperationTimeout
+from app.services.provider_limiter import ProviderBusyError
+from app.services.retry import DeadlineExceeded, current_deadline
+
+
+def make_provider(provider_id, category="CATEGORY1"):
+    return SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", category=SimpleNamespace(name=category))
+
+
+class OperationExecutorTestCase(unittest.TestCase):
+    """Test case for OperationExecutor."""
+
+    def setUp(self):
+        self.executor = OperationExecutor(workers=2, queue_depth=2, timeout=5, timeouts={"slow": 0.1})
+        self.provider = make_provider(1)
+
+    def test_returns_result(self):
+        self.assertEqual(self.executor.run(self.provider, "balance", lambda x: x * 2, 21), 42)
+        self.assertEqual(self.executor.stats()["CATEGORY1"]["completed"], 1)
+
+    def test_timeout_cancels_running_operation(self):
+        outcome = []
+        finished = threading.Event()
+
+        def slow():
+            # Stands in for an HTTP call that outlives the caller's wait.
+            time.sleep(0.3)
+            try:
+                current_deadline().check()
+            except DeadlineExceeded as e:
+                outcome.append(str(e))
+            finally:
+                finished.set()
+
+        started = time.monotonic()
+        with self.assertRaises(OperationTimeout):
+            self.executor.run(self.provider, "slow", slow)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(finished.wait(1))
+        self.assertEqual(outcome, ["Operation cancelled"])
+        self.assertEqual(self.executor.stats()["CATEGORY1"]["timeouts"], 1)
+
+    def test_rejects_when_queue_full(self):
+        release = threading.Event()
+        futures = [self.executor.submit(self.provider, "balance", release.wait) for _ in range(2)]
+        while self.executor.stats()["CATEGORY1"].get("active", 0) < 2:
+            time.sleep(0.01)
+        futures += [self.executor.submit(self.provider, "balance", release.wait) for _ in range(2)]
+        with self.assertRaises(ProviderBusyError):
+            self.executor.submit(self.provider, "balance", release.wait)
+        stats = self.executor.stats()["CATEGORY1"]
+        self.assertEqual((stats["active"], stats["queued"], stats["rejected"]), (2, 2, 1))
+        release.set()
+        for future in futures:
+            self.executor.wait(future, self.provider, "balance")
+        self.assertEqual(self.executor.stats()["CATEGORY1"]["queued"], 0)
+
+    def test_categories_have_separate_pools(self):
+        release = threading.Event()
+        blocked = [self.executor.submit(self.provider, "balance", release.wait) for _ in range(2)]
+        # Category1's threads are busy; Category3 still answers at once.
+        self.assertEqual(self.executor.run(make_provider(2, "CATEGORY3"), "balance", lambda: "ok"), "ok")
+        release.set()
+        for future in blocked:
+            future.result()
+
+    def test_slow_hedged_call_is_answered_by_backup(self):
+        self.executor.hedge_delay = 0.05
+        calls = []
+
+        def read():
+            calls.append(None)
+            if len(calls) == 1:
+                # The first copy stalls until its deadline is cancelled.
+                while not current_deadline().cancelled:
+                    time.sleep(0.01)
+                return "stale"
+            return "fresh"
+
+        future = self.executor.submit(self.provider, "balance", read, hedge=True)
+        self.assertEqual(self.executor.wait(future, self.provider, "balance"), "fresh")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.executor.stats()["CATEGORY1"]["hedged"], 1)
+
+    def test_unhedged_call_is_not_duplicated(self):
+        self.executor.hedge_delay = 0.01
+        calls = []
+        future = self.executor.submit(self.provider, "balance", lambda: calls.append(time.sleep(0.1)) or "ok")
+        self.assertEqual(self.executor.wait(future, self.provider, "balance"), "ok")
+        self.assertEqual(len(calls), 1)
+
+    def test_detached_wait_leaves_operation_running(self):
+        release = threading.Event()
+        future = self.executor.submit(self.provider, "slow", release.wait, 1, grace=2)
+        with self.assertRaises(OperationTimeout):
+            self.executor.wait(future, self.provider, "slow", detach_after=0.05)
+        self.assertFalse(future.deadline.cancelled)
+        release.set()
+        self.assertTrue(future.result(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
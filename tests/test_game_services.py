@@ -0,0 +1,33 @@
+"""
+Unit tests for the game service factory.
+"""
+
+import unittest
+from types import SimpleNamespace
+from app.services.category1_service import Category1Service
+from app.services.category5_service import Category5Service
+from app.services.factory import GameServiceFactory
+
+
+def make_provider(category):
+    return SimpleNamespace(id=1, name="Provider 1", category=SimpleNamespace(name=category))
+
+
+class GameServiceFactoryTestCase(unittest.TestCase):
+    """Test case for GameServiceFactory."""
+
+    def test_service_class_follows_category(self):
+        self.assertIs(GameServiceFactory.service_class(make_provider("CATEGORY1")), Category1Service)
+        self.assertIs(GameServiceFactory.service_class(make_provider("CATEGORY5")), Category5Service)
+
+    def test_unknown_category_is_rejected(self):
+        with self.assertRaises(ValueError):
+            GameServiceFactory.service_class(make_provider("CATEGORY9"))
+
+    def test_supports_checks_service_methods(self):
+        self.assertTrue(GameServiceFactory.supports(make_provider("CATEGORY1"), "change_password"))
+        self.assertFalse(GameServiceFactory.supports(make_provider("CATEGORY5"), "transfer_all"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Unit tests for idempotency keys on money operations.
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from app.services import operations
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.executor import OperationExecutor
+from app.services.idempotency import IdempotencyConflict, IdempotencyInProgress, IdempotencyStore
+from app.services.jobs import JobStore
+from app.services.operations import dispatch, submit_job
+from app.services.session_pool import ProviderSessionPool
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class FakeService:
+    """Provider service stand-in counting the recharges it applies."""
+
+    applied = None
+    gate = None
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._auth_generation = 0
+
+    def _load_cached_data(self):
+        pass
+
+    def close(self):
+        pass
+
+    def recharge(self, username, amount):
+        self.gate.wait(2)
+        if username == "down":
+            raise CircuitOpenError(self.provider.name, 30)
+        self.applied.append((username, amount))
+        return {"message": "Recharged successfully"}
+
+
+class FakePool(ProviderSessionPool):
+    def _service_class(self, provider):
+        return FakeService
+
+
+def make_provider(provider_id):
+    return SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", category=SimpleNamespace(name="CATEGORY1"))
+
+
+class IdempotencyTestCase(unittest.TestCase):
+    """Test case for dispatch and submit_job with an idempotency key."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        FakeService.applied = self.applied = []
+        FakeService.gate = self.gate = threading.Event()
+        self.gate.set()
+        self.store = IdempotencyStore(grace=2, poll_interval=0.01)
+        self.jobs = JobStore()
+        for name, value in (
+            ("session_pool", FakePool()),
+            ("idempotency_store", self.store),
+            ("job_store", self.jobs),
+            ("operation_executor", OperationExecutor(timeouts={"recharge": 0.1})),
+        ):
+            patch = mock.patch.object(operations, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.provider = make_provider(1)
+        self.payload = {"username": "alice", "amount": 10}
+
+    def tearDown(self):
+        self.gate.set()
+        set_redis(None)
+
+    def wait_for_record(self, key):
+        for _ in range(200):
+            record = self.store.get(1, "recharge", key)
+            if record is None or record["state"] == "done":
+                return record
+            time.sleep(0.01)
+        self.fail("outcome was not recorded")
+
+    def test_repeat_replays_outcome(self):
+        first = dispatch(self.provider, "recharge", self.payload, "key-1")
+        self.wait_for_record("key-1")
+        self.assertEqual(dispatch(self.provider, "recharge", self.payload, "key-1"), first)
+        self.assertEqual(len(self.applied), 1)
+
+    def test_reused_key_with_other_payload_is_rejected(self):
+        dispatch(self.provider, "recharge", self.payload, "key-1")
+        with self.assertRaises(IdempotencyConflict):
+            dispatch(self.provider, "recharge", {"username": "alice", "amount": 20}, "key-1")
+
+    def test_repeat_of_timed_out_call_gets_real_outcome(self):
+        self.gate.clear()
+        result, status = dispatch(self.provider, "recharge", self.payload, "key-1")
+        self.assertEqual(status, 504)
+        self.assertIn("same Idempotency-Key", result["error"])
+        self.gate.set()
+        self.assertEqual(self.wait_for_record("key-1")["status_code"], 200)
+        self.assertEqual(dispatch(self.provider, "recharge", self.payload, "key-1")[1], 200)
+        self.assertEqual(len(self.applied), 1)
+
+    def test_repeat_while_running_waits_then_reports_in_progress(self):
+        self.gate.clear()
+        dispatch(self.provider, "recharge", self.payload, "key-1")
+        with self.assertRaises(IdempotencyInProgress):
+            dispatch(self.provider, "recharge", self.payload, "key-1")
+        self.gate.set()
+        self.wait_for_record("key-1")
+
+    def test_call_rejected_before_sending_frees_key(self):
+        with self.assertRaises(CircuitOpenError):
+            dispatch(self.provider, "recharge", {"username": "down", "amount": 10}, "key-1")
+        self.assertIsNone(self.wait_for_record("key-1"))
+
+    def test_keys_are_ignored_for_reads(self):
+        with mock.patch.object(self.store, "claim") as claim:
+            with mock.patch.object(operations, "_submit") as submit, mock.patch.object(operations, "_outcome", return_value=({}, 200)):
+                dispatch(self.provider, "balance", {"username": "alice"}, "key-1")
+        claim.assert_not_called()
+        submit.assert_called_once()
+
+    def test_repeated_job_returns_first_job(self):
+        first = submit_job(self.provider, "recharge", self.payload, idempotency_key="key-1")
+        second = submit_job(self.provider, "recharge", self.payload, idempotency_key="key-1")
+        self.assertEqual(second["job_id"], first["job_id"])
+        self.wait_for_record("key-1")
+        self.assertEqual(len(self.applied), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Unit tests for asynchronous provider jobs.
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from app.services import jobs, operations
+from app.services.executor import OperationExecutor
+from app.services.jobs import JobStore
+from app.services.operations import submit_job
+from app.services.provider_limiter import ProviderBusyError
+from app.services.session_pool import ProviderSessionPool
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class FakeService:
+    """Provider service stand-in whose login waits for the test to release it."""
+
+    release = None
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._auth_generation = 0
+
+    def _load_cached_data(self):
+        pass
+
+    def close(self):
+        pass
+
+    def login(self, username, password):
+        self.release.wait(2)
+        if password == "wrong":
+            return {"message": "Login failed", "error": "Bad credentials"}
+        return {"message": "Login successful"}
+
+
+class FakePool(ProviderSessionPool):
+    def _service_class(self, provider):
+        return FakeService
+
+
+def make_provider(provider_id):
+    return SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", category=SimpleNamespace(name="CATEGORY3"))
+
+
+class JobsTestCase(unittest.TestCase):
+    """Test case for submit_job and JobStore."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        FakeService.release = self.release = threading.Event()
+        self.store = JobStore(ttl=60)
+        self.executor = OperationExecutor(workers=1, queue_depth=1)
+        for target, name, value in (
+            (operations, "session_pool", FakePool()),
+            (operations, "job_store", self.store),
+            (operations, "operation_executor", self.executor),
+        ):
+            patch = mock.patch.object(target, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.provider = make_provider(1)
+
+    def tearDown(self):
+        self.release.set()
+        # Jobs still queued finish now and record their outcome in Redis.
+        self.executor.shutdown()
+        set_redis(None)
+
+    def wait_for(self, job_id):
+        for _ in range(200):
+            job = self.store.get(job_id)
+            if job["status"] != "pending":
+                return job
+            time.sleep(0.01)
+        self.fail("job did not finish")
+
+    def test_returns_at_once_and_records_result(self):
+        job = submit_job(self.provider, "login", {"username": "agent", "password": "secret"})
+        self.assertEqual(self.store.get(job["job_id"])["status"], "pending")
+        self.release.set()
+        job = self.wait_for(job["job_id"])
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(job["status_code"], 200)
+        self.assertEqual(job["result"], {"message": "Login successful"})
+
+    def test_rejected_operation_is_failed_job(self):
+        self.release.set()
+        job = self.wait_for(submit_job(self.provider, "login", {"username": "agent", "password": "wrong"})["job_id"])
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["status_code"], 400)
+
+    def test_callback_receives_finished_job(self):
+        with mock.patch.object(jobs.requests, "post") as post:
+            job = submit_job(self.provider, "login", {"username": "agent", "password": "secret"}, "https://example.test/hook")
+            self.release.set()
+            self.wait_for(job["job_id"])
+            for _ in range(100):
+                if post.called:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(post.call_args[0][0], "https://example.test/hook")
+        self.assertIn(b'"status": "succeeded"', post.call_args[1]["data"])
+
+    def test_callback_runs_off_the_operation_executor(self):
+        self.store.callback_secret = "hook-secret"
+        sent = threading.Event()
+        threads = []
+
+        def post(url, data, headers, timeout):
+            threads.append(threading.current_thread().name)
+            self.assertEqual(headers["X-Job-Signature"], self.store.sign(data))
+            sent.wait(2)
+            return mock.Mock()
+
+        with mock.patch.object(jobs.requests, "post", side_effect=post):
+            first = submit_job(self.provider, "login", {"username": "agent", "password": "secret"}, "https://example.test/hook")
+            self.release.set()
+            self.wait_for(first["job_id"])
+            # The callback is still blocked, yet the category's only worker takes the next job.
+            second = submit_job(self.provider, "login", {"username": "agent", "password": "secret"})
+            self.assertEqual(self.wait_for(second["job_id"])["status"], "succeeded")
+            sent.set()
+        self.assertTrue(threads[0].startswith("job-callback"))
+
+    def test_callback_hosts_allowlist(self):
+        store = JobStore(callback_hosts=("hooks.example.test", ".partner.test"))
+        self.assertTrue(store.callback_allowed("https://hooks.example.test/job"))
+        self.assertTrue(store.callback_allowed("http://api.partner.test/job"))
+        self.assertFalse(store.callback_allowed("https://partner.test.evil.test/job"))
+        self.assertFalse(store.callback_allowed("http://169.254.169.254/latest/meta-data"))
+        self.assertFalse(store.callback_allowed("ftp://hooks.example.test/job"))
+        self.assertFalse(JobStore().callback_allowed("https://hooks.example.test/job"))
+
+    def test_full_executor_rejects_without_leaving_a_record(self):
+        submit_job(self.provider, "login", {"username": "agent", "password": "secret"})
+        while self.executor.stats()["CATEGORY3"].get("active", 0) < 1:
+            time.sleep(0.01)
+        submit_job(self.provider, "login", {"username": "agent", "password": "secret"})
+        with mock.patch.object(self.store, "discard", wraps=self.store.discard) as discard:
+            with self.assertRaises(ProviderBusyError):
+                submit_job(self.provider, "login", {"username": "agent", "password": "secret"})
+        job_id = discard.call_args[0][0]
+        self.assertIsNone(self.store.get(job_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Unit tests for the buffered API log writer.
+"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+from app.services.api_log_writer import APILogWriter
+
+
+def make_row(index):
+    return {"account_id": 1, "remote_provider": "GAMEROOM", "method": "POST", "path": f"/api/{index}",
+            "status_code": 200, "is_successful": True}
+
+
+class APILogWriterTestCase(unittest.TestCase):
+    """Test case for APILogWriter."""
+
+    def setUp(self):
+        self.batches = []
+        self.inserted = threading.Condition()
+
+        def insert(rows):
+            with self.inserted:
+                self.batches.append(list(rows))
+                self.inserted.notify_all()
+
+        patch = mock.patch.object(APILogWriter, "_insert", side_effect=insert)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def wait_for_rows(self, count, timeout=2):
+        with self.inserted:
+            self.inserted.wait_for(lambda: sum(map(len, self.batches)) >= count, timeout)
+        return sum(map(len, self.batches))
+
+    def test_full_batches_are_written_without_waiting_for_interval(self):
+        writer = APILogWriter(batch_size=3, flush_interval=10)
+        self.addCleanup(writer.stop)
+        for index in range(6):
+            writer.write(**make_row(index))
+        self.assertEqual(self.wait_for_rows(6), 6)
+        self.assertEqual([len(batch) for batch in self.batches], [3, 3])
+        # created_at comes from the column default at insert time.
+        self.assertNotIn("created_at", self.batches[0][0])
+
+    def test_partial_batch_is_written_after_interval(self):
+        writer = APILogWriter(batch_size=100, flush_interval=0.05)
+        self.addCleanup(writer.stop)
+        writer.write(**make_row(1))
+        self.assertEqual(self.wait_for_rows(1), 1)
+        stats = writer.stats()
+        self.assertEqual((stats["written"], stats["batches"], stats["queued"]), (1, 1, 0))
+        self.assertIsNotNone(stats["last_flush_ms"])
+
+    def test_stop_drains_queue(self):
+        writer = APILogWriter(batch_size=100, flush_interval=60)
+        for index in range(5):
+            writer.write(**make_row(index))
+        started = time.monotonic()
+        writer.stop()
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(sum(map(len, self.batches)), 5)
+
+    def test_rows_beyond_queue_size_are_dropped(self):
+        writer = APILogWriter(max_queue=2)
+        with mock.patch.object(writer, "ensure_started"):
+            for index in range(5):
+                writer.write(**make_row(index))
+        stats = writer.stats()
+        self.assertEqual((stats["queued"], stats["dropped"]), (2, 3))
+
+    def test_failed_batch_is_retried_once(self):
+        writer = APILogWriter(batch_size=2, flush_interval=0.05, retry_delay=0.01)
+        self.addCleanup(writer.stop)
+        insert, failures = APILogWriter._insert.side_effect, [RuntimeError("database down")]
+
+        def flaky_insert(rows):
+            if failures:
+                raise failures.pop()
+            insert(rows)
+
+        with mock.patch.object(writer, "_insert", side_effect=flaky_insert) as patched:
+            writer.write(**make_row(1))
+            self.assertEqual(self.wait_for_rows(1), 1)
+        self.assertEqual(patched.call_count, 2)
+        stats = writer.stats()
+        self.assertEqual((stats["written"], stats["failed"]), (1, 0))
+
+    def test_failed_batch_is_counted(self):
+        writer = APILogWriter(batch_size=2, flush_interval=0.05, retry_delay=0.01)
+        self.addCleanup(writer.stop)
+        with mock.patch.object(writer, "_insert", side_effect=RuntimeError("database down")) as patched:
+            writer.write(**make_row(1))
+            for _ in range(100):
+                if writer.stats()["failed"]:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(writer.stats()["failed"], 1)
+        self.assertEqual(patched.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Unit tests for single-flight provider re-authentication.
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from app.services.login_coordinator import LoginCoordinator
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class FakeService:
+    """Service stand-in whose login is slow and counted."""
+
+    logins = 0
+    logins_lock = threading.Lock()
+
+    def __init__(self, coordinator, provider, succeed=True):
+        self.coordinator = coordinator
+        self.provider = provider
+        self.succeed = succeed
+        self._authenticating = False
+        self.reloads = 0
+
+    def login(self, username, password):
+        with FakeService.logins_lock:
+            FakeService.logins += 1
+        time.sleep(0.2)
+        if not self.succeed:
+            return {"message": "Login failed"}
+        self.coordinator.bump_generation(self.provider.id)
+        return {"message": "Login successful"}
+
+    def _load_cached_data(self):
+        self.reloads += 1
+
+
+class LoginCoordinatorTestCase(unittest.TestCase):
+    """Test case for LoginCoordinator."""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        set_redis(self.redis)
+        FakeService.logins = 0
+        self.provider = SimpleNamespace(id=7, name="Game Vault", username="agent", password="secret")
+
+    def tearDown(self):
+        set_redis(None)
+
+    def _run_workers(self, coordinators, per_coordinator=5, succeed=True):
+        results = []
+        services = []
+
+        def worker(coordinator):
+            service = FakeService(coordinator, self.provider, succeed=succeed)
+            services.append(service)
+            results.append(coordinator.reauthenticate(service, seen_generation=0))
+
+        threads = [
+            threading.Thread(target=worker, args=(coordinator,))
+            for coordinator in coordinators
+            for _ in range(per_coordinator)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, services
+
+    def test_single_login_within_process(self):
+        """Concurrent expiries in one process trigger exactly one login."""
+        coordinator = LoginCoordinator(poll_interval=0.01)
+        results, services = self._run_workers([coordinator])
+        self.assertEqual(FakeService.logins, 1)
+        self.assertTrue(all(results))
+        self.assertEqual(sum(service.reloads for service in services), 4)
+
+    def test_single_login_across_processes(self):
+        """Coordinators sharing only Redis (separate workers) still log in once."""
+        coordinators = [LoginCoordinator(poll_interval=0.01) for _ in range(3)]
+        results, _ = self._run_workers(coordinators, per_coordinator=3)
+        self.assertEqual(FakeService.logins, 1)
+        self.assertTrue(all(results))
+        self.assertIsNone(self.redis.get("auth:7:lock"))
+
+    def test_stale_generation_only_reloads(self):
+        """A service behind the current generation reloads instead of logging in."""
+        coordinator = LoginCoordinator(poll_interval=0.01)
+        coordinator.bump_generation(self.provider.id)
+        service = FakeService(coordinator, self.provider)
+        self.assertTrue(coordinator.reauthenticate(service, seen_generation=0))
+        self.assertEqual(FakeService.logins, 0)
+        self.assertEqual(service.reloads, 1)
+
+    def test_failed_login_reports_failure(self):
+        """Failed logins release the lock and report failure."""
+        coordinator = LoginCoordinator(poll_interval=0.01)
+        results, _ = self._run_workers([coordinator], per_coordinator=2, succeed=False)
+        self.assertFalse(any(results))
+        self.assertIsNone(self.redis.get("auth:7:lock"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Unit tests for API log queries.
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from werkzeug.datastructures import MultiDict
+from app import create_app
+from app.models import Account, AccountType, APILog, RemoteProvider, Token, db
+from app.routes.admin.logs import MAX_PAGE_SIZE, PAGE_SIZE, find_logs, get_logs, parse_filters
+
+
+class LogFiltersTestCase(unittest.TestCase):
+    """Test case for parse_filters."""
+
+    def test_defaults(self):
+        self.assertEqual(parse_filters(MultiDict()), ({}, None, PAGE_SIZE))
+
+    def test_filters_are_typed(self):
+        filters, cursor, limit = parse_filters(MultiDict({
+            'remote_provider': 'category3', 'account_id': '7', 'status_code': '502', 'is_successful': 'false',
+            'since': '2026-10-01T00:00', 'cursor': '1200', 'limit': '20',
+        }))
+        self.assertEqual(filters, {
+            'remote_provider': RemoteProvider.CATEGORY3, 'account_id': 7, 'status_code': 502,
+            'is_successful': False, 'since': datetime(2026, 10, 1),
+        })
+        self.assertEqual((cursor, limit), (1200, 20))
+
+    def test_limit_is_capped(self):
+        self.assertEqual(parse_filters(MultiDict({'limit': '100000'}))[2], MAX_PAGE_SIZE)
+
+    def test_invalid_argument_is_named(self):
+        for name, value in (('remote_provider', 'nope'), ('status_code', 'abc'), ('is_successful', 'maybe'),
+                            ('until', 'yesterday'), ('cursor', 'x')):
+            with self.assertRaisesRegex(ValueError, name):
+                parse_filters(MultiDict({name: value}))
+
+
+class LogQueriesTestCase(unittest.TestCase):
+    """Test case for the paginated log query and its API."""
+
+    def setUp(self):
+        self.app = create_app()
+        with self.app.app_context():
+            db.create_all()
+            for name, account_type in (("admin", AccountType.ADMIN), ("player", AccountType.PLAYER)):
+                account = Account(username=name, email=f"{name}@example.test", password="x", type=account_type)
+                db.session.add(account)
+                db.session.flush()
+                db.session.add(Token(account_id=account.id, token=f"{name}-token",
+                                     valid_until=datetime.utcnow() + timedelta(days=1)))
+            for index in range(5):
+                db.session.add(APILog(
+                    account_id=account.id, token="player-token", remote_provider=RemoteProvider.CATEGORY1,
+                    method="POST", path=f"/api/{index}", status_code=500 if index % 2 else 200,
+                    is_successful=not index % 2,
+                ))
+            db.session.commit()
+            self.ids = [log.id for log in APILog.query.order_by(APILog.id.desc())]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get_logs(self, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        with self.app.test_request_context('/admin/api/logs', headers=headers):
+            response = get_logs()
+        return response if isinstance(response, tuple) else (response, response.status_code)
+
+    def test_pages_follow_cursor(self):
+        with self.app.app_context():
+            pages, cursor = [], None
+            while True:
+                logs, cursor = find_logs({}, cursor, limit=2)
+                pages.append([log.id for log in logs])
+                if cursor is None:
+                    break
+        self.assertEqual(pages, [self.ids[:2], self.ids[2:4], self.ids[4:]])
+
+    def test_filters_apply_to_every_page(self):
+        with self.app.app_context():
+            logs, cursor = find_logs({"status_code": 500}, limit=1)
+            more, last = find_logs({"status_code": 500}, cursor, limit=1)
+        self.assertEqual([log.id for log in logs + more], [self.ids[1], self.ids[3]])
+        self.assertIsNone(last)
+
+    def test_unauthenticated_request_is_refused(self):
+        for token in (None, "wrong", "player-token"):
+            self.assertEqual(self.get_logs(token)[1], 401)
+
+    def test_admin_token_reads_logs_without_tokens(self):
+        response, status = self.get_logs("admin-token")
+        self.assertEqual(status, 200)
+        logs = response.get_json()["logs"]
+        self.assertEqual(len(logs), 5)
+        self.assertNotIn("token", logs[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Unit tests for the shared provider operation registry.
+"""
+
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from app.services import operations
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.executor import OperationExecutor
+from app.services.operations import dispatch, dispatch_many
+from app.services.session_pool import ProviderSessionPool
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class FakeService:
+    """Provider service stand-in with scripted answers."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._auth_generation = 0
+
+    def _load_cached_data(self):
+        pass
+
+    def close(self):
+        pass
+
+    def recharge(self, username, amount):
+        time.sleep(0.1)
+        if username == "crash":
+            raise RuntimeError("connection reset")
+        if username == "down":
+            raise CircuitOpenError(self.provider.name, 30)
+        if amount > 100:
+            return {"message": "Failed to recharge", "error": "Insufficient agent balance"}
+        return {"message": "Recharged successfully"}
+
+    def add_user(self, username, password):
+        return {"message": "User created", "username": username}
+
+
+class FakePool(ProviderSessionPool):
+    def _service_class(self, provider):
+        return FakeService
+
+
+def make_provider(provider_id):
+    return SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", category=SimpleNamespace(name="CATEGORY1"))
+
+
+class OperationsTestCase(unittest.TestCase):
+    """Test case for dispatch and dispatch_many."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        self.pool = FakePool()
+        self.executor = OperationExecutor()
+        for name, value in (("session_pool", self.pool), ("operation_executor", self.executor)):
+            patch = mock.patch.object(operations, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.provider = make_provider(1)
+
+    def tearDown(self):
+        # Timed-out calls finish in the background and still write to the balance cache.
+        self.executor.shutdown()
+        set_redis(None)
+
+    def test_status_follows_operation(self):
+        self.assertEqual(dispatch(self.provider, "add_user", {"new_username": "alice", "new_password": "x"})[1], 201)
+        self.assertEqual(dispatch(self.provider, "recharge", {"username": "alice", "amount": 10})[1], 200)
+        result, status = dispatch(self.provider, "recharge", {"username": "alice", "amount": 500})
+        self.assertEqual(status, 400)
+        self.assertEqual(result["error"], "Insufficient agent balance")
+
+    def test_exception_is_500_and_discards_session(self):
+        result, status = dispatch(self.provider, "recharge", {"username": "crash", "amount": 10})
+        self.assertEqual(status, 500)
+        self.assertEqual(result["message"], "Recharge failed")
+        self.assertEqual(self.pool.stats()[1]["failures"], 1)
+        self.assertEqual(self.pool.stats()[1]["idle"], 0)
+
+    def test_timeout_is_504(self):
+        self.executor.timeouts = {"recharge": 0.05}
+        result, status = dispatch(self.provider, "recharge", {"username": "alice", "amount": 10})
+        self.assertEqual(status, 504)
+        self.assertEqual(result["message"], "Recharge failed")
+
+    def test_circuit_open_propagates(self):
+        with self.assertRaises(CircuitOpenError):
+            dispatch(self.provider, "recharge", {"username": "down", "amount": 10})
+
+    def test_dispatch_many_runs_in_parallel_and_keeps_order(self):
+        calls = [
+            (make_provider(1), "recharge", {"username": "alice", "amount": 10}),
+            (make_provider(2), "recharge", {"username": "down", "amount": 10}),
+            (make_provider(3), "recharge", {"username": "bob", "amount": 500}),
+        ]
+        started = time.monotonic()
+        results = dispatch_many(calls)
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual([status for _, status in results], [200, 503, 400])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Unit tests for per-provider concurrency lanes and rate limits.
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from app.services.provider_limiter import ProviderBusyError, ProviderLimiter
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class ProviderLimiterTestCase(unittest.TestCase):
+    """Test case for ProviderLimiter."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        self.provider = SimpleNamespace(id=5, name="Fire Kirin", category=SimpleNamespace(name="CATEGORY3"))
+
+    def tearDown(self):
+        set_redis(None)
+
+    def test_overrides_by_category_then_name(self):
+        limiter = ProviderLimiter(max_in_flight=8, overrides={
+            "CATEGORY3": {"max_in_flight": 1, "rate": 2},
+            "Fire Kirin": {"rate": 5},
+        })
+        limits = limiter.limits(self.provider)
+        self.assertEqual(limits["max_in_flight"], 1)
+        self.assertEqual(limits["rate"], 5)
+        self.assertEqual(limits["burst"], 5)
+
+    def test_lane_caps_in_flight_across_threads(self):
+        limiter = ProviderLimiter(max_in_flight=2, poll_interval=0.005)
+        in_flight, peak = [0], [0]
+        lock = threading.Lock()
+
+        def call():
+            with limiter.lane(self.provider):
+                with lock:
+                    in_flight[0] += 1
+                    peak[0] = max(peak[0], in_flight[0])
+                time.sleep(0.02)
+                with lock:
+                    in_flight[0] -= 1
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(limiter.stats(self.provider.id), {"in_flight": 0, "queued": 0})
+
+    def test_token_bucket_spaces_out_calls(self):
+        limiter = ProviderLimiter(max_in_flight=0, rate=20, burst=1)
+        started = time.monotonic()
+        for _ in range(3):
+            with limiter.lane(self.provider):
+                pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_full_queue_rejects(self):
+        limiter = ProviderLimiter(max_in_flight=1, queue_depth=0)
+        with limiter.lane(self.provider):
+            with self.assertRaises(ProviderBusyError):
+                limiter.acquire(self.provider)
+        self.assertEqual(limiter.stats(self.provider.id)["queued"], 0)
+
+    def test_queue_timeout(self):
+        limiter = ProviderLimiter(max_in_flight=1, queue_timeout=0.05, poll_interval=0.01)
+        with limiter.lane(self.provider):
+            with self.assertRaises(ProviderBusyError):
+                limiter.acquire(self.provider)
+        self.assertIsNotNone(limiter.acquire(self.provider))
+
+    def test_unlimited_provider_skips_redis(self):
+        set_redis(None)
+        limiter = ProviderLimiter(max_in_flight=0, rate=0)
+        self.assertIsNone(limiter.acquire(self.provider))
+
+
+if __name__ == "__main__":
+    unittest.main()
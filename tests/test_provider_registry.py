@@ -0,0 +1,81 @@
+"""
+Unit tests for the in-memory provider registry.
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from app.services.provider_registry import ProviderRegistry, ProviderSnapshot
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+def make_snapshot(provider_id, password="secret"):
+    return ProviderSnapshot(
+        provider_id, f"Provider {provider_id}", SimpleNamespace(name="CATEGORY1"),
+        "https://example.test", "agent", password, None
+    )
+
+
+class ProviderRegistryTestCase(unittest.TestCase):
+    """Test case for ProviderRegistry."""
+
+    def setUp(self):
+        set_redis(FakeRedis())
+        self.rows = {1: make_snapshot(1), 2: make_snapshot(2)}
+        self.load = mock.patch.object(ProviderRegistry, "_load", side_effect=lambda: dict(self.rows))
+        self.load_mock = self.load.start()
+        self.addCleanup(self.load.stop)
+        self.pool = mock.Mock()
+        patch = mock.patch("app.services.session_pool.session_pool", self.pool)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.registry = ProviderRegistry(check_interval=60)
+
+    def tearDown(self):
+        set_redis(None)
+
+    def test_lookups_are_served_from_memory(self):
+        self.assertEqual(self.registry.get(1).name, "Provider 1")
+        self.assertEqual(self.registry.get("2").id, 2)
+        self.assertIsNone(self.registry.get(3))
+        self.assertIsNone(self.registry.get(None))
+        self.assertEqual(set(self.registry.by_ids([1, 3])), {1})
+        self.assertEqual(self.load_mock.call_count, 1)
+
+    def test_find_by_id_or_name(self):
+        self.rows[3] = ProviderSnapshot(3, "Cash Machine", SimpleNamespace(name="CATEGORY1"), "", "", "", None)
+        self.assertEqual(self.registry.find("2").id, 2)
+        self.assertEqual(self.registry.find("CashMachine").id, 3)
+        self.assertEqual(self.registry.find("cash machine").id, 3)
+        self.assertIsNone(self.registry.find("Unknown"))
+
+    def test_bump_reloads_and_drops_changed_sessions(self):
+        self.registry.get(1)
+        self.rows[1] = make_snapshot(1, password="rotated")
+        self.assertEqual(self.registry.get(1).password, "secret")
+        self.registry.bump()
+        self.assertEqual(self.registry.get(1).password, "rotated")
+        self.pool.invalidate.assert_called_once_with(1)
+
+    def test_change_from_another_process_seen_after_interval(self):
+        self.registry.get(1)
+        other = ProviderRegistry(check_interval=60)
+        other.bump()
+        self.rows[3] = make_snapshot(3)
+        self.assertIsNone(self.registry.get(3))
+        self.registry._checked_at = 0.0
+        self.assertEqual(self.registry.get(3).id, 3)
+
+    def test_unchanged_version_does_not_reload(self):
+        self.registry.get(1)
+        self.registry._checked_at = 0.0
+        self.registry.get(1)
+        self.assertEqual(self.load_mock.call_count, 1)
+
+    def test_snapshot_dict_omits_password(self):
+        self.assertNotIn("password", self.registry.get(1).to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+"""
+Unit tests for multi-provider player provisioning.
+"""
+
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from app.services import provisioning
+from app.services.base_service import BaseGameService
+from app.services.category3_service import Category3Service
+from app.services.executor import OperationExecutor
+from app.services.provisioning import RETRY_QUEUE, Provisioner
+from app.services.session_pool import ProviderSessionPool
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class FakeService:
+    """add_user stand-in whose outcome per provider is scripted by the test."""
+
+    outcomes = {}
+    created = set()
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._auth_generation = 0
+
+    def _load_cached_data(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _cached_user_ids(self, username):
+        return None
+
+    def _search_user(self, username):
+        if (self.provider.id, username) in self.created:
+            return {"user_id": f"{self.provider.id}-remote"}
+        return {"user_id": None, "error": "User not found"}
+
+    _lookup_user_ids = BaseGameService._lookup_user_ids
+
+    def add_user(self, username, password):
+        time.sleep(0.1)
+        outcome = self.outcomes.get(self.provider.id, []).pop(0) if self.outcomes.get(self.provider.id) else "ok"
+        if outcome == "error":
+            raise RuntimeError("connection reset")
+        if outcome == "lost":
+            self.created.add((self.provider.id, username))
+            raise RuntimeError("read timed out")
+        if outcome == "rejected":
+            return {"message": "Failed to add user", "error": "Captcha failed"}
+        self.created.add((self.provider.id, username))
+        return {"message": "User created", "user_id": f"{self.provider.id}-remote", "username": username}
+
+
+class FakeCategory3Service(FakeService):
+    """Searches like Category3, answering with a (user_id, game_id) tuple."""
+
+    def _search_user(self, username):
+        if (self.provider.id, username) in self.created:
+            return f"{self.provider.id}-remote", f"{self.provider.id}-game"
+        return None, None
+
+    _lookup_user_ids = Category3Service._lookup_user_ids
+
+
+class FakePool(ProviderSessionPool):
+    def _service_class(self, provider):
+        return FakeCategory3Service if provider.category.name == "CATEGORY3" else FakeService
+
+
+def make_provider(provider_id, category="CATEGORY1"):
+    return SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", category=SimpleNamespace(name=category))
+
+
+class ProvisionerTestCase(unittest.TestCase):
+    """Test case for Provisioner."""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        set_redis(self.redis)
+        FakeService.outcomes = {}
+        FakeService.created = set()
+        self.executor = OperationExecutor()
+        for name, value in (("session_pool", FakePool()), ("operation_executor", self.executor)):
+            patch = mock.patch.object(provisioning, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.provisioner = Provisioner(retry_delays=(0, 0), secret_key="test-secret")
+        self.providers = [make_provider(i) for i in (1, 2, 3)]
+
+    def tearDown(self):
+        self.executor.shutdown()
+        set_redis(None)
+
+    def retry_due(self):
+        providers = {provider.id: provider for provider in self.providers}
+        with mock.patch.object(self.provisioner, "_providers", lambda provider_ids: providers):
+            return self.provisioner.retry_due()
+
+    def test_creates_on_every_provider_concurrently(self):
+        started = time.monotonic()
+        job = self.provisioner.provision("alice", "secret", self.providers)
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual([leg["status"] for leg in job["legs"]], ["created"] * 3)
+        self.assertEqual(job["legs"][0]["remote_ids"], {"user_id": "1-remote"})
+        self.assertEqual(self.provisioner.job(job["job_id"])["legs"], job["legs"])
+
+    def test_failed_legs_are_queued_for_retry(self):
+        FakeService.outcomes = {2: ["error"], 3: ["error"]}
+        job = self.provisioner.provision("alice", "secret", self.providers)
+        self.assertEqual([leg["status"] for leg in job["legs"]], ["created", "retrying", "retrying"])
+        self.assertEqual(self.redis.zcard(RETRY_QUEUE), 2)
+        self.assertNotIn("secret", self.redis.get(f"provision:{job['job_id']}:password"))
+
+        self.assertEqual(self.retry_due(), 2)
+        legs = self.provisioner.job(job["job_id"])["legs"]
+        self.assertEqual([leg["status"] for leg in legs], ["created"] * 3)
+        self.assertEqual(legs[1]["attempts"], 2)
+        self.assertEqual(self.redis.zcard(RETRY_QUEUE), 0)
+        self.assertIsNone(self.redis.get(f"provision:{job['job_id']}:password"))
+
+    def test_retry_finds_account_created_by_lost_attempt(self):
+        FakeService.outcomes = {1: ["lost", "rejected"]}
+        job = self.provisioner.provision("alice", "secret", self.providers[:1])
+        self.retry_due()
+        leg = self.provisioner.job(job["job_id"])["legs"][0]
+        self.assertEqual(leg["status"], "created")
+        self.assertEqual(leg["remote_ids"], {"user_id": "1-remote"})
+
+    def test_timed_out_leg_is_retried_and_found(self):
+        self.executor.timeouts = {"add_user": 0.05}
+        job = self.provisioner.provision("alice", "secret", self.providers[:1])
+        self.assertEqual(job["legs"][0]["status"], "retrying")
+        self.assertEqual(self.executor.stats()["CATEGORY1"]["timeouts"], 1)
+        time.sleep(0.2)  # the abandoned add_user still lands on the provider
+        self.retry_due()
+        leg = self.provisioner.job(job["job_id"])["legs"][0]
+        self.assertEqual((leg["status"], leg["remote_ids"]), ("created", {"user_id": "1-remote"}))
+
+    def test_rejection_fails_without_trusting_existing_account(self):
+        # Someone else already holds the username on provider 1.
+        FakeService.created = {(1, "alice")}
+        FakeService.outcomes = {1: ["rejected"]}
+        job = self.provisioner.provision("alice", "secret", self.providers[:1])
+        leg = job["legs"][0]
+        self.assertEqual((leg["status"], leg["error"]), ("failed", "Captcha failed"))
+        self.assertNotIn("remote_ids", leg)
+        self.assertEqual(self.redis.zcard(RETRY_QUEUE), 0)
+        self.assertIsNone(self.redis.get(f"provision:{job['job_id']}:password"))
+
+    def test_retry_finds_account_through_tuple_search(self):
+        FakeService.outcomes = {4: ["lost", "rejected"]}
+        self.providers = [make_provider(4, "CATEGORY3")]
+        job = self.provisioner.provision("alice", "secret", self.providers)
+        self.retry_due()
+        leg = self.provisioner.job(job["job_id"])["legs"][0]
+        self.assertEqual(leg["status"], "created")
+        self.assertEqual(leg["remote_ids"], {"user_id": "4-remote", "game_id": "4-game"})
+
+    def test_retry_creates_user_when_search_finds_nothing(self):
+        FakeService.outcomes = {4: ["error"]}
+        self.providers = [make_provider(4, "CATEGORY3")]
+        job = self.provisioner.provision("alice", "secret", self.providers)
+        self.retry_due()
+        leg = self.provisioner.job(job["job_id"])["legs"][0]
+        self.assertEqual((leg["status"], leg["attempts"]), ("created", 2))
+
+    def test_password_sealed_with_another_secret_is_dropped(self):
+        FakeService.outcomes = {1: ["error"]}
+        job = self.provisioner.provision("alice", "secret", self.providers[:1])
+        self.provisioner.secret_key = "rotated"
+        self.retry_due()
+        self.assertEqual(self.provisioner.job(job["job_id"])["legs"][0]["attempts"], 1)
+
+    def test_gives_up_after_last_retry(self):
+        FakeService.outcomes = {1: ["error", "error", "error"]}
+        job = self.provisioner.provision("alice", "secret", self.providers[:1])
+        self.retry_due()
+        self.retry_due()
+        self.assertEqual(self.retry_due(), 0)
+        leg = self.provisioner.job(job["job_id"])["legs"][0]
+        self.assertEqual(leg["status"], "failed")
+        self.assertEqual(leg["attempts"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
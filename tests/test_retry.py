@@ -0,0 +1,120 @@
+"""
+Unit tests for the deadline-aware retry engine.
+"""
+
+import threading
+import time
+import unittest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from app.services.retry import (
+    Deadline,
+    DeadlineExceeded,
+    ReauthenticationFailed,
+    RetryEngine,
+    bound_deadline,
+    current_deadline,
+    operation_deadline,
+)
+
+
+def refused():
+    reason = NewConnectionError(None, "Failed to establish a new connection")
+    return requests.ConnectionError(MaxRetryError(None, "/api", reason))
+
+
+class DeadlineTestCase(unittest.TestCase):
+    """Test case for Deadline and operation_deadline."""
+
+    def test_clamps_timeouts(self):
+        deadline = Deadline(5)
+        self.assertLessEqual(deadline.clamp(None), 5)
+        self.assertEqual(deadline.clamp(1), 1)
+        self.assertLessEqual(deadline.clamp(30), 5)
+
+    def test_cancel_wakes_sleeper(self):
+        """A cancelled deadline ends a pending sleep immediately."""
+        deadline = Deadline(30)
+        threading.Timer(0.05, deadline.cancel).start()
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            deadline.sleep(10)
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_inner_deadline_cannot_extend_outer(self):
+        with operation_deadline(1) as outer:
+            with operation_deadline(60) as inner:
+                self.assertIs(inner, outer)
+            with operation_deadline(0.5) as inner:
+                self.assertIsNot(inner, outer)
+                self.assertIs(current_deadline(), inner)
+            self.assertIs(current_deadline(), outer)
+        self.assertIsNone(current_deadline())
+
+    def test_cancel_reaches_nested_deadline(self):
+        """Cancelling an operation also ends the shorter deadline a retry loop opened inside it."""
+        outer = Deadline(30)
+        with bound_deadline(outer):
+            with operation_deadline(5) as inner:
+                self.assertIsNot(inner, outer)
+                outer.cancel()
+                with self.assertRaises(DeadlineExceeded):
+                    inner.check()
+
+
+class RetryEngineTestCase(unittest.TestCase):
+    """Test case for RetryEngine."""
+
+    def setUp(self):
+        self.engine = RetryEngine(max_attempts=3, base_delay=0.001, max_delay=0.001, deadline=5)
+
+    def test_reads_retry_until_success(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise requests.ReadTimeout("slow")
+            return "ok"
+
+        self.assertEqual(self.engine.run(flaky), "ok")
+        self.assertEqual(len(calls), 3)
+
+    def test_writes_only_retry_when_never_sent(self):
+        """A timed-out write may have been applied, so it is not sent again."""
+        self.assertFalse(self.engine.should_retry(requests.ReadTimeout("slow"), idempotent=False))
+        self.assertFalse(self.engine.should_retry(requests.HTTPError("502"), idempotent=False))
+        self.assertTrue(self.engine.should_retry(refused(), idempotent=False))
+        self.assertTrue(self.engine.should_retry(requests.ConnectTimeout("connect"), idempotent=False))
+
+    def test_failed_reauthentication_is_final(self):
+        self.assertFalse(self.engine.should_retry(ReauthenticationFailed("Re-authentication failed")))
+        self.assertFalse(self.engine.should_retry(DeadlineExceeded("late")))
+
+    def test_nested_runs_do_not_multiply_attempts(self):
+        """Only the outermost run retries; nested runs execute once."""
+        inner_calls = []
+
+        def inner():
+            inner_calls.append(1)
+            raise requests.ConnectionError("down")
+
+        with self.assertRaises(requests.ConnectionError):
+            self.engine.run(lambda: self.engine.run(inner))
+        self.assertEqual(len(inner_calls), 3)
+
+    def test_gives_up_when_backoff_exceeds_deadline(self):
+        engine = RetryEngine(max_attempts=10, base_delay=10, max_delay=10, deadline=0.5)
+        calls = []
+
+        def failing():
+            calls.append(1)
+            raise requests.ConnectionError("down")
+
+        with self.assertRaises(requests.ConnectionError):
+            engine.run(failing)
+        self.assertLess(len(calls), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
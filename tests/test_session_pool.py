@@ -0,0 +1,111 @@
+"""
+Unit tests for the provider session pool.
+"""
+
+import unittest
+from types import SimpleNamespace
+from app.services.session_pool import ProviderSessionPool
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class FakeService:
+    """Stand-in for a provider service that records whether it was closed."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.closed = False
+        self.reloads = 0
+        self._auth_generation = 0
+
+    def _load_cached_data(self):
+        self.reloads += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool(ProviderSessionPool):
+    def _service_class(self, provider):
+        return FakeService
+
+
+def make_provider(provider_id):
+    return SimpleNamespace(id=provider_id, name=f"Provider {provider_id}", category=SimpleNamespace(name="CATEGORY1"))
+
+
+class SessionPoolTestCase(unittest.TestCase):
+    """Test case for ProviderSessionPool."""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        set_redis(self.redis)
+        self.pool = FakePool(max_providers=2, max_idle_per_provider=1, idle_timeout=900, max_consecutive_failures=2)
+
+    def tearDown(self):
+        set_redis(None)
+
+    def test_reuses_released_service(self):
+        """A released service is handed out again for the same provider."""
+        provider = make_provider(1)
+        service = self.pool.acquire(provider)
+        self.pool.release(service)
+        self.assertIs(self.pool.acquire(provider), service)
+        self.assertEqual(self.pool.stats()[1]["reused"], 1)
+
+    def test_reused_service_reloads_newer_session(self):
+        """A reused service picks up a session saved by another worker."""
+        provider = make_provider(1)
+        service = self.pool.acquire(provider)
+        self.pool.release(service)
+        self.redis.incr("auth:1:generation")
+        self.pool.acquire(provider)
+        self.assertEqual(service.reloads, 1)
+
+    def test_unhealthy_service_is_discarded(self):
+        """A service released as unhealthy is closed and not reused."""
+        provider = make_provider(1)
+        service = self.pool.acquire(provider)
+        self.pool.release(service, healthy=False, error="boom")
+        self.assertTrue(service.closed)
+        self.assertIsNot(self.pool.acquire(provider), service)
+        self.assertEqual(self.pool.stats()[1]["last_error"], "boom")
+
+    def test_idle_limit_per_provider(self):
+        """Services beyond max_idle_per_provider are closed on release."""
+        provider = make_provider(1)
+        first, second = self.pool.acquire(provider), self.pool.acquire(provider)
+        self.pool.release(first)
+        self.pool.release(second)
+        self.assertFalse(first.closed)
+        self.assertTrue(second.closed)
+
+    def test_least_recently_used_provider_is_evicted(self):
+        """Idle providers are evicted once max_providers is exceeded."""
+        services = []
+        for provider_id in (1, 2, 3):
+            service = self.pool.acquire(make_provider(provider_id))
+            self.pool.release(service)
+            services.append(service)
+        self.assertTrue(services[0].closed)
+        self.assertNotIn(1, self.pool.stats())
+
+    def test_idle_eviction(self):
+        """evict_idle closes sessions older than idle_timeout."""
+        self.pool.idle_timeout = 0
+        service = self.pool.acquire(make_provider(1))
+        self.pool.release(service)
+        self.assertEqual(self.pool.evict_idle(), 1)
+        self.assertTrue(service.closed)
+
+    def test_lease_marks_failures(self):
+        """lease() releases the service as unhealthy when the block raises."""
+        provider = make_provider(1)
+        with self.assertRaises(RuntimeError):
+            with self.pool.lease(provider):
+                raise RuntimeError("provider down")
+        self.assertEqual(self.pool.stats()[1]["failures"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
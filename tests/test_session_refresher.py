@@ -0,0 +1,94 @@
+"""
+Unit tests for session lifetime tracking in the background refresher.
+"""
+
+import time
+import unittest
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+from app.services import circuit_breaker, login_coordinator, provider_registry, session_pool
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.session_refresher import SessionRefresher
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class SessionRefresherTestCase(unittest.TestCase):
+    """Test case for SessionRefresher lifetime estimates."""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        set_redis(self.redis)
+        self.refresher = SessionRefresher(margin=0.8, smoothing=0.5, min_lifetime=60)
+
+    def tearDown(self):
+        set_redis(None)
+
+    def test_unknown_lifetime_is_never_due(self):
+        """Providers without an observed lifetime are left to reactive login."""
+        self.refresher.record_login(1)
+        self.assertIsNone(self.refresher.lifetime(1))
+        self.assertFalse(self.refresher.is_due(1))
+
+    def test_expiry_records_lifetime(self):
+        """The age of an expired session becomes the lifetime estimate."""
+        self.redis.set("session:1:logged_in_at", time.time() - 600)
+        self.refresher.record_expiry(1)
+        self.assertAlmostEqual(self.refresher.lifetime(1), 600, delta=2)
+        # Later workers noticing the same expiry do not record it again.
+        self.refresher.record_expiry(1)
+        self.assertAlmostEqual(self.refresher.lifetime(1), 600, delta=2)
+
+    def test_lifetime_is_smoothed(self):
+        """New observations are blended with the previous estimate."""
+        self.redis.set("session:1:lifetime", 1000)
+        self.redis.set("session:1:logged_in_at", time.time() - 600)
+        self.refresher.record_expiry(1)
+        self.assertAlmostEqual(self.refresher.lifetime(1), 800, delta=2)
+
+    def test_due_after_margin(self):
+        """A session is due once it is older than margin * lifetime."""
+        self.redis.set("session:1:lifetime", 1000)
+        self.redis.set("session:1:logged_in_at", time.time() - 700)
+        self.assertFalse(self.refresher.is_due(1))
+        self.redis.set("session:1:logged_in_at", time.time() - 850)
+        self.assertTrue(self.refresher.is_due(1))
+
+    def test_category_default_lifetime(self):
+        """Configured category defaults apply before any expiry is observed."""
+        self.refresher.default_lifetimes = {"CATEGORY3": 100}
+        self.redis.set("session:1:logged_in_at", time.time() - 90)
+        self.assertTrue(self.refresher.is_due(1, "CATEGORY3"))
+        self.assertFalse(self.refresher.is_due(1, "CATEGORY1"))
+
+    def test_refresh_continues_past_open_circuit_and_failed_login(self):
+        """One unhealthy provider does not cost the others their refresh."""
+        providers = [SimpleNamespace(id=i, name=f"Provider {i}", category=SimpleNamespace(name="CATEGORY1")) for i in (1, 2, 3)]
+        for provider in providers:
+            self.redis.set(f"session:{provider.id}:lifetime", 1000)
+            self.redis.set(f"session:{provider.id}:logged_in_at", time.time() - 900)
+
+        def check(provider):
+            if provider.id == 1:
+                raise CircuitOpenError(provider.name, 30)
+
+        @contextmanager
+        def lease(provider):
+            yield provider
+
+        def try_login(service, should_login):
+            if service.id == 2:
+                raise RuntimeError("captcha failed")
+            return True
+
+        with mock.patch.object(provider_registry.provider_registry, "all", return_value=providers), \
+                mock.patch.object(circuit_breaker.circuit_breaker, "check", side_effect=check), \
+                mock.patch.object(session_pool.session_pool, "lease", side_effect=lease) as leased, \
+                mock.patch.object(login_coordinator.login_coordinator, "try_login", side_effect=try_login):
+            self.assertEqual(self.refresher.refresh_due(), 1)
+        self.assertEqual([call.args[0].id for call in leased.call_args_list], [2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Unit tests for the username-to-remote-id cache.
+"""
+
+import unittest
+from app.services.user_cache import UserIdCache
+from app.utils.redis_client import set_redis
+from tests.fake_redis import FakeRedis
+
+
+class UserIdCacheTestCase(unittest.TestCase):
+    """Test case for UserIdCache."""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        set_redis(self.redis)
+        self.cache = UserIdCache(max_local=2)
+
+    def tearDown(self):
+        set_redis(None)
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(self.cache.get(3, "player1"))
+        self.cache.set(3, "player1", {"user_id": "101", "game_id": "9001"})
+        self.assertEqual(self.cache.get(3, "player1"), {"user_id": "101", "game_id": "9001"})
+        self.assertIsNone(self.cache.get(4, "player1"))
+
+    def test_shared_through_redis(self):
+        """Another worker's process-local level fills from Redis."""
+        self.cache.set(3, "player1", {"user_id": "101"})
+        other = UserIdCache()
+        self.assertEqual(other.get(3, "player1"), {"user_id": "101"})
+        self.redis.delete("userid:3:player1")
+        self.assertEqual(other.get(3, "player1"), {"user_id": "101"})
+
+    def test_invalidate_clears_both_levels(self):
+        self.cache.set(3, "player1", {"user_id": "101"})
+        self.cache.invalidate(3, "player1")
+        self.assertIsNone(self.cache.get(3, "player1"))
+
+    def test_local_level_is_bounded(self):
+        for index in range(3):
+            self.cache.set(3, f"player{index}", {"user_id": str(index)})
+        self.redis.delete("userid:3:player0")
+        self.assertIsNone(self.cache.get(3, "player0"))
+        self.assertEqual(self.cache.get(3, "player2"), {"user_id": "2"})
+
+    def test_local_entries_expire(self):
+        self.cache.local_ttl = 0
+        self.cache.set(3, "player1", {"user_id": "101"})
+        self.redis.delete("userid:3:player1")
+        self.assertIsNone(self.cache.get(3, "player1"))
+
+
+if __name__ == "__main__":
+    unittest.main()